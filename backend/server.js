@@ -76,6 +76,13 @@ const googleClient = new OAuth2Client(process.env.GOOGLE_CLIENT_ID);
 // PagerDuty client
 const pd = new pagerduty(process.env.PAGERDUTY_API_KEY);
 
+// Prompt-service calls carry their axios timeout as an absolute deadline
+// (epoch ms) so prompt-service stops working on requests we gave up on.
+// Feedback calls get a longer budget: they go to gpt-4o (vision for drawings).
+const PROMPT_SERVICE_TIMEOUT_MS = 10000;
+const PROMPT_SERVICE_FEEDBACK_TIMEOUT_MS = 60000;
+const promptServiceDeadline = (timeoutMs) => String(Date.now() + timeoutMs);
+
 // Middleware
 app.use(helmet());
 app.use(cors());
@@ -214,9 +221,10 @@ app.post('/api/prompts/generate', authenticateToken, async (req, res) => {
       genres,
       userId
     }, {
-      timeout: 10000,
+      timeout: PROMPT_SERVICE_TIMEOUT_MS,
       headers: {
-        'X-Request-ID': span.spanContext().traceId
+        'X-Request-ID': span.spanContext().traceId,
+        'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_TIMEOUT_MS)
       }
     });
     
@@ -291,9 +299,10 @@ app.post('/api/sound-design/generate', async (req, res) => {
       genre: selectedGenre,
       userId
     }, {
-      timeout: 10000,
+      timeout: PROMPT_SERVICE_TIMEOUT_MS,
       headers: {
-        'X-Request-ID': span.spanContext().traceId
+        'X-Request-ID': span.spanContext().traceId,
+        'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_TIMEOUT_MS)
       }
     });
 
@@ -317,7 +326,7 @@ app.post('/api/chord-progression/generate', async (req, res) => {
   const span = tracer.startSpan('chord-progression-generate');
 
   try {
-    const { emotions, userId } = req.body;
+    const { emotions, userId, embedMidi } = req.body;
 
     span.setAttributes({
       'user.id': userId || 'anonymous',
@@ -329,12 +338,15 @@ app.post('/api/chord-progression/generate', async (req, res) => {
       'http://prompt-service:5001/generate-chord-progression',
       {
         emotions,
+        embedMidi,
         userId: userId || 'anonymous'
       },
       {
+        timeout: PROMPT_SERVICE_TIMEOUT_MS,
         headers: {
           'Content-Type': 'application/json',
-          'X-Request-ID': span.spanContext().traceId
+          'X-Request-ID': span.spanContext().traceId,
+          'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_TIMEOUT_MS)
         }
       }
     );
@@ -354,6 +366,49 @@ app.post('/api/chord-progression/generate', async (req, res) => {
   }
 });
 
+// Download a chord progression's MIDI file by its midiId. Pass the
+// progression text as ?progression= so an id whose cached copy has expired
+// is rendered again instead of returning 404.
+app.get('/api/chord-progression/midi/:midiId', async (req, res) => {
+  const span = tracer.startSpan('chord-progression-midi');
+
+  try {
+    span.setAttributes({ 'midi.id': req.params.midiId });
+
+    const promptServiceResponse = await axios.get(
+      `http://prompt-service:5001/midi/${encodeURIComponent(req.params.midiId)}`,
+      {
+        params: { progression: req.query.progression },
+        responseType: 'arraybuffer',
+        validateStatus: (status) => status < 500,
+        timeout: PROMPT_SERVICE_TIMEOUT_MS,
+        headers: {
+          'X-Request-ID': span.spanContext().traceId,
+          'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_TIMEOUT_MS),
+          ...(req.headers['if-none-match'] && { 'If-None-Match': req.headers['if-none-match'] })
+        }
+      }
+    );
+
+    for (const header of ['content-type', 'etag', 'cache-control', 'content-disposition']) {
+      if (promptServiceResponse.headers[header]) {
+        res.set(header, promptServiceResponse.headers[header]);
+      }
+    }
+
+    span.setStatus({ code: 1 });
+    res.status(promptServiceResponse.status).send(Buffer.from(promptServiceResponse.data));
+  } catch (error) {
+    span.recordException(error);
+    span.setStatus({ code: 2, message: error.message });
+
+    console.error('Chord progression MIDI download error:', error);
+    res.status(500).json({ error: 'Failed to download MIDI file' });
+  } finally {
+    span.end();
+  }
+});
+
 app.post('/api/drawing/generate', async (req, res) => {
   const span = tracer.startSpan('drawing-exercise-generate');
 
@@ -373,9 +428,11 @@ app.post('/api/drawing/generate', async (req, res) => {
         userId: userId || 'anonymous'
       },
       {
+        timeout: PROMPT_SERVICE_TIMEOUT_MS,
         headers: {
           'Content-Type': 'application/json',
-          'X-Request-ID': span.spanContext().traceId
+          'X-Request-ID': span.spanContext().traceId,
+          'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_TIMEOUT_MS)
         }
       }
     );
@@ -422,9 +479,11 @@ app.post('/api/writing/feedback', async (req, res) => {
         wordCount
       },
       {
+        timeout: PROMPT_SERVICE_FEEDBACK_TIMEOUT_MS,
         headers: {
           'Content-Type': 'application/json',
-          'X-Request-ID': span.spanContext().traceId
+          'X-Request-ID': span.spanContext().traceId,
+          'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_FEEDBACK_TIMEOUT_MS)
         }
       }
     );
@@ -467,9 +526,11 @@ app.post('/api/drawing/feedback', async (req, res) => {
         difficulty
       },
       {
+        timeout: PROMPT_SERVICE_FEEDBACK_TIMEOUT_MS,
         headers: {
           'Content-Type': 'application/json',
-          'X-Request-ID': span.spanContext().traceId
+          'X-Request-ID': span.spanContext().traceId,
+          'X-Request-Deadline': promptServiceDeadline(PROMPT_SERVICE_FEEDBACK_TIMEOUT_MS)
         },
         maxBodyLength: Infinity,
         maxContentLength: Infinity
@@ -1,23 +1,41 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context, g, has_app_context, has_request_context
 from flask_cors import CORS
-import redis
+import redis.asyncio as aioredis
+import asyncio
+import concurrent.futures
+import threading
+import time
+import queue
+import atexit
+import weakref
 import json
+import copy
 import random
 import hashlib
+import functools
 import re
-from opentelemetry import trace, metrics
+import unicodedata
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace import ReadableSpan, SpanLimits, SpanProcessor, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.sampling import (ALWAYS_OFF, ALWAYS_ON, Decision, ParentBased, Sampler,
+                                              SamplingResult, TraceIdRatioBased)
 from opentelemetry.instrumentation.flask import FlaskInstrumentor
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
 import logging
 import os
 from datetime import datetime
+from types import MappingProxyType
 import openai
-from midiutil import MIDIFile
-import io
+import struct
 import base64
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from redis_store import (FEEDBACK_TOTALS_PREFIX, REDIS_SOCKET_TIMEOUT, REDIS_URL, connect as connect_redis,
+                         feedback_ratings_key, feedback_totals_key)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,23 +45,259 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize OpenTelemetry
-trace.set_tracer_provider(TracerProvider())
+# OpenTelemetry. Without OTEL_EXPORTER_OTLP_ENDPOINT (or with
+# OTEL_SDK_DISABLED=true) no SDK is installed and every span is the API's
+# no-op span. Otherwise traces are head-sampled by OTEL_TRACES_SAMPLER
+# (names as in the OpenTelemetry spec; the parentbased_* samplers follow the
+# caller's decision) with OTEL_TRACES_SAMPLER_ARG as the ratio, and spans
+# the sampler drops are not recorded at all. TRACE_KEEP_ERRORS or
+# TRACE_SLOW_SECONDS (both off by default) record those spans too, at close
+# to the cost of sampling everything, and export this process's whole part
+# of a trace once any span in it ends in an error or runs that long. Span
+# attributes are capped in count and length.
+OTEL_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+TRACING_ENABLED = bool(OTEL_ENDPOINT) and os.getenv('OTEL_SDK_DISABLED', 'false').lower() != 'true'
+TRACE_SAMPLER = os.getenv('OTEL_TRACES_SAMPLER', 'parentbased_traceidratio')
+TRACE_SAMPLE_RATIO = float(os.getenv('OTEL_TRACES_SAMPLER_ARG', 0.1))
+TRACE_KEEP_ERRORS = os.getenv('TRACE_KEEP_ERRORS', 'false').lower() == 'true'
+TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', 0))
+TRACE_ATTRIBUTE_COUNT_LIMIT = int(os.getenv('OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT', 32))
+TRACE_ATTRIBUTE_LENGTH_LIMIT = int(os.getenv('OTEL_SPAN_ATTRIBUTE_VALUE_LENGTH_LIMIT', 256))
+
+
+def head_sampler(name, ratio):
+    """The sampler an OTEL_TRACES_SAMPLER name stands for"""
+    samplers = {
+        'always_on': lambda: ALWAYS_ON,
+        'always_off': lambda: ALWAYS_OFF,
+        'traceidratio': lambda: TraceIdRatioBased(ratio),
+        'parentbased_always_on': lambda: ParentBased(ALWAYS_ON),
+        'parentbased_always_off': lambda: ParentBased(ALWAYS_OFF),
+        'parentbased_traceidratio': lambda: ParentBased(TraceIdRatioBased(ratio)),
+    }
+    if name not in samplers:
+        raise ValueError(f"Unknown OTEL_TRACES_SAMPLER {name!r}. Must be one of: {', '.join(samplers)}")
+    return samplers[name]()
+
+
+class RecordDropped(Sampler):
+    """Records the spans another sampler drops, so they can still be kept once they end"""
+
+    def __init__(self, sampler):
+        self._sampler = sampler
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None,
+                      trace_state=None):
+        result = self._sampler.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        if result.decision is Decision.DROP:
+            return SamplingResult(Decision.RECORD_ONLY, attributes, result.trace_state)
+        return result
+
+    def get_description(self):
+        return f"RecordDropped{{{self._sampler.get_description()}}}"
+
+
+def _as_sampled(span):
+    """Copy of an unsampled span flagged as sampled, since exporters only take sampled spans"""
+    return ReadableSpan(
+        name=span.name,
+        context=trace.SpanContext(span.context.trace_id, span.context.span_id, span.context.is_remote,
+                                  trace.TraceFlags(trace.TraceFlags.SAMPLED), span.context.trace_state),
+        parent=span.parent, resource=span.resource, attributes=span.attributes, events=span.events,
+        links=span.links, kind=span.kind, status=span.status, start_time=span.start_time,
+        end_time=span.end_time, instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class KeepErrorsAndSlowSpans(SpanProcessor):
+    """Passes sampled spans on, plus every unsampled span of a local trace
+    in which any span failed or ran slow"""
+
+    def __init__(self, processor, keep_errors, slow_seconds):
+        self._processor = processor
+        self._keep_errors = keep_errors
+        self._slow_ns = int(slow_seconds * 1e9) if slow_seconds > 0 else None
+        # trace id -> (local root span id, its finished spans, whether to keep them)
+        self._traces = {}
+        self._lock = threading.Lock()
+
+    def _worth_keeping(self, span):
+        if self._keep_errors and span.status.status_code is trace.StatusCode.ERROR:
+            return True
+        return self._slow_ns is not None and span.end_time - span.start_time >= self._slow_ns
+
+    @staticmethod
+    def _is_local_root(span):
+        return span.parent is None or span.parent.is_remote
+
+    def on_start(self, span, parent_context=None):
+        if not span.context.trace_flags.sampled and self._is_local_root(span):
+            with self._lock:
+                self._traces.setdefault(span.context.trace_id, [span.context.span_id, [], False])
+        self._processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span):
+        if span.context.trace_flags.sampled:
+            self._processor.on_end(span)
+            return
+        with self._lock:
+            held = self._traces.get(span.context.trace_id)
+            if held is None:
+                return  # its local root already ended
+            root_id, spans, _ = held
+            spans.append(span)
+            held[2] = held[2] or self._worth_keeping(span)
+            if span.context.span_id != root_id:
+                return
+            del self._traces[span.context.trace_id]
+            if not held[2]:
+                return
+        for finished in spans:
+            self._processor.on_end(_as_sampled(finished))
+
+    def shutdown(self):
+        self._processor.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self._processor.force_flush(timeout_millis)
+
+
+def build_tracer_provider(exporter, span_processor=BatchSpanProcessor):
+    """A tracer provider that samples as configured and exports to `exporter`"""
+    sampler = head_sampler(TRACE_SAMPLER, TRACE_SAMPLE_RATIO)
+    keep_unsampled = TRACE_KEEP_ERRORS or TRACE_SLOW_SECONDS > 0
+    provider = TracerProvider(
+        sampler=RecordDropped(sampler) if keep_unsampled else sampler,
+        span_limits=SpanLimits(max_attributes=TRACE_ATTRIBUTE_COUNT_LIMIT,
+                               max_attribute_length=TRACE_ATTRIBUTE_LENGTH_LIMIT),
+    )
+    processor = span_processor(exporter)
+    if keep_unsampled:
+        processor = KeepErrorsAndSlowSpans(processor, TRACE_KEEP_ERRORS, TRACE_SLOW_SECONDS)
+    provider.add_span_processor(processor)
+    return provider
+
+
+if TRACING_ENABLED:
+    trace.set_tracer_provider(build_tracer_provider(OTLPSpanExporter(endpoint=OTEL_ENDPOINT + '/v1/traces')))
+    # Instrument Flask and requests
+    FlaskInstrumentor().instrument_app(app)
+    RequestsInstrumentor().instrument()
+else:
+    logger.info("No OTLP endpoint configured, tracing is disabled")
+
 tracer = trace.get_tracer(__name__)
 
-otlp_exporter = OTLPSpanExporter(
-    endpoint=os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318') + '/v1/traces',
+# Prometheus metrics, scraped from GET /metrics. Under gunicorn, set
+# PROMETHEUS_MULTIPROC_DIR so every worker writes its samples there and a
+# scrape aggregates all of them (gunicorn.conf.py clears the directory).
+# 'openai' covers waiting for a concurrency slot, 429 retries and the call
+# itself (up to the first chunk for streams). Stages nest: 'extract'
+# (turning a completion into title/content/tips) includes the 'sanitize'
+# and 'chord_parse' time spent inside it.
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 20, 30, 60)
+STAGE_SECONDS = Histogram(
+    'prompt_service_stage_duration_seconds', 'Time spent in one stage of request handling',
+    ['stage', 'endpoint', 'model'], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'prompt_service_request_duration_seconds', 'Total handler time per request',
+    ['endpoint', 'fallback_reason'], buckets=STAGE_BUCKETS
+)
+TEMPLATE_FALLBACKS = Counter(
+    'prompt_service_template_fallbacks_total', 'Template results served instead of AI output',
+    ['endpoint', 'reason']
+)
+SANITIZER_REJECTIONS = Counter(
+    'prompt_service_sanitizer_rejections_total', 'Lines or completions the sanitizer rejected',
+    ['reason']
+)
+CACHE_LOOKUPS = Counter(
+    'prompt_service_cache_lookups_total', 'Cache and pre-generation pool lookups',
+    ['cache', 'result']
+)
+CACHE_TIER_EVENTS = Counter(
+    'prompt_service_cache_tier_events_total', 'Two-tier cache hits, misses and evictions per tier',
+    ['cache', 'tier', 'event']
 )
 
-span_processor = BatchSpanProcessor(otlp_exporter)
-trace.get_tracer_provider().add_span_processor(span_processor)
 
-# Instrument Flask and requests
-FlaskInstrumentor().instrument_app(app)
-RequestsInstrumentor().instrument()
+def metrics_endpoint():
+    """Route of the request being handled, 'background' outside requests"""
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
 
-# Redis connection
-redis_client = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379'))
+
+@contextmanager
+def stage_timer(stage, model=''):
+    """Observe the time spent in the with block as one stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage, metrics_endpoint(), model).observe(time.perf_counter() - started)
+
+
+def timed_stage(stage):
+    """Decorator form of stage_timer for (async) functions"""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def note_fallback(error, reason=None):
+    """Count a template fallback for the current request and remember its reason"""
+    reason = reason or fallback_reason(error)
+    TEMPLATE_FALLBACKS.labels(metrics_endpoint(), reason).inc()
+    if has_app_context():
+        g.fallback_reason = reason
+
+
+def fallback_reason(error):
+    """Short label for why AI output was replaced by a template"""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, ConcurrencyLimitExceeded):
+        return 'concurrency_limit'
+    if isinstance(error, DeadlineExceeded):
+        return 'deadline'
+    if isinstance(error, openai.error.RateLimitError):
+        return 'rate_limited'
+    if isinstance(error, openai.error.Timeout):
+        return 'timeout'
+    if isinstance(error, openai.error.OpenAIError):
+        return 'openai_error'
+    if isinstance(error, (ValueError, KeyError, IndexError)):
+        return 'invalid_output'
+    return 'error'
+
+
+def metrics_registry():
+    """The registry to expose: every worker's samples in multiprocess mode"""
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+# Redis connection (settings in redis_store.py, shared with the scripts)
+redis_client = connect_redis()
 
 # OpenAI configuration (optional - will fallback to template-based generation)
 openai_api_key = os.getenv('OPENAI_API_KEY')
@@ -54,6 +308,533 @@ else:
     USE_AI = False
     logger.info("OpenAI API key not found, using template-based generation")
 
+
+# Request deadlines. The backend sends X-Request-Deadline (Unix epoch
+# milliseconds) derived from its own axios timeout. A request that arrives
+# after it, e.g. having sat in the gunicorn backlog, gets a 504 at once;
+# otherwise the time left caps every OpenAI call made for the request, and
+# calls that would start after it raise DeadlineExceeded so the generators
+# fall back to templates instead of working for a client that has gone.
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of calling upstream once the request's deadline has passed"""
+
+
+def request_deadline():
+    """Monotonic deadline of the current request (None without the header)"""
+    return g.get('deadline') if has_app_context() else None
+
+
+def deadline_remaining():
+    """Seconds left before the request's deadline (None without one)"""
+    deadline = request_deadline()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining
+
+
+def _deadline_params(ai_request):
+    """The request's OpenAI params with request_timeout capped by the time left"""
+    params = dict(ai_request['params'])
+    remaining = deadline_remaining()
+    if remaining is not None:
+        params['request_timeout'] = min(params.get('request_timeout', remaining), remaining)
+    return params
+
+
+# Circuit breakers around OpenAI, one per model and per worker. A breaker
+# opens when, over the last CIRCUIT_BREAKER_WINDOW seconds and at least
+# CIRCUIT_BREAKER_MIN_CALLS calls, the share of failed or slow calls reaches
+# CIRCUIT_BREAKER_FAILURE_RATE. While open, calls raise CircuitOpenError at
+# once so the generators go straight to their template fallbacks. After
+# CIRCUIT_BREAKER_OPEN_SECONDS one probe call is let through (half-open):
+# success closes the breaker, failure opens it again.
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+CIRCUIT_BREAKER_WINDOW = int(os.getenv('CIRCUIT_BREAKER_WINDOW', 60))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', 5))
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv('CIRCUIT_BREAKER_FAILURE_RATE', 0.5))
+CIRCUIT_BREAKER_SLOW_SECONDS = float(os.getenv('CIRCUIT_BREAKER_SLOW_SECONDS', 45))
+CIRCUIT_BREAKER_OPEN_SECONDS = int(os.getenv('CIRCUIT_BREAKER_OPEN_SECONDS', 30))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OpenAI while a model's breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a sliding window of call outcomes"""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.calls = deque()  # (finished_at, latency, failed)
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] < now - CIRCUIT_BREAKER_WINDOW:
+            self.calls.popleft()
+
+    def _transition(self, state, now):
+        logger.warning(f"[CIRCUIT] {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == 'open':
+            self.opened_at = now
+        self.probe_started = None
+
+    def allow(self):
+        """True if a call may go upstream now (claims the probe when half-open)"""
+        now = time.monotonic()
+        with self.lock:
+            if self.state == 'open' and now - self.opened_at >= CIRCUIT_BREAKER_OPEN_SECONDS:
+                self._transition('half_open', now)
+            # A probe that never reported back frees its slot after the open period
+            if self.state == 'half_open' and (self.probe_started is None or
+                                              now - self.probe_started >= CIRCUIT_BREAKER_OPEN_SECONDS):
+                self.probe_started = now
+                return True
+            if self.state == 'closed':
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, latency, error=None):
+        """Record one finished call; slow calls count as failures"""
+        failed = error is not None or latency >= CIRCUIT_BREAKER_SLOW_SECONDS
+        now = time.monotonic()
+        with self.lock:
+            self.calls.append((now, latency, failed))
+            self._trim(now)
+            if self.state == 'half_open':
+                self._transition('open' if failed else 'closed', now)
+                if not failed:
+                    self.calls.clear()
+            elif self.state == 'closed' and len(self.calls) >= CIRCUIT_BREAKER_MIN_CALLS:
+                failures = sum(1 for _, _, call_failed in self.calls if call_failed)
+                if failures / len(self.calls) >= CIRCUIT_BREAKER_FAILURE_RATE:
+                    self._transition('open', now)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            self._trim(now)
+            latencies = sorted(latency for _, latency, _ in self.calls)
+            failures = sum(1 for _, _, failed in self.calls if failed)
+            return {
+                'state': self.state,
+                'calls': len(self.calls),
+                'failureRate': round(failures / len(self.calls), 4) if self.calls else 0.0,
+                'latencyP50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                'latencyP95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                'rejected': self.rejected,
+                'retryInSeconds': max(0, round(self.opened_at + CIRCUIT_BREAKER_OPEN_SECONDS - now, 1))
+                                  if self.state == 'open' else 0
+            }
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(model):
+    """The breaker for one OpenAI model, created on first use"""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(model)
+        if breaker is None:
+            breaker = _circuit_breakers[model] = CircuitBreaker(model)
+        return breaker
+
+
+def _circuit_check(ai_request):
+    """Return the request's breaker (None if disabled), raising if it is open"""
+    if not CIRCUIT_BREAKER_ENABLED:
+        return None
+    breaker = circuit_breaker(ai_request['model'])
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for {ai_request['model']}")
+    return breaker
+
+
+def _circuit_record(breaker, started, error=None):
+    # A request OpenAI rejected as malformed, one that never got a concurrency
+    # slot, or one that was never sent because the caller's deadline had
+    # passed says nothing about its health. A request that was sent and timed
+    # out, even with a timeout capped by the deadline, counts as a failure.
+    if breaker is None or isinstance(error, (openai.error.InvalidRequestError, ConcurrencyLimitExceeded,
+                                             DeadlineExceeded)):
+        return
+    breaker.record(time.monotonic() - started, error)
+
+
+# Adaptive concurrency limits on OpenAI calls, one pool per model and per
+# worker, so slow gpt-4o vision feedback can't take the slots cheap
+# gpt-3.5-turbo generation needs. Limits follow AIMD. A call that finishes
+# under the model's target latency raises the limit by 1/limit. A rate limit
+# (429) or a call at or over the target multiplies it by
+# CONCURRENCY_DECREASE_FACTOR, at most once per round of calls in flight. A
+# caller waits up to CONCURRENCY_QUEUE_SECONDS, or until its deadline, for a
+# slot before raising ConcurrencyLimitExceeded. 429s are retried up to
+# OPENAI_MAX_RETRIES times after a full-jitter exponential backoff (at least
+# any Retry-After), as long as the retry starts before the request's deadline.
+CONCURRENCY_LIMIT_ENABLED = os.getenv('CONCURRENCY_LIMIT_ENABLED', 'true').lower() == 'true'
+CONCURRENCY_LIMITS = MappingProxyType({
+    # model: (initial, minimum, maximum, target latency in seconds)
+    'gpt-4o': (int(os.getenv('CONCURRENCY_LIMIT_GPT_4O', 4)), 1, 16, 20.0),
+    'gpt-3.5-turbo': (int(os.getenv('CONCURRENCY_LIMIT_GPT_35_TURBO', 8)), 2, 64, 8.0),
+})
+CONCURRENCY_LIMIT_DEFAULT = (4, 1, 16, 15.0)
+CONCURRENCY_DECREASE_FACTOR = float(os.getenv('CONCURRENCY_DECREASE_FACTOR', 0.5))
+CONCURRENCY_QUEUE_SECONDS = float(os.getenv('CONCURRENCY_QUEUE_SECONDS', 2))
+CONCURRENCY_POLL_SECONDS = 0.01
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv('OPENAI_RETRY_BASE_SECONDS', 0.5))
+OPENAI_RETRY_MAX_SECONDS = float(os.getenv('OPENAI_RETRY_MAX_SECONDS', 8))
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when no upstream slot for the model frees up in time"""
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one model's OpenAI calls"""
+
+    def __init__(self, name, initial, minimum, maximum, target_latency):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.decreased_at = 0.0
+        self.rejected = 0
+        self.throttled = 0
+        self.retries = 0
+        self.cond = threading.Condition()
+
+    def _has_slot(self):
+        return self.in_flight < int(self.limit)
+
+    def try_acquire(self):
+        """Take a slot if one is free right now"""
+        with self.cond:
+            if not self._has_slot():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, timeout):
+        """Take a slot, waiting at most timeout seconds for one"""
+        give_up = time.monotonic() + timeout
+        with self.cond:
+            while not self._has_slot():
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self.cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    async def aacquire(self, timeout):
+        """Async variant of acquire (polls so the event loop never blocks)"""
+        give_up = time.monotonic() + timeout
+        while not self.try_acquire():
+            if time.monotonic() >= give_up:
+                with self.cond:
+                    self.rejected += 1
+                return False
+            await asyncio.sleep(CONCURRENCY_POLL_SECONDS)
+        return True
+
+    def release(self, started, latency, error=None):
+        """Free a slot and adjust the limit from the call's outcome"""
+        with self.cond:
+            self.in_flight -= 1
+            throttled = isinstance(error, openai.error.RateLimitError)
+            if throttled:
+                self.throttled += 1
+            if throttled or latency >= self.target_latency:
+                # Calls started before the last cut saw the old limit; one
+                # congestion event only shrinks the limit once
+                if started >= self.decreased_at:
+                    self.limit = max(self.minimum, self.limit * CONCURRENCY_DECREASE_FACTOR)
+                    self.decreased_at = time.monotonic()
+            elif error is None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                'limit': int(self.limit),
+                'inFlight': self.in_flight,
+                'minimum': self.minimum,
+                'maximum': self.maximum,
+                'targetLatency': self.target_latency,
+                'rejected': self.rejected,
+                'throttled': self.throttled,
+                'retries': self.retries
+            }
+
+
+_concurrency_limiters = {}
+_concurrency_limiters_lock = threading.Lock()
+
+
+def concurrency_limiter(model):
+    """The concurrency limiter for one OpenAI model, created on first use"""
+    with _concurrency_limiters_lock:
+        limiter = _concurrency_limiters.get(model)
+        if limiter is None:
+            limiter = _concurrency_limiters[model] = AdaptiveLimiter(
+                model, *CONCURRENCY_LIMITS.get(model, CONCURRENCY_LIMIT_DEFAULT)
+            )
+        return limiter
+
+
+class UpstreamSlot:
+    """One acquired concurrency slot (limiter is None with limits disabled)"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.latency = None
+
+    def responded(self):
+        """Mark when OpenAI answered; a stream's slot is held past this point"""
+        self.latency = time.monotonic() - self.started
+
+    def release(self, error=None):
+        if self.limiter is None:
+            return
+        latency = self.latency if self.latency is not None else time.monotonic() - self.started
+        self.limiter.release(self.started, latency, error)
+        self.limiter = None
+
+
+def _slot_timeout():
+    remaining = deadline_remaining()
+    return CONCURRENCY_QUEUE_SECONDS if remaining is None else min(CONCURRENCY_QUEUE_SECONDS, remaining)
+
+
+def acquire_upstream_slot(model):
+    """Wait for a slot in the model's concurrency limit"""
+    if not CONCURRENCY_LIMIT_ENABLED:
+        return UpstreamSlot(None)
+    limiter = concurrency_limiter(model)
+    if not limiter.acquire(_slot_timeout()):
+        raise ConcurrencyLimitExceeded(f"No upstream slot free for {model}")
+    return UpstreamSlot(limiter)
+
+
+async def aacquire_upstream_slot(model):
+    """Async variant of acquire_upstream_slot"""
+    if not CONCURRENCY_LIMIT_ENABLED:
+        return UpstreamSlot(None)
+    limiter = concurrency_limiter(model)
+    if not await limiter.aacquire(_slot_timeout()):
+        raise ConcurrencyLimitExceeded(f"No upstream slot free for {model}")
+    return UpstreamSlot(limiter)
+
+
+def _rate_limit_retry_delay(ai_request, attempt, error):
+    """Seconds to back off before retrying a 429, or None to give up"""
+    if attempt >= OPENAI_MAX_RETRIES:
+        return None
+    delay = random.uniform(0, min(OPENAI_RETRY_MAX_SECONDS, OPENAI_RETRY_BASE_SECONDS * 2 ** attempt))
+    try:
+        delay = max(delay, float((getattr(error, 'headers', None) or {}).get('retry-after', 0)))
+    except (TypeError, ValueError):
+        pass
+    deadline = request_deadline()
+    if deadline is not None and time.monotonic() + delay >= deadline:
+        return None
+    if CONCURRENCY_LIMIT_ENABLED:
+        limiter = concurrency_limiter(ai_request['model'])
+        with limiter.cond:
+            limiter.retries += 1
+    logger.warning(f"[LIMIT] {ai_request['model']} rate limited, retry {attempt + 1} in {delay:.2f}s")
+    return delay
+
+
+def call_upstream(ai_request, call):
+    """Run call(params) in one of the model's concurrency slots, retrying 429s.
+    Returns (result, slot); the caller releases the slot."""
+    attempt = 0
+    while True:
+        params = _deadline_params(ai_request)
+        slot = acquire_upstream_slot(ai_request['model'])
+        try:
+            result = call(params)
+        except openai.error.RateLimitError as e:
+            slot.release(e)
+            delay = _rate_limit_retry_delay(ai_request, attempt, e)
+            if delay is None:
+                raise
+            attempt += 1
+            time.sleep(delay)
+            continue
+        except Exception as e:
+            slot.release(e)
+            raise
+        slot.responded()
+        return result, slot
+
+
+async def acall_upstream(ai_request, call):
+    """Async variant of call_upstream; call(params) returns an awaitable"""
+    attempt = 0
+    while True:
+        params = _deadline_params(ai_request)
+        slot = await aacquire_upstream_slot(ai_request['model'])
+        try:
+            result = await call(params)
+        except openai.error.RateLimitError as e:
+            slot.release(e)
+            delay = _rate_limit_retry_delay(ai_request, attempt, e)
+            if delay is None:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        except BaseException as e:
+            slot.release(e)
+            raise
+        slot.responded()
+        return result, slot
+
+
+def concurrency_limit_stats():
+    """Every model's concurrency limit in this worker"""
+    with _concurrency_limiters_lock:
+        limiters = list(_concurrency_limiters.values())
+    return {
+        'enabled': CONCURRENCY_LIMIT_ENABLED,
+        'limits': {limiter.name: limiter.snapshot() for limiter in limiters}
+    }
+
+
+def chat_completion(ai_request):
+    """Run a blocking OpenAI chat completion and return the message text"""
+    breaker = _circuit_check(ai_request)
+    started = time.monotonic()
+    try:
+        with stage_timer('openai', ai_request['model']):
+            response, slot = call_upstream(ai_request, lambda params: openai.ChatCompletion.create(
+                model=ai_request['model'],
+                messages=ai_request['messages'],
+                **params
+            ))
+    except Exception as e:
+        _circuit_record(breaker, started, e)
+        raise
+    slot.release()
+    _circuit_record(breaker, started)
+    return response['choices'][0]['message']['content']
+
+
+async def achat_completion(ai_request):
+    """Async variant of chat_completion (aiohttp under the hood)"""
+    breaker = _circuit_check(ai_request)
+    started = time.monotonic()
+    try:
+        with stage_timer('openai', ai_request['model']):
+            response, slot = await acall_upstream(ai_request, lambda params: openai.ChatCompletion.acreate(
+                model=ai_request['model'],
+                messages=ai_request['messages'],
+                **params
+            ))
+    except Exception as e:
+        _circuit_record(breaker, started, e)
+        raise
+    slot.release()
+    _circuit_record(breaker, started)
+    return response['choices'][0]['message']['content']
+
+
+def stream_chat_completion(ai_request):
+    """Run a streaming OpenAI chat completion and yield the text as it arrives.
+    The concurrency slot is held until the stream ends."""
+    breaker = _circuit_check(ai_request)
+    started = time.monotonic()
+    slot = None
+    try:
+        with stage_timer('openai', ai_request['model']):
+            response, slot = call_upstream(ai_request, lambda params: openai.ChatCompletion.create(
+                model=ai_request['model'],
+                messages=ai_request['messages'],
+                stream=True,
+                **params
+            ))
+        for chunk in response:
+            # request_timeout bounds each read, not the whole stream
+            deadline_remaining()
+            text = chunk['choices'][0]['delta'].get('content')
+            if text:
+                yield text
+    except GeneratorExit:
+        # The client went away mid-stream; upstream was fine
+        slot.release()
+        _circuit_record(breaker, started)
+        raise
+    except Exception as e:
+        if slot is not None:
+            slot.release(e)
+        _circuit_record(breaker, started, e)
+        raise
+    slot.release()
+    _circuit_record(breaker, started)
+
+
+def circuit_breaker_stats():
+    """State of every model's breaker in this worker"""
+    with _circuit_breakers_lock:
+        breakers = list(_circuit_breakers.values())
+    return {
+        'enabled': CIRCUIT_BREAKER_ENABLED,
+        'breakers': {breaker.name: breaker.snapshot() for breaker in breakers}
+    }
+
+
+# Async Redis clients, one per event loop (asyncio connections can't be
+# shared between loops)
+_async_redis_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """Return the async Redis client bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_redis_clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(REDIS_URL,
+                                   socket_timeout=REDIS_SOCKET_TIMEOUT,
+                                   socket_connect_timeout=REDIS_SOCKET_TIMEOUT)
+        _async_redis_clients[loop] = client
+    return client
+
+
+async def close_async_redis():
+    """Close the running loop's async Redis client, for short-lived loops"""
+    client = _async_redis_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def _freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
 # Emotion data for chord progression generation
 EMOTIONS = [
     {
@@ -278,199 +1059,723 @@ def get_random_word_count_and_difficulty():
     return word_count, difficulty
 
 
+# Precompiled patterns for sanitize_ai_content. Each corruption indicator
+# keeps its own pattern so flagged lines are scored exactly as before.
+_SANITIZE_INDICATORS = (
+    # (pattern, weight)
+    (re.compile(r'\\\\x[0-9A-Fa-f]'), 3),                                           # hex escapes
+    (re.compile(r'<[^>]*>'), 2),                                                    # html tags
+    (re.compile(r'(file://|ftp://|hidden_params|innerHTML|getElementById)'), 5),    # protocols
+    (re.compile(r'[█▓▒░]'), 3),                                                     # block characters
+    (re.compile(r'[!@#$%^&*()+={}\[\]|\\:;"<>?,./]{5,}'), 2),                       # punctuation clusters
+    (re.compile(r'(\$\(|\.entrySet\(|@@|[µ°†Δφε☐])'), 3),                           # code patterns
+)
+_SANITIZE_PUNCT_CLUSTER = _SANITIZE_INDICATORS[4][0]
+# Substrings at least one of which every other indicator match contains.
+# Documents with none of them and no punctuation cluster skip line scoring.
+_SANITIZE_TRIGGERS = (
+    '\\\\x', '<', 'file://', 'ftp://', 'hidden_params', 'innerHTML', 'getElementById',
+    '$(', '.entrySet(', '@@', *'█▓▒░µ°†Δφε☐'
+)
+_SANITIZE_SUSPECT = re.compile('|'.join(f'(?:{pattern.pattern})' for pattern, _ in _SANITIZE_INDICATORS))
+_SANITIZE_SUSPICIOUS_START = re.compile(r'^\s*[.=]="<|^\s*[{\[][@$]|^\s*\\x')
+_SANITIZE_CLEANUPS = (
+    re.compile(r'\\\\x[0-9A-Fa-f]{2}'),
+    re.compile(r'[█▓▒░]+'),
+    re.compile(r'\\\\u[0-9A-Fa-f]{4}'),
+)
+_SANITIZE_CLEANUP_TRIGGERS = ('\\', *'█▓▒░')
+_SANITIZE_ASCII_CONTROL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_SANITIZE_BLANK_RUNS = re.compile(r'\n{3,}')
+_SANITIZE_HEADER_PREFIXES = ('Title:', 'Step', '##', '#', '**', '-')
+_SANITIZE_KNOWN_CAPITALIZED = ('Serum', 'Phase', 'Plant', 'Vital', 'FM', 'LFO')
+
+
+def _max_capitalized_run(words):
+    """Longest run of consecutive capitalized words, skipping the first word.
+
+    A known synth term (Serum, LFO, ...) discards the run it interrupts.
+    """
+    longest = 0
+    current_seq = 0
+    for i, word in enumerate(words):
+        clean_word = word.strip('.,;:!?()[]')
+        if i > 0 and len(clean_word) > 1 and clean_word[0].isupper():
+            if not any(keyword in clean_word for keyword in _SANITIZE_KNOWN_CAPITALIZED):
+                current_seq += 1
+            else:
+                current_seq = 0
+        else:
+            longest = max(longest, current_seq)
+            current_seq = 0
+    return max(longest, current_seq)
+
+
+@timed_stage('sanitize')
 def sanitize_ai_content(content):
     """Sanitize AI-generated content to remove garbled text and corruption"""
     if not content:
         return None
-    
-    import unicodedata
-    
-    # Remove control characters except newlines, carriage returns, and tabs
-    content = ''.join(char for char in content if unicodedata.category(char)[0] != 'C' or char in '\n\r\t')
-    
-    # Detect and remove corrupted lines
-    lines = content.split('\n')
+
+    # Remove control characters except newlines, carriage returns, and tabs.
+    # Non-ASCII text checks each distinct character once, and remembers the
+    # other unprintable ones (odd spaces, separators) for the final check.
+    unprintable_chars = ()
+    if content.isascii():
+        if _SANITIZE_ASCII_CONTROL.search(content):
+            content = _SANITIZE_ASCII_CONTROL.sub('', content)
+    else:
+        control_chars = {}
+        unprintable_chars = []
+        for char in set(content):
+            if char.isprintable() or char in '\n\r\t':
+                continue
+            if unicodedata.category(char)[0] == 'C':
+                control_chars[ord(char)] = None
+            else:
+                unprintable_chars.append(char)
+        if control_chars:
+            content = content.translate(control_chars)
+
+    # Only score and clean lines when the document has something to find
+    has_suspects = (any(trigger in content for trigger in _SANITIZE_TRIGGERS)
+                    or _SANITIZE_PUNCT_CLUSTER.search(content) is not None)
+    needs_cleanup = any(trigger in content for trigger in _SANITIZE_CLEANUP_TRIGGERS)
+
+    # Detect and remove corrupted lines, and note the first word-salad line
     cleaned_lines = []
-    
-    for line in lines:
+    word_salad_line = None
+
+    for line in content.split('\n'):
         stripped_line = line.strip()
-        
+
         # Skip empty lines (but preserve them for formatting)
         if not stripped_line:
             cleaned_lines.append(line)
             continue
-        
-        # Count various corruption indicators
-        hex_escapes = len(re.findall(r'\\\\x[0-9A-Fa-f]', line))
-        html_tags = len(re.findall(r'<[^>]*>', line))
-        protocols = len(re.findall(r'(file://|ftp://|hidden_params|innerHTML|getElementById)', line))
-        blocks = len(re.findall(r'[█▓▒░]', line))
-        punct_clusters = len(re.findall(r'[!@#$%^&*()+={}\[\]|\\:;"<>?,./]{5,}', line))
-        code_patterns = len(re.findall(r'(\$\(|\.entrySet\(|@@|[µ°†Δφε☐])', line))
-        
-        # Calculate corruption score
-        corruption_score = hex_escapes * 3 + html_tags * 2 + protocols * 5 + blocks * 3 + punct_clusters * 2 + code_patterns * 3
-        
-        # If corruption score is too high, skip the line
-        if len(stripped_line) > 10 and corruption_score > len(stripped_line) * 0.2:
-            logger.warning(f"[SANITIZE] Skipping corrupted line: {stripped_line[:80]}")
-            continue
-        
+
+        # Score corruption indicators (only lines with at least one)
+        if has_suspects and _SANITIZE_SUSPECT.search(line):
+            corruption_score = sum(len(pattern.findall(line)) * weight for pattern, weight in _SANITIZE_INDICATORS)
+
+            # If corruption score is too high, skip the line
+            if len(stripped_line) > 10 and corruption_score > len(stripped_line) * 0.2:
+                logger.warning(f"[SANITIZE] Skipping corrupted line: {stripped_line[:80]}")
+                SANITIZER_REJECTIONS.labels('corrupted_line').inc()
+                continue
+
         # If line starts with suspicious patterns, skip it
-        if re.match(r'^\s*[.=]="<|^\s*[{\[][@$]|^\s*\\x', line):
+        if _SANITIZE_SUSPICIOUS_START.match(line):
             logger.warning(f"[SANITIZE] Skipping suspicious line: {stripped_line[:80]}")
+            SANITIZER_REJECTIONS.labels('suspicious_line').inc()
             continue
-        
+
         # Clean up remaining minor issues
-        line = re.sub(r'\\\\x[0-9A-Fa-f]{2}', '', line)
-        line = re.sub(r'[█▓▒░]+', '', line)
-        line = re.sub(r'\\\\u[0-9A-Fa-f]{4}', '', line)
-        
+        if needs_cleanup:
+            for pattern in _SANITIZE_CLEANUPS:
+                line = pattern.sub('', line)
+
         cleaned_lines.append(line)
-    
+
+        # Look for lines with excessive capitalized words in sequence (likely
+        # corruption). Title lines and headers naturally have capitalized words,
+        # and only lines of more than 15 words are checked.
+        if word_salad_line is None and len(stripped_line) > 30:
+            if not line.strip().startswith(_SANITIZE_HEADER_PREFIXES):
+                words = line.split()
+                # 8+ consecutive capitalized words is very suspicious
+                if len(words) > 15 and _max_capitalized_run(words) >= 8:
+                    word_salad_line = line
+
     content = '\n'.join(cleaned_lines)
-    content = re.sub(r'\n{3,}', '\n\n', content)
-    
+    content = _SANITIZE_BLANK_RUNS.sub('\n\n', content)
+
     # Final validation: Check if remaining content is mostly printable
-    if len(content) > 50:
-        printable_ratio = sum(1 for c in content if c.isprintable() or c in '\n\r\t') / len(content)
+    if len(content) > 50 and unprintable_chars:
+        unprintable = sum(content.count(char) for char in unprintable_chars)
+        printable_ratio = (len(content) - unprintable) / len(content)
         if printable_ratio < 0.85:
             logger.error(f"[SANITIZE] Content failed printability check ({printable_ratio:.2%}), returning None")
+            SANITIZER_REJECTIONS.labels('unprintable').inc()
             return None
 
     # Check for semantic corruption patterns (word salad, incoherent text)
-    # Look for lines with excessive capitalized words in sequence (likely corruption)
-    for line in content.split('\n'):
-        # Skip title lines and headers - they naturally have capitalized words
-        if line.strip().startswith(('Title:', 'Step', '##', '#', '**', '-')):
-            continue
+    if word_salad_line is not None:
+        logger.warning(f"[SANITIZE] Detected suspicious capitalization pattern (word salad): {word_salad_line[:100]}")
+        SANITIZER_REJECTIONS.labels('word_salad').inc()
+        return None
 
-        words = line.split()
-        if len(words) > 15:  # Only check longer lines
-            # Count consecutive capitalized words (excluding proper sentence starts)
-            cap_sequences = []
-            current_seq = 0
-            for i, word in enumerate(words):
-                # Skip first word of sentence and common capitalized terms
-                clean_word = word.strip('.,;:!?()[]')
-                if i > 0 and len(clean_word) > 1 and clean_word[0].isupper():
-                    # Skip if it looks like a known proper noun pattern (artist/synth names)
-                    if not any(keyword in clean_word for keyword in ['Serum', 'Phase', 'Plant', 'Vital', 'FM', 'LFO']):
-                        current_seq += 1
-                    else:
-                        current_seq = 0
-                else:
-                    if current_seq >= 8:  # 8+ consecutive capitalized words is very suspicious
-                        cap_sequences.append(current_seq)
-                    current_seq = 0
+    return content.strip()
 
-            # Check the final sequence
-            if current_seq >= 8:
-                cap_sequences.append(current_seq)
 
-            if cap_sequences and max(cap_sequences) >= 8:
-                logger.warning(f"[SANITIZE] Detected suspicious capitalization pattern (word salad): {line[:100]}")
+def sanitize_ai_stream(chunks):
+    """Regroup streamed completion text into lines and sanitize each line as
+    it completes. Rejected lines are dropped rather than failing the whole
+    completion, and runs of blank lines collapse to one as in
+    sanitize_ai_content."""
+    buffer = ''
+    blank = True  # also drops leading blank lines
+
+    def clean(line):
+        nonlocal blank
+        if not line.strip():
+            if blank:
                 return None
+            blank = True
+            return ''
+        sanitized = sanitize_ai_content(line)
+        if not sanitized:
+            return None
+        blank = False
+        # Keep the indentation of nested bullets
+        return line[:len(line) - len(line.lstrip())] + sanitized
+
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            line = clean(line)
+            if line is not None:
+                yield line
+    if buffer:
+        line = clean(buffer)
+        if line:
+            yield line
+
+# Chord symbol grammar. Intervals (semitones above the root) for each
+# canonical chord quality; _chord_quality() normalizes spellings to these
+# keys and reads anything after the longest matching key as alterations and
+# added tones.
+CHORD_QUALITY_INTERVALS = _freeze({
+    '': [0, 4, 7],
+    'm': [0, 3, 7],
+    '5': [0, 7],
+    'dim': [0, 3, 6],
+    'aug': [0, 4, 8],
+    'sus2': [0, 2, 7],
+    'sus4': [0, 5, 7],
+    '6': [0, 4, 7, 9],
+    'm6': [0, 3, 7, 9],
+    '69': [0, 4, 7, 9, 14],
+    'm69': [0, 3, 7, 9, 14],
+    '7': [0, 4, 7, 10],
+    'maj7': [0, 4, 7, 11],
+    'm7': [0, 3, 7, 10],
+    'mmaj7': [0, 3, 7, 11],
+    'dim7': [0, 3, 6, 9],
+    'm7b5': [0, 3, 6, 10],
+    'aug7': [0, 4, 8, 10],
+    'augmaj7': [0, 4, 8, 11],
+    '7sus2': [0, 2, 7, 10],
+    '7sus4': [0, 5, 7, 10],
+    '9': [0, 4, 7, 10, 14],
+    'maj9': [0, 4, 7, 11, 14],
+    'm9': [0, 3, 7, 10, 14],
+    'mmaj9': [0, 3, 7, 11, 14],
+    '9sus4': [0, 5, 7, 10, 14],
+    '11': [0, 4, 7, 10, 14, 17],
+    'maj11': [0, 4, 7, 11, 14, 17],
+    'm11': [0, 3, 7, 10, 14, 17],
+    '13': [0, 4, 7, 10, 14, 21],
+    'maj13': [0, 4, 7, 11, 14, 21],
+    'm13': [0, 3, 7, 10, 14, 21],
+    'add2': [0, 2, 4, 7],
+    'add4': [0, 4, 5, 7],
+    'add9': [0, 4, 7, 14],
+    'add11': [0, 4, 7, 17],
+    'madd9': [0, 3, 7, 14],
+    'madd11': [0, 3, 7, 17],
+})
+_CHORD_QUALITIES_BY_LENGTH = tuple(sorted(CHORD_QUALITY_INTERVALS, key=len, reverse=True))
+
+# (root, quality) -> notes for every canonical quality on roots C4..B4
+CHORD_NOTES = _freeze({
+    (60 + root, quality): [60 + root + interval for interval in intervals]
+    for root in range(12)
+    for quality, intervals in CHORD_QUALITY_INTERVALS.items()
+})
+
+_NOTE_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+_ACCIDENTAL_SEMITONES = {'#': 1, '♯': 1, 'b': -1, '♭': -1}
+_DEGREE_SEMITONES = {'2': 2, '4': 5, '5': 7, '6': 9, '9': 14, '11': 17, '13': 21}
+
+# Root letter, up to two accidentals, the quality as written, and an
+# optional slash bass. "6/9" stays in the quality because a bass has to be a
+# note letter.
+_CHORD_SYMBOL = re.compile(r'([A-Ga-g])([#♯b♭]{0,2})(.*?)(?:\s*/\s*([A-Ga-g])([#♯b♭]{0,2}))?')
+# A hyphen separates chords only with whitespace on a side ("Dm7 - G7") or
+# right before a new root ("Dm7-G7"); inside a symbol it is part of the
+# spelling ("Bm7-5", "C half-dim")
+_CHORD_DELIMITERS = re.compile(r'\s*(?:->|[–—→|,;])\s*|\s+-\s*|-\s+|-(?=[A-G])')
+
+# Quality spellings rewritten to canonical keys, in order (case matters for
+# M = major vs m = minor until the final lower())
+_QUALITY_REWRITES = tuple((re.compile(pattern, flags), replacement) for pattern, flags, replacement in (
+    (r'[\s()\[\]]+', 0, ''),
+    (r'half-?dim(?:inished)?7?|ø7?', re.IGNORECASE, 'm7b5'),
+    (r'dim(?:inished)?|°', re.IGNORECASE, 'dim'),
+    (r'aug(?:mented)?|\+', re.IGNORECASE, 'aug'),
+    (r'maj(?:or)?', re.IGNORECASE, 'maj'),
+    (r'min(?:or)?|mi(?!t)', re.IGNORECASE, 'm'),
+    (r'[Δ△](?=\d)', 0, 'maj'),
+    (r'[Δ△]', 0, 'maj7'),
+    (r'M', 0, 'maj'),
+    (r'dom|^maj$', re.IGNORECASE, ''),
+    (r'power', re.IGNORECASE, '5'),
+    (r'6/9', 0, '69'),
+    (r'-(?=5)', 0, 'b'),
+    (r'sus(?![24])', re.IGNORECASE, 'sus4'),
+))
+
+# Alterations and added tones after a base quality ("7b9#11", "m7add11",
+# "maj7no3"): add, sus, omit, altered degree, plain extension
+_QUALITY_MODIFIER = re.compile(r'add(2|4|6|9|11|13)|sus([24])|(?:no|omit)([35])|([b#])(5|9|11|13)|(9|11|13)')
+
+
+@functools.lru_cache(maxsize=1024)
+def _chord_quality(quality, lenient=False):
+    """Return (key, intervals) for a quality as written after the root, or None
+    if it isn't one. Lenient lookups settle for the longest recognized prefix
+    ("7alt" plays as a 7th chord)."""
+    key = quality
+    for pattern, replacement in _QUALITY_REWRITES:
+        key = pattern.sub(replacement, key)
+    key = key.lower()
+    if key in CHORD_QUALITY_INTERVALS:
+        return key, CHORD_QUALITY_INTERVALS[key]
+
+    partial = None
+    for base in _CHORD_QUALITIES_BY_LENGTH:
+        if not key.startswith(base):
+            continue
+        intervals = set(CHORD_QUALITY_INTERVALS[base])
+        position = len(base)
+        while position < len(key):
+            modifier = _QUALITY_MODIFIER.match(key, position)
+            if not modifier:
+                break
+            add, sus, omit, accidental, altered, extension = modifier.groups()
+            if add:
+                intervals.add(_DEGREE_SEMITONES[add])
+            elif sus:
+                intervals -= {3, 4}
+                intervals.add(_DEGREE_SEMITONES[sus])
+            elif omit:
+                intervals -= {3, 4} if omit == '3' else {7}
+            elif accidental:
+                if altered == '5':
+                    intervals.discard(7)
+                intervals.add(_DEGREE_SEMITONES[altered] + (1 if accidental == '#' else -1))
+            else:
+                intervals.add(_DEGREE_SEMITONES[extension])
+            position = modifier.end()
+        if position == len(key):
+            return key, tuple(sorted(intervals))
+        if lenient and partial is None:
+            partial = key, tuple(sorted(intervals))
+    return partial
+
+
+def _note_number(letter, accidentals):
+    """MIDI note number in the C4..B4 octave for a note letter and its accidentals"""
+    semitone = _NOTE_SEMITONES[letter.upper()] + sum(_ACCIDENTAL_SEMITONES[a] for a in accidentals)
+    return 60 + semitone % 12
 
-    return content.strip()
 
 def chord_name_to_midi_notes(chord_name, root_note=60):
     """
-    Convert a chord name like 'Cmaj7' or 'Am add9' to MIDI note numbers.
-    Returns a list of MIDI note numbers.
+    Convert a chord quality like 'maj7', 'm7b5' or 'm add9' to MIDI note numbers.
+    Unrecognized text after a known quality is ignored; anything else is a
+    major triad. Returns a list of MIDI note numbers.
     """
-    # Basic chord note mappings (intervals from root)
-    chord_patterns = {
-        'major': [0, 4, 7],
-        'minor': [0, 3, 7],
-        'maj7': [0, 4, 7, 11],
-        'minor7': [0, 3, 7, 10],
-        'm7': [0, 3, 7, 10],
-        'add9': [0, 4, 7, 14],  # root, major 3rd, 5th, 9th (octave + 2)
-        'sus2': [0, 2, 7],
-        'sus4': [0, 5, 7],
-        'dim': [0, 3, 6],
-        'dim7': [0, 3, 6, 9],
-        'maj9': [0, 4, 7, 11, 14],
-        'minor9': [0, 3, 7, 10, 14],
-        'm9': [0, 3, 7, 10, 14],
-        'add11': [0, 4, 7, 17],
-        '6': [0, 4, 7, 9],
-        'minor6': [0, 3, 7, 9],
-        'm6': [0, 3, 7, 9],
-        'power': [0, 7],  # power chord (root and 5th)
-    }
+    key, intervals = _chord_quality(chord_name, lenient=True)
+    notes = CHORD_NOTES.get((root_note, key))
+    if notes is None:
+        return [root_note + interval for interval in intervals]
+    return list(notes)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_chord_symbol(symbol):
+    """Return (root, notes) for one chord symbol, or None unless all of it is
+    one: an upper-case root and a quality the grammar knows (so words like
+    "and" or "a" are not read as A chords)."""
+    match = _CHORD_SYMBOL.fullmatch(symbol)
+    if not match or match.group(1).islower() or _chord_quality(match.group(3)) is None:
+        return None
+    letter, accidentals, quality, bass_letter, bass_accidentals = match.groups()
+
+    root = _note_number(letter, accidentals)
+    notes = chord_name_to_midi_notes(quality, root)
+    if bass_letter:
+        # Slash bass goes in the octave below the chord
+        notes.insert(0, _note_number(bass_letter, bass_accidentals) - 12)
+    return root, tuple(notes)
 
-    # Default to major triad if pattern not found
-    return [root_note + interval for interval in chord_patterns.get(chord_name.lower(), [0, 4, 7])]
 
+@timed_stage('chord_parse')
 def parse_chord_progression(progression_text):
     """
     Parse AI-generated chord progression text into a list of chord dictionaries.
-    Expected format: "Cmaj7 - Am - Fmaj7 - G"
+    Expected format: "Cmaj7 - Am - Fmaj7 - G"; →, |, commas or plain spaces
+    also separate chords, and symbols like "Am add9", "F#m7b5", "B♭maj7",
+    "C/E" and "C6/9" are understood. Anything that isn't a whole chord
+    symbol (roman numerals, stray words, "C7alt") is skipped and logged.
     Returns: [{'name': 'Cmaj7', 'root': 60, 'notes': [60, 64, 67, 71]}, ...]
     """
-    # Note name to MIDI number mapping (C4 = 60)
-    note_map = {
-        'C': 60, 'C#': 61, 'Db': 61, 'D': 62, 'D#': 63, 'Eb': 63,
-        'E': 64, 'F': 65, 'F#': 66, 'Gb': 66, 'G': 67, 'G#': 68,
-        'Ab': 68, 'A': 69, 'A#': 70, 'Bb': 70, 'B': 71
-    }
-
     chords = []
-    # Split by common delimiters
-    chord_names = [c.strip() for c in progression_text.replace('→', '-').split('-')]
-
-    for chord_name in chord_names:
-        if not chord_name:
+    for segment in _CHORD_DELIMITERS.split(progression_text.strip()):
+        if not segment:
             continue
 
-        # Extract root note
-        root_name = chord_name[0].upper()
-        if len(chord_name) > 1 and chord_name[1] in ['#', 'b', '♭', '♯']:
-            root_name += 'b' if chord_name[1] in ['b', '♭'] else '#'
-            quality = chord_name[2:].strip()
-        else:
-            quality = chord_name[1:].strip()
+        # A word starts a new chord only if it is a chord symbol itself:
+        # "Am add9" is one chord, "Dm7 G7 Cmaj7" is three
+        words = segment.split()
+        names = words[:1]
+        for word in words[1:]:
+            if _parse_chord_symbol(word):
+                names.append(word)
+            else:
+                names[-1] += ' ' + word
+
+        for name in names:
+            parsed = _parse_chord_symbol(name)
+            if parsed is None and ' ' in name:
+                # "Dm7 and": keep the chord, drop the words that don't spell it
+                head, rest = name.split(' ', 1)
+                parsed = _parse_chord_symbol(head)
+                if parsed is not None:
+                    logger.warning(f"[CHORDS] Skipped {rest!r}: not a chord symbol")
+                    name = head
+            if parsed is None:
+                logger.warning(f"[CHORDS] Skipped {name!r}: not a chord symbol")
+                continue
+            root, notes = parsed
+            chords.append({
+                'name': name,
+                'root': root,
+                'notes': list(notes)
+            })
+
+    return chords
 
-        root_midi = note_map.get(root_name, 60)
-        notes = chord_name_to_midi_notes(quality if quality else 'major', root_midi)
+# Standard MIDI File layout, byte-for-byte what midiutil's MIDIFile(1) writes:
+# format 1 with a tempo track followed by the named note track, 960 ticks per
+# quarter note, channel 0, velocity 100
+MIDI_TICKS_PER_QUARTER = 960
+_MIDI_HEADER = b'MThd' + struct.pack('>LHHH', 6, 1, 2, MIDI_TICKS_PER_QUARTER)
+_MIDI_TRACK_NAME = b'Chord Progression'
+_MIDI_END_OF_TRACK = b'\x00\xff\x2f\x00'
+_MIDI_VELOCITY = 100
+# midiutil's secondary sort order: at the same tick note-offs come before note-ons
+_MIDI_NOTE_OFF = 2
+_MIDI_NOTE_ON = 3
 
-        chords.append({
-            'name': chord_name,
-            'root': root_midi,
-            'notes': notes
-        })
 
-    return chords
+def _midi_varlen(value):
+    """Encode a non-negative int as a MIDI variable-length quantity"""
+    if value < 0x80:
+        return bytes((value,))
+    out = [value & 0x7f]
+    value >>= 7
+    while value:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def _midi_start_track(buffer):
+    """Write the MTrk length placeholder (filled by _midi_end_track) and return its offset"""
+    buffer += b'MTrk\x00\x00\x00\x00'
+    return len(buffer)
+
+
+def _midi_end_track(buffer, data_start):
+    """Close a track and patch its length"""
+    buffer += _MIDI_END_OF_TRACK
+    struct.pack_into('>L', buffer, data_start - 4, len(buffer) - data_start)
 
+
+@timed_stage('midi_render')
 def create_midi_file(chord_progression, tempo=80, duration_per_chord=4.0):
     """
     Create a MIDI file from a chord progression.
     Returns the MIDI file as bytes.
     """
-    # Create MIDI file with 1 track
-    midi = MIDIFile(1)
-    track = 0
-    channel = 0
-    time = 0  # Start at beat 0
-    volume = 100
-
-    # Add track name and tempo
-    midi.addTrackName(track, time, "Chord Progression")
-    midi.addTempo(track, time, tempo)
-
-    # Add each chord
+    duration_ticks = int(duration_per_chord * MIDI_TICKS_PER_QUARTER)
+    if duration_ticks <= 0:
+        raise ValueError("duration_per_chord must be at least one tick")
+
+    # (tick, sort order, insertion order, status, pitch). Insertion orders 0
+    # and 1 belong to the track name and tempo; repeated notes at the same
+    # tick are dropped, keeping the first
+    events = []
+    seen = set()
+    time = 0
+    insertion = 2
     for chord in chord_progression:
+        start = int(time * MIDI_TICKS_PER_QUARTER)
         for note in chord['notes']:
-            midi.addNote(track, channel, note, time, duration_per_chord, volume)
+            if (_MIDI_NOTE_ON, start, note) not in seen:
+                seen.add((_MIDI_NOTE_ON, start, note))
+                events.append((start, _MIDI_NOTE_ON, insertion, 0x90, note))
+            if (_MIDI_NOTE_OFF, start + duration_ticks, note) not in seen:
+                seen.add((_MIDI_NOTE_OFF, start + duration_ticks, note))
+                events.append((start + duration_ticks, _MIDI_NOTE_OFF, insertion, 0x80, note))
+            insertion += 1
         time += duration_per_chord
+    events.sort()
+
+    # A note-off for a pitch that is sounding more than once ends the most
+    # recent note-on (midiutil's de-interleaving)
+    sounding = {}
+    moved = False
+    for index, (tick, order, insertion, status, pitch) in enumerate(events):
+        stack = sounding.setdefault(pitch, [])
+        if order == _MIDI_NOTE_ON:
+            stack.append(tick)
+        elif len(stack) > 1:
+            events[index] = (stack.pop(), order, insertion, status, pitch)
+            moved = True
+        else:
+            stack.pop()
+    if moved:
+        events.sort()
+
+    buffer = bytearray(_MIDI_HEADER)
+
+    # Tempo track
+    data_start = _midi_start_track(buffer)
+    buffer += b'\x00\xff\x51\x03'
+    buffer += struct.pack('>L', int(60000000 / tempo))[1:]
+    _midi_end_track(buffer, data_start)
+
+    # Note track
+    data_start = _midi_start_track(buffer)
+    buffer += b'\x00\xff\x03'
+    buffer += _midi_varlen(len(_MIDI_TRACK_NAME))
+    buffer += _MIDI_TRACK_NAME
+    previous = 0
+    for tick, _, _, status, pitch in events:
+        delta = tick - previous
+        if delta < 0x80:
+            buffer.append(delta)
+        else:
+            buffer += _midi_varlen(delta)
+        buffer.append(status)
+        buffer.append(pitch)
+        buffer.append(_MIDI_VELOCITY)
+        previous = tick
+    _midi_end_track(buffer, data_start)
+
+    return bytes(buffer)
+
+# Rendered chord progression MIDI, content-addressed by (progression text,
+# tempo, duration per chord). Each worker keeps the last MIDI_CACHE_SIZE
+# renders in memory (0 disables); with MIDI_CACHE_REDIS_TTL > 0 the raw bytes
+# are also shared through Redis so other workers skip the render.
+MIDI_CACHE_SIZE = int(os.getenv('MIDI_CACHE_SIZE', 256))
+MIDI_CACHE_REDIS_TTL = int(os.getenv('MIDI_CACHE_REDIS_TTL', 86400))
+# Whether chord progression responses embed the file as base64 `midiFile` by
+# default; clients can override per request with `embedMidi` and otherwise
+# download it from /midi/<midiId>
+MIDI_EMBED = os.getenv('MIDI_EMBED', 'true').lower() == 'true'
+MIDI_HTTP_MAX_AGE = int(os.getenv('MIDI_HTTP_MAX_AGE', 31536000))
+# Part of every MIDI id; bump it whenever the same progression text would
+# render differently so cached and browser copies of old files are not reused
+MIDI_RENDER_VERSION = 2
+
+
+def midi_id(progression_text, tempo=80, duration_per_chord=4.0):
+    """Content address of a rendered progression"""
+    key = json.dumps([MIDI_RENDER_VERSION, progression_text, tempo, float(duration_per_chord)], ensure_ascii=False)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def midi_redis_key(midi_key):
+    return f"midi:{midi_key}"
+
+
+class TieredCache:
+    """Bounded per-worker LRU (L1) in front of a Redis tier (L2) shared by every worker"""
+
+    def __init__(self, name, max_entries, ttl):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at or None, generation, value)
+        self._lock = threading.Lock()
+        self.counts = {'l1': dict.fromkeys(('hits', 'misses', 'evictions'), 0),
+                       'l2': dict.fromkeys(('hits', 'misses', 'errors'), 0)}
+
+    def redis_key(self, key):
+        return f'cache:{self.name}:{key}'
+
+    def shared_ttl(self):
+        """Seconds entries live in Redis (0 keeps them in this worker only)"""
+        return self.ttl
+
+    def local_ttl(self):
+        """Seconds an entry is served from memory (None until it is evicted)"""
+        return None
+
+    def encode(self, value):
+        return value
+
+    def decode(self, raw):
+        return raw
+
+    def generation(self):
+        """Invalidation count L1 entries must have been stored under (None: never invalidated)"""
+        return None
 
-    # Write to bytes buffer
-    buffer = io.BytesIO()
-    midi.writeFile(buffer)
-    buffer.seek(0)
-    return buffer.read()
+    def _count(self, tier, event):
+        with self._lock:
+            self.counts[tier][event] += 1
+        CACHE_TIER_EVENTS.labels(self.name, tier, event).inc()
+
+    def _get_local(self, key):
+        generation = self.generation()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and ((entry[0] is not None and entry[0] <= now) or entry[1] != generation):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put_local(self, key, value, generation):
+        if self.max_entries <= 0:
+            return
+        local_ttl = self.local_ttl()
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (None if local_ttl is None else time.monotonic() + local_ttl, generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        for _ in range(evicted):
+            self._count('l1', 'evictions')
+
+    def get(self, key, count=True):
+        """Return the cached value from either tier, or None"""
+        entry = self._get_local(key)
+        if entry is not None:
+            if count:
+                self._count('l1', 'hits')
+            return entry[2]
+        if count:
+            self._count('l1', 'misses')
+        if self.shared_ttl() <= 0:
+            return None
+        # Read before L2: invalidation deletes L2 before bumping the
+        # generation, so a value read here is never newer than its tag
+        generation = self.generation()
+        try:
+            cached = redis_client.get(self.redis_key(key))
+        except Exception as e:
+            logger.error(f"{self.name} cache lookup failed: {str(e)}")
+            self._count('l2', 'errors')
+            return None
+        if cached is None:
+            if count:
+                self._count('l2', 'misses')
+            return None
+        if count:
+            self._count('l2', 'hits')
+        value = self.decode(cached)
+        self._put_local(key, value, generation)
+        return value
+
+    def set(self, key, value):
+        self._put_local(key, value, self.generation())
+        if self.shared_ttl() <= 0:
+            return
+        try:
+            redis_client.set(self.redis_key(key), self.encode(value), ex=self.shared_ttl())
+        except Exception as e:
+            logger.error(f"{self.name} cache store failed: {str(e)}")
+            self._count('l2', 'errors')
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def clear_shared(self):
+        """Delete this cache's L2 entries"""
+        pipe = redis_client.pipeline()
+        for redis_key in redis_client.scan_iter(match=self.redis_key('*'), count=500):
+            pipe.delete(redis_key)
+        pipe.execute()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'l1': {**self.counts['l1'], 'entries': len(self._entries), 'maxEntries': self.max_entries},
+                'l2': dict(self.counts['l2'])
+            }
+
+
+class MidiRenderCache(TieredCache):
+    """Rendered (midi_bytes, midi_base64) by MIDI id; Redis holds the raw bytes"""
+
+    def __init__(self, max_entries):
+        super().__init__('midi', max_entries, MIDI_CACHE_REDIS_TTL)
+
+    def redis_key(self, key):
+        return midi_redis_key(key)
+
+    def shared_ttl(self):
+        return MIDI_CACHE_REDIS_TTL
+
+    def encode(self, entry):
+        return entry[0]
+
+    def decode(self, midi_bytes):
+        return midi_bytes, base64.b64encode(midi_bytes).decode('utf-8')
+
+    def lookup(self, key):
+        """Return the rendered bytes for a MIDI id from either tier, or None"""
+        entry = self.get(key)
+        count_cache_lookup('midi', entry is not None)
+        return entry[0] if entry is not None else None
+
+    def render(self, progression_text, tempo=80, duration_per_chord=4.0):
+        """Return (midi_id, midi_bytes, midi_base64), rendering only on a miss in both tiers"""
+        key = midi_id(progression_text, tempo, duration_per_chord)
+        entry = self.get(key)
+        count_cache_lookup('midi', entry is not None)
+        if entry is None:
+            chords = parse_chord_progression(progression_text)
+            entry = self.decode(create_midi_file(chords, tempo=tempo, duration_per_chord=duration_per_chord))
+            self.set(key, entry)
+        return (key,) + entry
+
+    def stats(self):
+        with self._lock:
+            hits, redis_hits = self.counts['l1']['hits'], self.counts['l2']['hits']
+            lookups = hits + self.counts['l1']['misses']
+            return {
+                'hits': hits,
+                'redisHits': redis_hits,
+                'misses': lookups - hits - redis_hits,
+                'hitRate': round((hits + redis_hits) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'redisTtlSeconds': MIDI_CACHE_REDIS_TTL
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for counts in self.counts.values():
+                counts.update(dict.fromkeys(counts, 0))
+
+
+midi_cache = MidiRenderCache(MIDI_CACHE_SIZE)
 
 def generate_prompt_from_template(genres):
     """Generate a writing prompt using templates when AI is not available"""
@@ -518,10 +1823,8 @@ def generate_prompt_from_template(genres):
     }
 
 
-def generate_prompt_with_ai(genres):
-    """Generate creative writing exercises focused on skill-building"""
-    import random
-    import re
+def build_writing_prompt_request(genres):
+    """Pick a writing exercise type and build the OpenAI request for it"""
 
     # Create genre blending language based on number of genres
     if len(genres) == 1:
@@ -755,120 +2058,180 @@ Teach REVISION as craft skill."""
     ]
     
     exercise_type = random.choice(exercise_types)
-    
-    try:
-        # Create system message based on whether multiple genres are being blended
-        if len(genres) > 1:
-            system_message = f"""You are a creative writing instructor specializing in GENRE FUSION. When given multiple genres, you must create exercises that deeply integrate them - not treat them separately or alternate between them.
+
+    # Create system message based on whether multiple genres are being blended
+    if len(genres) > 1:
+        system_message = f"""You are a creative writing instructor specializing in GENRE FUSION. When given multiple genres, you must create exercises that deeply integrate them - not treat them separately or alternate between them.
 
 CRITICAL: If asked to blend {' and '.join(genres)}, the exercise must show how these genres create something NEW together. The fusion should feel inevitable and cohesive, not forced or superficial.
 
 Create exercises that are instructional and teach craft, not story prompts. Avoid character names and specific scenarios. Focus on teaching HOW to write genre-blended work. Always include 3 specific writing tips tailored to the exercise and the genre blend."""
-        else:
-            system_message = "You are a creative writing instructor teaching techniques and skills. Create exercises that are instructional and teach craft, not story prompts. Avoid character names and specific scenarios. Focus on teaching HOW to write. Always include 3 specific writing tips tailored to the exercise."
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": exercise_type["prompt"]}
-            ],
-            temperature=0.85,
-            max_tokens=800,
-            presence_penalty=0.7,
-            frequency_penalty=0.7
-        )
-        
-        content = response.choices[0].message.content
+    else:
+        system_message = "You are a creative writing instructor teaching techniques and skills. Create exercises that are instructional and teach craft, not story prompts. Avoid character names and specific scenarios. Focus on teaching HOW to write. Always include 3 specific writing tips tailored to the exercise."
+
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": exercise_type["prompt"]}
+        ],
+        'params': {
+            'temperature': 0.85,
+            'max_tokens': 800,
+            'presence_penalty': 0.7,
+            'frequency_penalty': 0.7
+        },
+        'genres': genres,
+        'genre_string': genre_string,
+        'exercise_type': exercise_type
+    }
+
+
+@timed_stage('extract')
+def parse_writing_prompt_response(content, ai_request):
+    """Turn an OpenAI completion into a writing exercise response"""
+    genres = ai_request['genres']
+    genre_string = ai_request['genre_string']
+    exercise_type = ai_request['exercise_type']
+    
+    # Extract title
+    title = None
+    lines = content.split('\n')
+    for line in lines[:5]:
+        line = line.strip()
+        if line.startswith('**') or line.startswith('#'):
+            title = line.replace('**', '').replace('#', '').strip()
+            if title and len(title) > 3 and len(title) < 100:
+                break
+    
+    if not title:
+        title = f"{exercise_type['name']}: {genre_string}"
+    
+    # Extract writing tips from the content
+    tips = []
+    content_without_tips = content
+    
+    # Find the "Writing Tips" section
+    tip_section_match = re.search(r'\*\*Writing Tips.*?\*\*:?\s*\n(.*?)(?=\n\n|\Z)', content, re.DOTALL | re.IGNORECASE)
+    
+    if tip_section_match:
+        tip_section = tip_section_match.group(1)
         
-        # Extract title
-        title = None
-        lines = content.split('\n')
-        for line in lines[:5]:
+        # Extract individual tips
+        for line in tip_section.split('\n'):
             line = line.strip()
-            if line.startswith('**') or line.startswith('#'):
-                title = line.replace('**', '').replace('#', '').strip()
-                if title and len(title) > 3 and len(title) < 100:
-                    break
-        
-        if not title:
-            title = f"{exercise_type['name']}: {genre_string}"
-        
-        # Extract writing tips from the content
-        tips = []
-        content_without_tips = content
-        
-        # Find the "Writing Tips" section
-        tip_section_match = re.search(r'\*\*Writing Tips.*?\*\*:?\s*\n(.*?)(?=\n\n|\Z)', content, re.DOTALL | re.IGNORECASE)
-        
-        if tip_section_match:
-            tip_section = tip_section_match.group(1)
-            
-            # Extract individual tips
-            for line in tip_section.split('\n'):
-                line = line.strip()
-                if line.startswith('-') or line.startswith('•') or line.startswith('*'):
-                    tip = re.sub(r'^[-•*]\s*', '', line).strip()
-                    if tip and len(tip) > 10:
-                        tips.append(tip)
-            
-            # Remove the entire "Writing Tips" section from content
-            content_without_tips = re.sub(r'\*\*Writing Tips.*?\*\*:?\s*\n.*?(?=\n\n|\Z)', '', content, flags=re.DOTALL | re.IGNORECASE)
-            content_without_tips = content_without_tips.strip()
+            if line.startswith('-') or line.startswith('•') or line.startswith('*'):
+                tip = re.sub(r'^[-•*]\s*', '', line).strip()
+                if tip and len(tip) > 10:
+                    tips.append(tip)
         
-        # Fallback to generic tips if none found
-        if not tips:
-            tips = [
-                f"Practice this exercise regularly to build muscle memory for {exercise_type['name'].lower()}",
-                "Don't edit while doing the exercise - focus on exploration first",
-                "Review your work after completing the exercise to identify patterns"
-            ]
-        
-        word_count, difficulty = get_random_word_count_and_difficulty()
-        
-        return {
-            'title': title,
-            'content': content_without_tips,  # Content WITHOUT the tips section
-            'genres': genres,
-            'difficulty': difficulty,
-            'wordCount': word_count,
-            'exerciseType': exercise_type['name'],
-            'tips': tips[:3],  # Tips extracted separately, only first 3
-            'timestamp': datetime.utcnow().isoformat(),
-            'ai_generated': True
-        }
+        # Remove the entire "Writing Tips" section from content
+        content_without_tips = re.sub(r'\*\*Writing Tips.*?\*\*:?\s*\n.*?(?=\n\n|\Z)', '', content, flags=re.DOTALL | re.IGNORECASE)
+        content_without_tips = content_without_tips.strip()
+    
+    # Fallback to generic tips if none found
+    if not tips:
+        tips = [
+            f"Practice this exercise regularly to build muscle memory for {exercise_type['name'].lower()}",
+            "Don't edit while doing the exercise - focus on exploration first",
+            "Review your work after completing the exercise to identify patterns"
+        ]
+    
+    word_count, difficulty = get_random_word_count_and_difficulty()
+    
+    return {
+        'title': title,
+        'content': content_without_tips,  # Content WITHOUT the tips section
+        'genres': genres,
+        'difficulty': difficulty,
+        'wordCount': word_count,
+        'exerciseType': exercise_type['name'],
+        'tips': tips[:3],  # Tips extracted separately, only first 3
+        'timestamp': datetime.utcnow().isoformat(),
+        'ai_generated': True
+    }
+
+
+def writing_prompt_from_ai(genres):
+    """Generate a writing exercise with OpenAI (raises if the call fails)"""
+    ai_request = build_writing_prompt_request(genres)
+    content = chat_completion(ai_request)
+    return parse_writing_prompt_response(content, ai_request)
+
+
+def generate_prompt_with_ai(genres):
+    """Generate creative writing exercises focused on skill-building"""
+    if LATENCY_BUDGETS['writing'] > 0:
+        # A late AI prompt replaces whatever /generate cached for this selection
+        return race_latency_budget(
+            'writing', lambda: writing_prompt_from_ai(genres), lambda: generate_prompt_from_template(genres),
+            lambda prompt: cache_prompt(prompt_cache_key(genres), prompt)
+        )
+    try:
+        return writing_prompt_from_ai(genres)
     except Exception as e:
         logger.error(f"AI generation failed: {str(e)}")
+        note_fallback(e)
         return generate_prompt_from_template(genres)
 
+
+async def agenerate_prompt_with_ai(genres):
+    """Async variant of generate_prompt_with_ai"""
+    ai_request = build_writing_prompt_request(genres)
+    try:
+        content = await achat_completion(ai_request)
+        return parse_writing_prompt_response(content, ai_request)
+    except Exception as e:
+        logger.error(f"AI generation failed: {str(e)}")
+        note_fallback(e)
+        return generate_prompt_from_template(genres)
+
+
+def stream_prompt_with_ai(genres, cache_key):
+    """Streaming variant of generate_prompt_with_ai; the result is cached like /generate's"""
+    ai_request = build_writing_prompt_request(genres)
+
+    def cached(prompt):
+        cache_prompt(cache_key, prompt)
+        return prompt
+
+    return sse_generation(
+        "stream-writing-prompt", ai_request,
+        lambda content: cached(parse_writing_prompt_response(content, ai_request)),
+        lambda: generate_prompt_from_template(genres)
+    )
+
+
+# Genre-specific writing tips
+GENRE_TIPS = MappingProxyType({
+    'Fantasy': 'Build a consistent magic system with clear rules and limitations.',
+    'Science Fiction': 'Ground your technology in real scientific concepts, even if extrapolated.',
+    'Mystery': 'Plant clues fairly throughout the story - readers should be able to solve it.',
+    'Horror': 'Build tension through atmosphere and pacing, not just jump scares.',
+    'Romance': 'Develop both characters fully - they should be interesting apart and together.',
+    'Thriller': 'Keep the pacing tight and end chapters with hooks.',
+    'Historical Fiction': 'Research the period thoroughly but don\'t let facts overwhelm the story.',
+    'Literary Fiction': 'Focus on character development and thematic depth.',
+    'Young Adult': 'Address serious themes while maintaining an authentic teen voice.',
+    'Crime': 'Make your detective\'s process logical and methodical.',
+    'Adventure': 'Balance action sequences with character moments.',
+    'Dystopian': 'Create a believable path from our world to yours.',
+    'Magical Realism': 'Treat magical elements as mundane parts of the world.',
+    'Western': 'Focus on themes of justice, freedom, and survival.',
+    'Biography': 'Find the narrative arc in real events.',
+    'Self-Help': 'Provide actionable advice with real-world examples.',
+    'Philosophy': 'Make abstract concepts concrete through examples.',
+    'Poetry': 'Show rather than tell - use vivid imagery.'
+})
+
+
 def generate_writing_tips(genres):
     """Generate writing tips based on selected genres"""
     tips = []
     
-    genre_tips = {
-        'Fantasy': 'Build a consistent magic system with clear rules and limitations.',
-        'Science Fiction': 'Ground your technology in real scientific concepts, even if extrapolated.',
-        'Mystery': 'Plant clues fairly throughout the story - readers should be able to solve it.',
-        'Horror': 'Build tension through atmosphere and pacing, not just jump scares.',
-        'Romance': 'Develop both characters fully - they should be interesting apart and together.',
-        'Thriller': 'Keep the pacing tight and end chapters with hooks.',
-        'Historical Fiction': 'Research the period thoroughly but don\'t let facts overwhelm the story.',
-        'Literary Fiction': 'Focus on character development and thematic depth.',
-        'Young Adult': 'Address serious themes while maintaining an authentic teen voice.',
-        'Crime': 'Make your detective\'s process logical and methodical.',
-        'Adventure': 'Balance action sequences with character moments.',
-        'Dystopian': 'Create a believable path from our world to yours.',
-        'Magical Realism': 'Treat magical elements as mundane parts of the world.',
-        'Western': 'Focus on themes of justice, freedom, and survival.',
-        'Biography': 'Find the narrative arc in real events.',
-        'Self-Help': 'Provide actionable advice with real-world examples.',
-        'Philosophy': 'Make abstract concepts concrete through examples.',
-        'Poetry': 'Show rather than tell - use vivid imagery.'
-    }
-    
     for genre in genres:
-        if genre in genre_tips:
-            tips.append(genre_tips[genre])
+        if genre in GENRE_TIPS:
+            tips.append(GENRE_TIPS[genre])
     
     # Add general tips
     tips.append('Start with a strong opening line that immediately engages the reader.')
@@ -876,291 +2239,307 @@ def generate_writing_tips(genres):
     
     return tips[:3]  # Return top 3 tips
 
-def generate_sound_design_prompt(synthesizer, exercise_type, genre="all"):
-    """Generate sound design exercises for electronic music production"""
 
-    # Synthesizer capabilities and context
-    synth_context = {
-        'Serum 2': {
-            'type': 'wavetable',
-            'features': 'advanced modulation matrix, visual feedback, effects rack, wavetable editor',
-            'strengths': 'complex modulation routing, visual waveform manipulation, FM synthesis'
-        },
-        'Phase Plant': {
-            'type': 'modular',
-            'features': 'snapin effects, flexible routing, multiple oscillator types',
-            'strengths': 'modular signal flow, creative effects combinations, harmonic oscillators'
-        },
-        'Vital': {
-            'type': 'wavetable',
-            'features': 'spectral warping, advanced modulation, free and open-source',
-            'strengths': 'spectral effects, stereo modulation, filter morphing'
-        }
-    }
+# Sound design catalogs. Built once at import and frozen, so requests (and
+# preforked workers) share them read-only instead of rebuilding them per call.
 
-    # Book tracking for even distribution (creative/abstract exercises only)
-    all_books = [
-        'Red Rising', 'The Left Hand of Darkness', "Ender's Game", 'Station Eleven', 'The Peripheral',
-        'Neuromancer', 'The Goldfinch', "The Hitchhiker's Guide", 'The Kite Runner', 'Borne',
-        'Dark Matter', 'The Illustrated Man', 'Recursion', 'The City & the City', 'Mistborn',
-        'A Memory Called Empire', 'The Three-Body Problem', 'Fahrenheit 451', 'The Nightingale',
-        'The House in the Cerulean Sea', 'Dune', 'Annihilation', 'Upgrade', 'Wayward Pines',
-        'The Martian', 'Cloud Atlas', 'The Woman in White', 'Foundation', 'Snow Crash',
-        'The Long Way to a Small, Angry Planet', 'Frankenstein', 'American Gods', '1984',
-        'The Hunger Games', 'Nexus', 'The Mountain in the Sea', 'Scythe', 'Watchmen', 'Dorohedoro',
-        "Howl's Moving Castle", 'Eragon', 'The Girl on the Train', 'The Silkworm', 'The Night Fire',
-        'Lock In', 'The Night Manager', 'The Van Apfel Girls Are Gone', 'The Lord of the Rings',
-        'A Song of Ice and Fire', 'The Name of the Wind', 'Elantris', 'The Way of Kings',
-        'The Once and Future King', 'The Chronicles of Narnia', 'The Wheel of Time', 'The Hobbit',
-        'The Time Machine', 'The Invisible Man', 'Dracula', 'Brave New World', 'The Hollow Crown',
-        'The Stars My Destination', 'The Caves of Steel', 'Extremity', 'Katabasis'
+# Synthesizer capabilities and context
+SOUND_DESIGN_SYNTH_CONTEXT = _freeze({
+    'Serum 2': {
+        'type': 'wavetable',
+        'features': 'advanced modulation matrix, visual feedback, effects rack, wavetable editor',
+        'strengths': 'complex modulation routing, visual waveform manipulation, FM synthesis'
+    },
+    'Phase Plant': {
+        'type': 'modular',
+        'features': 'snapin effects, flexible routing, multiple oscillator types',
+        'strengths': 'modular signal flow, creative effects combinations, harmonic oscillators'
+    },
+    'Vital': {
+        'type': 'wavetable',
+        'features': 'spectral warping, advanced modulation, free and open-source',
+        'strengths': 'spectral effects, stereo modulation, filter morphing'
+    }
+})
+
+# Book tracking for even distribution (creative/abstract exercises only)
+SOUND_DESIGN_BOOKS = _freeze([
+    'Red Rising', 'The Left Hand of Darkness', "Ender's Game", 'Station Eleven', 'The Peripheral',
+    'Neuromancer', 'The Goldfinch', "The Hitchhiker's Guide", 'The Kite Runner', 'Borne',
+    'Dark Matter', 'The Illustrated Man', 'Recursion', 'The City & the City', 'Mistborn',
+    'A Memory Called Empire', 'The Three-Body Problem', 'Fahrenheit 451', 'The Nightingale',
+    'The House in the Cerulean Sea', 'Dune', 'Annihilation', 'Upgrade', 'Wayward Pines',
+    'The Martian', 'Cloud Atlas', 'The Woman in White', 'Foundation', 'Snow Crash',
+    'The Long Way to a Small, Angry Planet', 'Frankenstein', 'American Gods', '1984',
+    'The Hunger Games', 'Nexus', 'The Mountain in the Sea', 'Scythe', 'Watchmen', 'Dorohedoro',
+    "Howl's Moving Castle", 'Eragon', 'The Girl on the Train', 'The Silkworm', 'The Night Fire',
+    'Lock In', 'The Night Manager', 'The Van Apfel Girls Are Gone', 'The Lord of the Rings',
+    'A Song of Ice and Fire', 'The Name of the Wind', 'Elantris', 'The Way of Kings',
+    'The Once and Future King', 'The Chronicles of Narnia', 'The Wheel of Time', 'The Hobbit',
+    'The Time Machine', 'The Invisible Man', 'Dracula', 'Brave New World', 'The Hollow Crown',
+    'The Stars My Destination', 'The Caves of Steel', 'Extremity', 'Katabasis'
+])
+
+# Artist tracking for even distribution (technical exercises only)
+# Organized by genre for filtering
+ARTISTS_BY_GENRE = _freeze({
+    'dubstep': [
+        'Eptic', 'Must Die!', 'Monty', 'Skrillex', 'Virtual Riot', 'Space Laces', 'Excision', 'Zeds Dead', 'Flux Pavilion', 'Subtronics', 'Knife Party', 'Kompany', 'Zomboy', 'Rusko',
+        'Borgore', 'Downlink', 'Noisestorm', 'Spag Heddy', 'Kayzo', 'Kode9', 'Kill the Noise', 'Kahn', 'Liquid Stranger', 'Truth'
+    ],
+    'glitch-hop': [
+        'Detox Unit', 'Seppa', 'Kursa', 'Koan Sound', 'Resonant Language', 'Tipper', 'The Glitch Mob', 'Opiuo', 'Gramatik', 'Haywyre', 'CloZee', 'The Polish Ambassador', 'Beats Antique',
+        'Random Rab', 'Glacier', 'Echo Map', 'Complexive', 'rabidZen', 'Two Fingers', 'Hudson Mohawke', 'Juno What', 'ill.Gates', 'Paper Tiger'
+    ],
+    'dnb': [
+        'Noisia', 'Sleepnet', 'Broken Note', 'Clockvice', 'Vorso', 'Alix Perez', 'Simula', 'Culprate', 'Goldie', 'LTJ Bukem', 'Andy C', 'Roni Size', 'Chase & Status', 'Sub Focus', 'Netsky', 'High Contrast', 'Pendulum', 'Dimension',
+        'Hedex', 'Irah', 'Trigga', 'Bou', 'K-Motionz', 'DJ Fresh', 'Black Sun Empire', 'Calibre', 'Phantasm', 'Metrik'
+    ],
+    'experimental-bass': [
+        'Mr. Bill', 'Tiedye Ky', 'Lab Group', 'Supertask', 'Esseks', 'Charlesthefirst', 'Mr. Carmack', 'Tsuruda', 'Chee', 'Flying Lotus', 'G Jones', 'Eprom', 'Of The Trees', 'Mersiv', 'Khiva', 'Templo', 'Risik', 'Seven Orbits', 'Abstrakt Sonance',
+        'Duke & Jones', 'Cozway', 'Jeanie', 'Razat', 'Roxas & Klahrk', 'Toadface', 'Sapped', 'Tsimba', 'DMVU', 'SLAVE'
+    ],
+    'house': [
+        'Tchami', 'Chris Lorenzo', 'Daft Punk', 'Larry Heard', 'Masters At Work', 'Derrick Carter', 'DJ Sneak', 'FISHER', 'John Summit', 'Joel Corry', 'Bob Sinclar', 'CID',
+        'BLOND:ISH', 'Noizu', 'Dom Dolla', 'Malaa', 'Wax Motif', 'Kaskade', 'Marten Hørger', 'Afrojack', 'Tiësto', 'Black Coffee'
+    ],
+    'psytrance': [
+        'Astrix', 'Vini Vici', 'Infected Mushroom', 'Liquid Soul', 'GMS', 'Ace Ventura', 'Hallucinogen', 'Electric Universe', 'Zen Mechanics', 'Avalon',
+        'Indira Paganotto', 'Phaxe', 'Morten Granau', 'Killerwatts', 'Outsiders', 'X-Noize', 'Blastoyz', 'Relativ', 'Faders', 'Tristan'
+    ],
+    'hard-techno': [
+        'Ihatemodels', 'Sara Landry', 'Charlotte De Witte', 'Kobosil', 'Rephate', 'WNDRLST', 'In Verruf', 'Madwoman', 'Nicolas Julian', 'Helena Hauff', 'Alignment', 'Kozlov',
+        'Victor Ruiz', 'Layton Giordani', 'Bart Skils', 'Sven Väth', 'Paul Kalkbrenner', 'Stephan Bodzin', 'Peggy Gou', 'HI-LO', 'Space 92', 'Eli Brown'
     ]
-
-    # Artist tracking for even distribution (technical exercises only)
-    # Organized by genre for filtering
-    artists_by_genre = {
-        'dubstep': [
-            'Eptic', 'Must Die!', 'Monty', 'Skrillex', 'Virtual Riot', 'Space Laces', 'Excision', 'Zeds Dead', 'Flux Pavilion', 'Subtronics', 'Knife Party', 'Kompany', 'Zomboy', 'Rusko',
-            'Borgore', 'Downlink', 'Noisestorm', 'Spag Heddy', 'Kayzo', 'Kode9', 'Kill the Noise', 'Kahn', 'Liquid Stranger', 'Truth'
-        ],
-        'glitch-hop': [
-            'Detox Unit', 'Seppa', 'Kursa', 'Koan Sound', 'Resonant Language', 'Tipper', 'The Glitch Mob', 'Opiuo', 'Gramatik', 'Haywyre', 'CloZee', 'The Polish Ambassador', 'Beats Antique',
-            'Random Rab', 'Glacier', 'Echo Map', 'Complexive', 'rabidZen', 'Two Fingers', 'Hudson Mohawke', 'Juno What', 'ill.Gates', 'Paper Tiger'
-        ],
-        'dnb': [
-            'Noisia', 'Sleepnet', 'Broken Note', 'Clockvice', 'Vorso', 'Alix Perez', 'Simula', 'Culprate', 'Goldie', 'LTJ Bukem', 'Andy C', 'Roni Size', 'Chase & Status', 'Sub Focus', 'Netsky', 'High Contrast', 'Pendulum', 'Dimension',
-            'Hedex', 'Irah', 'Trigga', 'Bou', 'K-Motionz', 'DJ Fresh', 'Black Sun Empire', 'Calibre', 'Phantasm', 'Metrik'
-        ],
-        'experimental-bass': [
-            'Mr. Bill', 'Tiedye Ky', 'Lab Group', 'Supertask', 'Esseks', 'Charlesthefirst', 'Mr. Carmack', 'Tsuruda', 'Chee', 'Flying Lotus', 'G Jones', 'Eprom', 'Of The Trees', 'Mersiv', 'Khiva', 'Templo', 'Risik', 'Seven Orbits', 'Abstrakt Sonance',
-            'Duke & Jones', 'Cozway', 'Jeanie', 'Razat', 'Roxas & Klahrk', 'Toadface', 'Sapped', 'Tsimba', 'DMVU', 'SLAVE'
-        ],
-        'house': [
-            'Tchami', 'Chris Lorenzo', 'Daft Punk', 'Larry Heard', 'Masters At Work', 'Derrick Carter', 'DJ Sneak', 'FISHER', 'John Summit', 'Joel Corry', 'Bob Sinclar', 'CID',
-            'BLOND:ISH', 'Noizu', 'Dom Dolla', 'Malaa', 'Wax Motif', 'Kaskade', 'Marten Hørger', 'Afrojack', 'Tiësto', 'Black Coffee'
-        ],
-        'psytrance': [
-            'Astrix', 'Vini Vici', 'Infected Mushroom', 'Liquid Soul', 'GMS', 'Ace Ventura', 'Hallucinogen', 'Electric Universe', 'Zen Mechanics', 'Avalon',
-            'Indira Paganotto', 'Phaxe', 'Morten Granau', 'Killerwatts', 'Outsiders', 'X-Noize', 'Blastoyz', 'Relativ', 'Faders', 'Tristan'
-        ],
-        'hard-techno': [
-            'Ihatemodels', 'Sara Landry', 'Charlotte De Witte', 'Kobosil', 'Rephate', 'WNDRLST', 'In Verruf', 'Madwoman', 'Nicolas Julian', 'Helena Hauff', 'Alignment', 'Kozlov',
-            'Victor Ruiz', 'Layton Giordani', 'Bart Skils', 'Sven Väth', 'Paul Kalkbrenner', 'Stephan Bodzin', 'Peggy Gou', 'HI-LO', 'Space 92', 'Eli Brown'
-        ]
+})
+
+# All artists across genres, in genre order
+ALL_ARTISTS = tuple(artist for genre_artists in ARTISTS_BY_GENRE.values() for artist in genre_artists)
+
+# Fallback templates (used both when USE_AI is False and as fallback in exception handlers)
+SOUND_DESIGN_TECHNICAL_TEMPLATES = _freeze({
+    'Serum 2': [
+        "Create a Skrillex-style metallic bass using FM modulation with detuned oscillators and harsh filtering",
+        "Design a Virtual Riot supersized growl with heavy unison (8+ voices), movement automation, and vowel-like filter morphing",
+        "Build a Space Laces glitchy lead with rapid wavetable morphing, chaos modulation, and pitch shifting",
+        "Create a Tchami future house bass using filtered square waves with punchy envelope and subtle pitch modulation",
+        "Design a G Jones experimental texture using custom wavetables, extreme modulation routing, and unconventional LFO rates",
+        "Build a Chee-style neuro bass with complex FM routing, filter drive saturation, and rhythmic modulation",
+        "Create a Resonant Language organic lead using evolving wavetables, subtle detuning, and harmonic filtering",
+        "Design a Noisia reese bass with multiple detuned saw waves, precise filter automation, and subtle movement",
+        "Build an Eptic heavy riddim bass using square wave FM, aggressive filtering, and pitch envelope modulation",
+        "Create an Esseks wonky mid-bass with wavetable morphing, stereo movement, and creative modulation routing",
+        "Design a Mr. Bill glitchy texture using rapid wavetable scanning, micro-modulation, and rhythmic gating",
+        "Build a Charlesthefirst melodic bass using warm wavetables, filter movement, and subtle portamento"
+    ],
+    'Phase Plant': [
+        "Create an Eprom heavy bass using layered oscillators with distortion snapins and parallel processing chains",
+        "Design a Tipper-style surgical bass with modular signal flow, precise filter automation, and subtle harmonic movement",
+        "Build a Culprate atmospheric texture combining multiple oscillator types with creative snapin effect routing",
+        "Create a Koan Sound neurofunk bass using harmonic oscillators, modular routing, and aggressive distortion staging",
+        "Design a Kursa experimental sound using non-standard oscillator combinations and unconventional effect chains",
+        "Build a Seppa downtempo lead with smooth oscillator blending, modular filter routing, and spatial effects",
+        "Create a Vorso glitch bass using granular-style oscillator manipulation and complex modulation matrices",
+        "Design a Noisia neurofunk reese with parallel oscillator processing, multiband distortion, and stereo width control",
+        "Build a Sleepnet heavy techno bass using analog oscillators, aggressive snapin chains, and movement automation",
+        "Create a Broken Note industrial sound with noise oscillators, distortion routing, and modular signal flow",
+        "Design a Clockvice neurohop bass using oscillator layering, creative snapin routing, and precise automation",
+        "Build a Detox Unit experimental bass with unconventional oscillator combinations and chaotic modulation matrices"
+    ],
+    'Vital': [
+        "Create an Alix Perez deep bass using spectral warping on sine waves with subtle harmonic enhancement",
+        "Design a Flying Lotus experimental lead using spectral effects, filter morphing, and stereo width modulation",
+        "Build a Tsuruda wonky bass with filter drive, spectral warping, and unconventional pitch modulation",
+        "Create a Mr. Carmack trap lead using saw waves with stereo spreading, filter movement, and distortion",
+        "Design a Monty future bass sound with bright wavetables, stereo modulation, and spectral processing",
+        "Build a Chris Lorenzo bassline house bass using filtered saws, punchy envelopes, and subtle distortion warmth",
+        "Create a Simula atmospheric pad using spectral warping, slow filter morphing, and wide stereo field",
+        "Design an Ihatemodels hard techno kick-bass using sine waves with spectral distortion and pitch envelope",
+        "Build a Sara Landry techno lead using spectral warping, stereo modulation, and filter drive",
+        "Create a Must Die! heavy bass using spectral effects, aggressive filtering, and movement automation",
+        "Design a Tiedye Ky melodic bass with spectral warping, filter morphing, and stereo width",
+        "Build a Lab Group experimental sound using spectral processing, LFO modulation, and filter movement",
+        "Create a Supertask neuro bass with spectral warping, precise filter automation, and stereo enhancement"
+    ]
+})
+
+SOUND_DESIGN_CREATIVE_TEMPLATES = _freeze({
+    'Serum 2': [
+        "**Translation**: The razor rain on Mars in Red Rising—glass shards falling from the sky. Create the sound of that descent. Not the impact, the falling. How does danger sound when it's beautiful? | Work until it cuts.",
+        "**Context Shift**: In The Left Hand of Darkness, winter never ends. Design a bass that exists in permanent twilight, where warmth is a memory and cold has texture. What does glacial time sound like? | Begin from not knowing.",
+        "**Synesthesia**: The ansible from Ender's Game—instantaneous communication across light-years. Create the sound of a message that arrives before it's sent. Backwards causality as tone. | Stop when time breaks.",
+        "**Awareness**: In Station Eleven, the traveling symphony performs Shakespeare after civilization ends. Design the sound of culture persisting through collapse. Fragile but unbreakable. | Trust what emerges.",
+        "**Accident**: The reality overlay in The Peripheral—two timelines bleeding through each other. Randomize your routing. Let two patches exist in the same space. Don't resolve the paradox. | Follow what excites you.",
+        "**Limitation**: Neuromancer's cyberspace, built from pure data. Use only one oscillator and one filter. What can consciousness sound like when stripped to its simplest form? | Begin from not knowing.",
+        "**Discovery**: The Goldfinch painting—how Theo sees the world through it. Cycle through wavetables until one makes you feel something you can't name. Build from that unnameable thing. | Work intuitively.",
+        "**Play**: In The Hitchhiker's Guide, Earth is demolished for a hyperspace bypass. Create the bureaucratic sound of a planet being deleted. Absurd. Mundane. Catastrophic. | 5 minutes or until you laugh.",
+        "**Context Shift**: The kites in The Kite Runner—freedom and guilt tangled together. Design a lead that climbs and falls. What does redemption sound like when it's too late? | Work until it aches.",
+        "**Translation**: Borne by Vandermeer—a biotech creature that defies categories. Design something that shouldn't be alive but is. What does impossible biology sound like? | Follow what excites you.",
+        "**Awareness**: Dark Matter's box—every choice creates a new universe. Create a tone. Then modulate it. Each tweak is a branching world. Which path do you follow? | Trust what emerges.",
+        "**Synesthesia**: The Illustrated Man's living tattoos—stories written on skin. Build a patch where every parameter tells a different tale. What does illustrated sound look like? | Work intuitively.",
+        "**Discovery**: Recursion's memory chairs—you can relive any moment. Cycle through presets until one feels like a memory you never had. Build from false nostalgia. | Begin from not knowing."
+    ],
+    'Phase Plant': [
+        "**Awareness**: The split cities in The City & the City—two places occupying the same space, each unseeing the other. Build a bass where two layers coexist but never touch. Parallel sonic realities. | Work until the energy shifts.",
+        "**Translation**: Allomancy in Mistborn—burning metals to push and pull on the world. Create sound that feels like telekinesis. Physical force at a distance. Choose snapins that push or pull. | Stop when it feels right.",
+        "**Limitation**: The Memory of Empire—a diplomat in a foreign court where every word is strategy. Build using only snapin effects, no oscillators. Politics as pure modulation. | Trust the process.",
+        "**Accident**: The ansible in A Memory Called Empire—cultural memory downloaded directly into the mind. Route modulation randomly to six destinations. Don't undo. Let foreign memories guide you. | Follow what excites you.",
+        "**Discovery**: The Three-Body Problem's chaotic eras—unpredictable swings between stability and disaster. Chain three random snapins. Find five sounds. Notice which ones feel like home, which like catastrophe. | Explore freely.",
+        "**Context Shift**: In Fahrenheit 451, books are burned and firemen start fires. Create a lead that's both destroyer and preserver. What burns? What survives? | Work until complete.",
+        "**Synesthesia**: The Nightingale's two sisters—one brave, one invisible, both essential. Design drums with two voices. One urgent, one patient. Both necessary. | Follow your intuition.",
+        "**Play**: The House in the Cerulean Sea—magical children in bureaucratic care. Design something that shouldn't work but does. Rules broken gently. | 5 minutes maximum.",
+        "**Translation**: The spice melange in Dune—awareness expanding across time. Design a texture that seems to know what's coming. Prescient sound. | Open-ended exploration.",
+        "**Context Shift**: Annihilation's Area X—where nature rewrites the rules. Layer oscillators that mutate each other. Let biology become architecture. What does transformation sound like? | Stop when it feels right.",
+        "**Awareness**: Upgrade's gene-editing plague—becoming more and less human simultaneously. Build a patch that improves as it degrades. Enhancement as loss. | Work until the energy shifts.",
+        "**Accident**: Wayward Pines' town—perfect prison disguised as paradise. Route modulation to hidden destinations. Surface order, underlying chaos. What looks safe but isn't? | Follow what excites you.",
+        "**Discovery**: The Martian's survival math—solving impossible problems with duct tape and cleverness. Chain random snapins. Make them work through pure problem-solving. | Explore freely."
+    ],
+    'Vital': [
+        "**Discovery**: In Cloud Atlas, six stories echo across time. Set a filter to self-oscillate. Now treat it as an oscillator. The roles flip. The echo becomes the source. | Explore until complete.",
+        "**Translation**: The Woman in White—a figure glimpsed at midnight, impossible to forget. Create a pad that haunts the edges. Present but not quite there. Victorian dread. | Work as slowly as shadows move.",
+        "**Limitation**: Foundation's psychohistory—predicting civilization with one equation. Use only one LFO to modulate everything. One source, infinite outcomes. What patterns emerge? | Embrace what appears.",
+        "**Accident**: Snow Crash's metaverse—digital religion as computer virus. Enable spectral warping. Drag randomly. Don't look. Let the infection spread through sound. | Stop when it feels alive.",
+        "**Context Shift**: The Long Way to a Small, Angry Planet—found family in deep space. Design a sound at atomic scale. When you're small enough, loneliness feels different. | Work until the perspective shifts.",
+        "**Synesthesia**: Frankenstein's creature—assembled from pieces, alive despite impossibility. What does unnatural life sound like? Not horror. Tragedy. | Open-ended exploration.",
+        "**Play**: American Gods—old deities working at gas stations. Design something ancient trying to be modern. Mythology in fluorescent light. Absurd displacement. | 5 minutes of pure play.",
+        "**Awareness**: 1984's memory holes—history erased in real-time. Create a lead that forgets itself as it plays. What remains when the recording is deleted? | Let the sound tell you.",
+        "**Translation**: The Hunger Games' mockingjay—rebellion encoded in birdsong. Spectral warp a simple tone until it carries a message it doesn't understand. | Begin from not knowing.",
+        "**Synesthesia**: Nexus nano-drug—thoughts transmitted between minds. Create spectral movement that feels like telepathy. Direct consciousness transfer as filter sweep. | Stop when it feels alive.",
+        "**Context Shift**: The Mountain in the Sea's octopus language—intelligence that doesn't think like us. Design at alien scale. What does non-human thought sound like? | Work until the perspective shifts.",
+        "**Play**: Scythe's immortal world—where death is a profession. Make something beautiful about endings. Mortality as melody. | 5 minutes of pure play.",
+        "**Awareness**: Watchmen's Dr. Manhattan—experiencing all time simultaneously. Create a lead that plays past, present, future at once. Omnitemporality as tone. | Let the sound tell you.",
+        "**Translation**: Dorohedoro's magic smoke—it transforms what it touches. Spectral warp until identity dissolves. What does shapeshifting sound like? | Begin from not knowing."
+    ]
+})
+
+SOUND_DESIGN_CATALOGS = MappingProxyType({
+    exercise_type: MappingProxyType({
+        'synth_context': SOUND_DESIGN_SYNTH_CONTEXT,
+        'all_books': SOUND_DESIGN_BOOKS,
+        'artists_by_genre': ARTISTS_BY_GENRE,
+        'all_artists': ALL_ARTISTS,
+        'templates': templates
+    })
+    for exercise_type, templates in (
+        ('technical', SOUND_DESIGN_TECHNICAL_TEMPLATES),
+        ('creative', SOUND_DESIGN_CREATIVE_TEMPLATES)
+    )
+})
+
+# Redis rotation key and artist pool per frontend genre value; unknown genres
+# rotate through every artist
+ARTIST_ROTATION_POOLS = MappingProxyType({
+    'all': ('sound_design:artist_rotation_index:all', ALL_ARTISTS),
+    **{
+        genre: (f'sound_design:artist_rotation_index:{genre}', genre_artists)
+        for genre, genre_artists in ARTISTS_BY_GENRE.items()
     }
-    
-    # Create all_artists list from all genres
-    all_artists = []
-    for genre_artists in artists_by_genre.values():
-        all_artists.extend(genre_artists)
-
-    # Define fallback templates (used both when USE_AI is False and as fallback in exception handlers)
-    if exercise_type == 'technical':
-        templates = {
-            'Serum 2': [
-                    "Create a Skrillex-style metallic bass using FM modulation with detuned oscillators and harsh filtering",
-                    "Design a Virtual Riot supersized growl with heavy unison (8+ voices), movement automation, and vowel-like filter morphing",
-                    "Build a Space Laces glitchy lead with rapid wavetable morphing, chaos modulation, and pitch shifting",
-                    "Create a Tchami future house bass using filtered square waves with punchy envelope and subtle pitch modulation",
-                    "Design a G Jones experimental texture using custom wavetables, extreme modulation routing, and unconventional LFO rates",
-                    "Build a Chee-style neuro bass with complex FM routing, filter drive saturation, and rhythmic modulation",
-                    "Create a Resonant Language organic lead using evolving wavetables, subtle detuning, and harmonic filtering",
-                    "Design a Noisia reese bass with multiple detuned saw waves, precise filter automation, and subtle movement",
-                    "Build an Eptic heavy riddim bass using square wave FM, aggressive filtering, and pitch envelope modulation",
-                    "Create an Esseks wonky mid-bass with wavetable morphing, stereo movement, and creative modulation routing",
-                    "Design a Mr. Bill glitchy texture using rapid wavetable scanning, micro-modulation, and rhythmic gating",
-                    "Build a Charlesthefirst melodic bass using warm wavetables, filter movement, and subtle portamento"
-                ],
-                'Phase Plant': [
-                    "Create an Eprom heavy bass using layered oscillators with distortion snapins and parallel processing chains",
-                    "Design a Tipper-style surgical bass with modular signal flow, precise filter automation, and subtle harmonic movement",
-                    "Build a Culprate atmospheric texture combining multiple oscillator types with creative snapin effect routing",
-                    "Create a Koan Sound neurofunk bass using harmonic oscillators, modular routing, and aggressive distortion staging",
-                    "Design a Kursa experimental sound using non-standard oscillator combinations and unconventional effect chains",
-                    "Build a Seppa downtempo lead with smooth oscillator blending, modular filter routing, and spatial effects",
-                    "Create a Vorso glitch bass using granular-style oscillator manipulation and complex modulation matrices",
-                    "Design a Noisia neurofunk reese with parallel oscillator processing, multiband distortion, and stereo width control",
-                    "Build a Sleepnet heavy techno bass using analog oscillators, aggressive snapin chains, and movement automation",
-                    "Create a Broken Note industrial sound with noise oscillators, distortion routing, and modular signal flow",
-                    "Design a Clockvice neurohop bass using oscillator layering, creative snapin routing, and precise automation",
-                    "Build a Detox Unit experimental bass with unconventional oscillator combinations and chaotic modulation matrices"
-                ],
-                'Vital': [
-                    "Create an Alix Perez deep bass using spectral warping on sine waves with subtle harmonic enhancement",
-                    "Design a Flying Lotus experimental lead using spectral effects, filter morphing, and stereo width modulation",
-                    "Build a Tsuruda wonky bass with filter drive, spectral warping, and unconventional pitch modulation",
-                    "Create a Mr. Carmack trap lead using saw waves with stereo spreading, filter movement, and distortion",
-                    "Design a Monty future bass sound with bright wavetables, stereo modulation, and spectral processing",
-                    "Build a Chris Lorenzo bassline house bass using filtered saws, punchy envelopes, and subtle distortion warmth",
-                    "Create a Simula atmospheric pad using spectral warping, slow filter morphing, and wide stereo field",
-                    "Design an Ihatemodels hard techno kick-bass using sine waves with spectral distortion and pitch envelope",
-                    "Build a Sara Landry techno lead using spectral warping, stereo modulation, and filter drive",
-                    "Create a Must Die! heavy bass using spectral effects, aggressive filtering, and movement automation",
-                    "Design a Tiedye Ky melodic bass with spectral warping, filter morphing, and stereo width",
-                    "Build a Lab Group experimental sound using spectral processing, LFO modulation, and filter movement",
-                    "Create a Supertask neuro bass with spectral warping, precise filter automation, and stereo enhancement"
-                ]
-        }
-    else:  # creative/abstract
-        templates = {
-            'Serum 2': [
-                    "**Translation**: The razor rain on Mars in Red Rising—glass shards falling from the sky. Create the sound of that descent. Not the impact, the falling. How does danger sound when it's beautiful? | Work until it cuts.",
-                    "**Context Shift**: In The Left Hand of Darkness, winter never ends. Design a bass that exists in permanent twilight, where warmth is a memory and cold has texture. What does glacial time sound like? | Begin from not knowing.",
-                    "**Synesthesia**: The ansible from Ender's Game—instantaneous communication across light-years. Create the sound of a message that arrives before it's sent. Backwards causality as tone. | Stop when time breaks.",
-                    "**Awareness**: In Station Eleven, the traveling symphony performs Shakespeare after civilization ends. Design the sound of culture persisting through collapse. Fragile but unbreakable. | Trust what emerges.",
-                    "**Accident**: The reality overlay in The Peripheral—two timelines bleeding through each other. Randomize your routing. Let two patches exist in the same space. Don't resolve the paradox. | Follow what excites you.",
-                    "**Limitation**: Neuromancer's cyberspace, built from pure data. Use only one oscillator and one filter. What can consciousness sound like when stripped to its simplest form? | Begin from not knowing.",
-                    "**Discovery**: The Goldfinch painting—how Theo sees the world through it. Cycle through wavetables until one makes you feel something you can't name. Build from that unnameable thing. | Work intuitively.",
-                    "**Play**: In The Hitchhiker's Guide, Earth is demolished for a hyperspace bypass. Create the bureaucratic sound of a planet being deleted. Absurd. Mundane. Catastrophic. | 5 minutes or until you laugh.",
-                    "**Context Shift**: The kites in The Kite Runner—freedom and guilt tangled together. Design a lead that climbs and falls. What does redemption sound like when it's too late? | Work until it aches.",
-                    "**Translation**: Borne by Vandermeer—a biotech creature that defies categories. Design something that shouldn't be alive but is. What does impossible biology sound like? | Follow what excites you.",
-                    "**Awareness**: Dark Matter's box—every choice creates a new universe. Create a tone. Then modulate it. Each tweak is a branching world. Which path do you follow? | Trust what emerges.",
-                    "**Synesthesia**: The Illustrated Man's living tattoos—stories written on skin. Build a patch where every parameter tells a different tale. What does illustrated sound look like? | Work intuitively.",
-                    "**Discovery**: Recursion's memory chairs—you can relive any moment. Cycle through presets until one feels like a memory you never had. Build from false nostalgia. | Begin from not knowing."
-                ],
-                'Phase Plant': [
-                    "**Awareness**: The split cities in The City & the City—two places occupying the same space, each unseeing the other. Build a bass where two layers coexist but never touch. Parallel sonic realities. | Work until the energy shifts.",
-                    "**Translation**: Allomancy in Mistborn—burning metals to push and pull on the world. Create sound that feels like telekinesis. Physical force at a distance. Choose snapins that push or pull. | Stop when it feels right.",
-                    "**Limitation**: The Memory of Empire—a diplomat in a foreign court where every word is strategy. Build using only snapin effects, no oscillators. Politics as pure modulation. | Trust the process.",
-                    "**Accident**: The ansible in A Memory Called Empire—cultural memory downloaded directly into the mind. Route modulation randomly to six destinations. Don't undo. Let foreign memories guide you. | Follow what excites you.",
-                    "**Discovery**: The Three-Body Problem's chaotic eras—unpredictable swings between stability and disaster. Chain three random snapins. Find five sounds. Notice which ones feel like home, which like catastrophe. | Explore freely.",
-                    "**Context Shift**: In Fahrenheit 451, books are burned and firemen start fires. Create a lead that's both destroyer and preserver. What burns? What survives? | Work until complete.",
-                    "**Synesthesia**: The Nightingale's two sisters—one brave, one invisible, both essential. Design drums with two voices. One urgent, one patient. Both necessary. | Follow your intuition.",
-                    "**Play**: The House in the Cerulean Sea—magical children in bureaucratic care. Design something that shouldn't work but does. Rules broken gently. | 5 minutes maximum.",
-                    "**Translation**: The spice melange in Dune—awareness expanding across time. Design a texture that seems to know what's coming. Prescient sound. | Open-ended exploration.",
-                    "**Context Shift**: Annihilation's Area X—where nature rewrites the rules. Layer oscillators that mutate each other. Let biology become architecture. What does transformation sound like? | Stop when it feels right.",
-                    "**Awareness**: Upgrade's gene-editing plague—becoming more and less human simultaneously. Build a patch that improves as it degrades. Enhancement as loss. | Work until the energy shifts.",
-                    "**Accident**: Wayward Pines' town—perfect prison disguised as paradise. Route modulation to hidden destinations. Surface order, underlying chaos. What looks safe but isn't? | Follow what excites you.",
-                    "**Discovery**: The Martian's survival math—solving impossible problems with duct tape and cleverness. Chain random snapins. Make them work through pure problem-solving. | Explore freely."
-                ],
-                'Vital': [
-                    "**Discovery**: In Cloud Atlas, six stories echo across time. Set a filter to self-oscillate. Now treat it as an oscillator. The roles flip. The echo becomes the source. | Explore until complete.",
-                    "**Translation**: The Woman in White—a figure glimpsed at midnight, impossible to forget. Create a pad that haunts the edges. Present but not quite there. Victorian dread. | Work as slowly as shadows move.",
-                    "**Limitation**: Foundation's psychohistory—predicting civilization with one equation. Use only one LFO to modulate everything. One source, infinite outcomes. What patterns emerge? | Embrace what appears.",
-                    "**Accident**: Snow Crash's metaverse—digital religion as computer virus. Enable spectral warping. Drag randomly. Don't look. Let the infection spread through sound. | Stop when it feels alive.",
-                    "**Context Shift**: The Long Way to a Small, Angry Planet—found family in deep space. Design a sound at atomic scale. When you're small enough, loneliness feels different. | Work until the perspective shifts.",
-                    "**Synesthesia**: Frankenstein's creature—assembled from pieces, alive despite impossibility. What does unnatural life sound like? Not horror. Tragedy. | Open-ended exploration.",
-                    "**Play**: American Gods—old deities working at gas stations. Design something ancient trying to be modern. Mythology in fluorescent light. Absurd displacement. | 5 minutes of pure play.",
-                    "**Awareness**: 1984's memory holes—history erased in real-time. Create a lead that forgets itself as it plays. What remains when the recording is deleted? | Let the sound tell you.",
-                    "**Translation**: The Hunger Games' mockingjay—rebellion encoded in birdsong. Spectral warp a simple tone until it carries a message it doesn't understand. | Begin from not knowing.",
-                    "**Synesthesia**: Nexus nano-drug—thoughts transmitted between minds. Create spectral movement that feels like telepathy. Direct consciousness transfer as filter sweep. | Stop when it feels alive.",
-                    "**Context Shift**: The Mountain in the Sea's octopus language—intelligence that doesn't think like us. Design at alien scale. What does non-human thought sound like? | Work until the perspective shifts.",
-                    "**Play**: Scythe's immortal world—where death is a profession. Make something beautiful about endings. Mortality as melody. | 5 minutes of pure play.",
-                    "**Awareness**: Watchmen's Dr. Manhattan—experiencing all time simultaneously. Create a lead that plays past, present, future at once. Omnitemporality as tone. | Let the sound tell you.",
-                    "**Translation**: Dorohedoro's magic smoke—it transforms what it touches. Spectral warp until identity dissolves. What does shapeshifting sound like? | Begin from not knowing."
-                ]
-            }
-
-
-    if not USE_AI:
-        content = random.choice(templates.get(synthesizer, templates['Serum 2']))
-        title = f"{exercise_type.capitalize()} Sound Design Exercise"
-
-        if exercise_type == 'technical':
-            tips = [
-                "Start with initializing the synth to hear your changes clearly",
-                "Use your ears - trust what sounds good rather than just visual feedback",
-                "Save variations as you go to compare different approaches"
-            ]
-        else:  # creative/abstract
-            tips = [
-                "There is no destination, only discovery. Follow what makes you curious",
-                "If you're overthinking, you're not playing. Trust your first instinct",
-                "The 'mistake' that excites you is the exercise working",
-                "Stop when the energy shifts. Not everything needs finishing",
-                "Your ears know more than your eyes. Close the screen if it helps",
-                "If nothing excites you after 5 minutes, start completely over",
-                "The exercise is in the noticing, not the result"
-            ]
-            tips = random.sample(tips, 3)  # Pick 3 random tips
-    else:
-        # AI-generated sound design prompts
-        synth_info = synth_context.get(synthesizer, synth_context['Serum 2'])
-
-        if exercise_type == 'technical':
-            # Get next artist from rotation to ensure even distribution
-            # Filter artists by selected genre
-            logger.info(f"[GENRE DEBUG] Received genre parameter: {genre}")
-
-            if genre == 'all':
-                artist_pool = all_artists
-                redis_key = 'sound_design:artist_rotation_index:all'
-                logger.info(f"[GENRE DEBUG] Using 'all' pool with {len(artist_pool)} artists")
-            else:
-                # Map frontend genre values to backend genre keys
-                genre_map = {
-                    'dubstep': 'dubstep',
-                    'glitch-hop': 'glitch-hop',
-                    'dnb': 'dnb',
-                    'experimental-bass': 'experimental-bass',
-                    'house': 'house',
-                    'psytrance': 'psytrance',
-                    'hard-techno': 'hard-techno'
-                }
-
-                backend_genre = genre_map.get(genre, 'all')
-                logger.info(f"[GENRE DEBUG] Mapped frontend genre '{genre}' to backend genre '{backend_genre}'")
-
-                if backend_genre in artists_by_genre:
-                    artist_pool = artists_by_genre[backend_genre]
-                    logger.info(f"[GENRE DEBUG] Found genre pool for '{backend_genre}' with {len(artist_pool)} artists")
-                    logger.info(f"[GENRE DEBUG] First 5 artists: {artist_pool[:5]}")
-                else:
-                    artist_pool = all_artists
-                    logger.info(f"[GENRE DEBUG] Genre '{backend_genre}' not found, using all_artists")
+})
+BOOK_ROTATION_POOL = ('sound_design:book_rotation', SOUND_DESIGN_BOOKS)
+
+
+def _sound_design_catalog(exercise_type):
+    """Return the frozen synth, book, artist and fallback template catalog for an exercise type"""
+    return SOUND_DESIGN_CATALOGS['technical' if exercise_type == 'technical' else 'creative']
+
+
+def sound_design_rotation_pool(exercise_type, genre):
+    """Return the Redis rotation key and the pool of artists (technical) or books (creative) it rotates through"""
+    if exercise_type != 'technical':
+        return BOOK_ROTATION_POOL
+
+    redis_key, artist_pool = ARTIST_ROTATION_POOLS.get(genre, ARTIST_ROTATION_POOLS['all'])
+    logger.info(f"[GENRE DEBUG] Genre '{genre}' rotates through {len(artist_pool)} artists at {redis_key}")
+    return redis_key, artist_pool
+
+
+# Advance a shuffled, no-repeat rotation atomically on the Redis side.
+# KEYS: order list, position counter, legacy shuffled-order key. ARGV: pool
+# size, optionally followed by a fresh permutation of the pool indices. When
+# the cycle is exhausted (or the pool size changed) and no permutation was
+# sent, the script returns index -1 and the caller retries with one, so the
+# common case is a single round trip with a single argument.
+# The JSON order the rotation kept under {redis_key}:shuffled before it moved
+# to a list is deleted on each reshuffle; the first one after a deploy
+# removes it (the position counter kept its name and is reused).
+# Returns {index, position, reshuffled}.
+_ROTATION_SCRIPT = """
+local unpack = unpack or table.unpack
+local size = tonumber(ARGV[1])
+local position = tonumber(redis.call('GET', KEYS[2]) or '0')
+local reshuffled = 0
+if redis.call('LLEN', KEYS[1]) ~= size or position >= size then
+    if #ARGV == 1 then
+        return {-1, position, 0}
+    end
+    redis.call('DEL', KEYS[1], KEYS[3])
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+    position = 0
+    reshuffled = 1
+end
+local index = redis.call('LINDEX', KEYS[1], position)
+redis.call('SET', KEYS[2], position + 1)
+return {tonumber(index), position, reshuffled}
+"""
+_rotation_script = redis_client.register_script(_ROTATION_SCRIPT)
+
+
+def _rotation_keys(redis_key):
+    return [f'{redis_key}:order', f'{redis_key}:position', f'{redis_key}:shuffled']
+
+
+def _rotation_permutation(pool):
+    indices = list(range(len(pool)))
+    random.shuffle(indices)
+    return [len(pool)] + indices
+
+
+def _rotation_result(redis_key, pool, index, position, reshuffled):
+    if reshuffled:
+        logger.info(f"[ROTATION] Started new shuffled order for {redis_key}")
+    logger.info(f"[ROTATION] Selected {pool[index]} (index {index}, position {position}) from {redis_key}")
+    return pool[index]
+
+
+@timed_stage('redis_rotation')
+def next_rotation_pick(redis_key, pool):
+    """Pick the next item of a shuffled, no-repeat rotation stored in Redis"""
+    try:
+        keys = _rotation_keys(redis_key)
+        index, position, reshuffled = _rotation_script(keys=keys, args=[len(pool)], client=redis_client)
+        if index < 0:
+            # Cycle finished - start a new one with a fresh shuffle
+            index, position, reshuffled = _rotation_script(keys=keys, args=_rotation_permutation(pool), client=redis_client)
+        return _rotation_result(redis_key, pool, index, position, reshuffled)
+    except Exception as e:
+        logger.error(f"Error with rotation {redis_key}: {str(e)}")
+        # Fallback to random selection
+        return random.choice(pool)
 
-                redis_key = f'sound_design:artist_rotation_index:{backend_genre}'
 
-            logger.info(f"[GENRE DEBUG] Redis key: {redis_key}")
+@timed_stage('redis_rotation')
+async def anext_rotation_pick(redis_key, pool):
+    """Async variant of next_rotation_pick"""
+    try:
+        keys = _rotation_keys(redis_key)
+        script = get_async_redis().register_script(_ROTATION_SCRIPT)
+        index, position, reshuffled = await script(keys=keys, args=[len(pool)])
+        if index < 0:
+            index, position, reshuffled = await script(keys=keys, args=_rotation_permutation(pool))
+        return _rotation_result(redis_key, pool, index, position, reshuffled)
+    except Exception as e:
+        logger.error(f"Error with rotation {redis_key}: {str(e)}")
+        return random.choice(pool)
 
-            try:
-                # Get the shuffled artist order and current position from Redis
-                shuffled_key = f'{redis_key}:shuffled'
-                position_key = f'{redis_key}:position'
-
-                # Get current shuffled order
-                shuffled_indices = redis_client.get(shuffled_key)
-
-                if shuffled_indices is None:
-                    # First time for this genre - create a shuffled list of indices
-                    indices = list(range(len(artist_pool)))
-                    random.shuffle(indices)
-                    redis_client.set(shuffled_key, json.dumps(indices))
-                    redis_client.set(position_key, 0)
-                    shuffled_indices = indices
-                    current_position = 0
-                    logger.info(f"[GENRE DEBUG] Created new shuffled order for {backend_genre}")
-                else:
-                    # Parse the shuffled order from JSON
-                    shuffled_indices = json.loads(shuffled_indices)
-                    current_position = int(redis_client.get(position_key) or 0)
-
-                    # If we've gone through all artists, reshuffle for next cycle
-                    if current_position >= len(shuffled_indices):
-                        indices = list(range(len(artist_pool)))
-                        random.shuffle(indices)
-                        redis_client.set(shuffled_key, json.dumps(indices))
-                        redis_client.set(position_key, 0)
-                        shuffled_indices = indices
-                        current_position = 0
-                        logger.info(f"[GENRE DEBUG] Reshuffled artist order for {backend_genre}")
-
-                logger.info(f"[GENRE DEBUG] Current position in shuffled list: {current_position}")
-
-                # Get the artist at the current shuffled position
-                artist_index = shuffled_indices[current_position]
-                selected_artist = artist_pool[artist_index]
-                logger.info(f"[GENRE DEBUG] Selected artist: {selected_artist} (index {artist_index})")
-
-                # Increment position for next time
-                redis_client.set(position_key, current_position + 1)
 
-            except Exception as e:
-                logger.error(f"Error with artist rotation: {str(e)}")
-                # Fallback to random selection
-                selected_artist = random.choice(artist_pool)
+def build_sound_design_request(synthesizer, exercise_type, catalog, reference):
+    """Build the OpenAI request for a sound design exercise based on an artist or book"""
+    synth_context = catalog['synth_context']
+    synth_info = synth_context.get(synthesizer, synth_context['Serum 2'])
 
-            system_prompt = f"""You are an expert sound designer and educator specializing in {synthesizer}.
+    if exercise_type == 'technical':
+        selected_artist = reference
+        system_prompt = f"""You are an expert sound designer and educator specializing in {synthesizer}.
 {synthesizer} is a {synth_info['type']} synthesizer with {synth_info['features']}.
 It excels at {synth_info['strengths']}.
 
@@ -1177,59 +2556,11 @@ The exercise should:
 Keep instructions clear and actionable, referencing {synthesizer}'s actual interface elements.
 Examples: "Create a Skrillex-style metallic bass", "Design a Tipper surgical bass", "Build a Virtual Riot supersized growl"."""
 
-            user_prompt = f"Create a technical sound design exercise based on {selected_artist}'s signature sounds, with step-by-step synthesis instructions specific to their production style."
+        user_prompt = f"Create a technical sound design exercise based on {selected_artist}'s signature sounds, with step-by-step synthesis instructions specific to their production style."
 
-        else:  # creative/abstract
-            # Get next book from rotation to ensure even distribution (randomized, no repeats)
-            try:
-                # Get the shuffled book order and current position from Redis
-                book_key = 'sound_design:book_rotation'
-                shuffled_key = f'{book_key}:shuffled'
-                position_key = f'{book_key}:position'
-
-                # Get current shuffled order
-                shuffled_indices = redis_client.get(shuffled_key)
-
-                if shuffled_indices is None:
-                    # First time - create a shuffled list of indices
-                    indices = list(range(len(all_books)))
-                    random.shuffle(indices)
-                    redis_client.set(shuffled_key, json.dumps(indices))
-                    redis_client.set(position_key, 0)
-                    shuffled_indices = indices
-                    current_position = 0
-                    logger.info(f"[BOOK DEBUG] Created new shuffled book order")
-                else:
-                    # Parse the shuffled order from JSON
-                    shuffled_indices = json.loads(shuffled_indices)
-                    current_position = int(redis_client.get(position_key) or 0)
-
-                    # If we've gone through all books, reshuffle for next cycle
-                    if current_position >= len(shuffled_indices):
-                        indices = list(range(len(all_books)))
-                        random.shuffle(indices)
-                        redis_client.set(shuffled_key, json.dumps(indices))
-                        redis_client.set(position_key, 0)
-                        shuffled_indices = indices
-                        current_position = 0
-                        logger.info(f"[BOOK DEBUG] Reshuffled book order")
-
-                logger.info(f"[BOOK DEBUG] Current position in shuffled list: {current_position}")
-
-                # Get the book at the current shuffled position
-                book_index = shuffled_indices[current_position]
-                selected_book = all_books[book_index]
-                logger.info(f"[BOOK DEBUG] Selected book: {selected_book} (index {book_index})")
-
-                # Increment position for next time
-                redis_client.set(position_key, current_position + 1)
-
-            except Exception as e:
-                logger.error(f"Error with book rotation: {str(e)}")
-                # Fallback to random selection
-                selected_book = random.choice(all_books)
-
-            system_prompt = f"""You are a creative companion for sound design. Create exercises for {synthesizer} that draw inspiration from literature—pulling in vivid imagery, emotional textures, and conceptual depth from novels.
+    else:  # creative/abstract
+        selected_book = reference
+        system_prompt = f"""You are a creative companion for sound design. Create exercises for {synthesizer} that draw inspiration from literature—pulling in vivid imagery, emotional textures, and conceptual depth from novels.
 
 {synthesizer} is a {synth_info['type']} synthesizer with {synth_info['features']}.
 
@@ -1259,84 +2590,120 @@ IMPORTANT:
 - Suggest varied time frames: "5 minutes," "until it aches," "work until it cuts," "stop when time breaks"
 - Let the exercise feel like play, not work"""
 
-            user_prompt = f"Create a creative/abstract sound design exercise inspired by a specific moment, concept, or imagery from {selected_book}. Make it evocative and strange, not generic. You MUST reference {selected_book} by name in your exercise."
+        user_prompt = f"Create a creative/abstract sound design exercise inspired by a specific moment, concept, or imagery from {selected_book}. Make it evocative and strange, not generic. You MUST reference {selected_book} by name in your exercise."
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=600,
-                presence_penalty=0.3,
-                frequency_penalty=0.3
-            )
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        'params': {
+            'temperature': 0.8,
+            'max_tokens': 600,
+            'presence_penalty': 0.3,
+            'frequency_penalty': 0.3
+        },
+        'synthesizer': synthesizer,
+        'exercise_type': exercise_type
+    }
 
-            content = response.choices[0].message.content.strip()
-            
-            # Sanitize the AI-generated content to remove corruption
-            sanitized = sanitize_ai_content(content)
-            if not sanitized:
-                logger.error("[SANITIZE] Writing prompt content sanitization failed, using fallback")
-                raise ValueError("Sanitized writing prompt content is invalid")
-            content = sanitized
-            
-            # Sanitize the AI-generated content to remove corruption
-            sanitized = sanitize_ai_content(content)
-            if not sanitized:
-                logger.error("[SANITIZE] Content sanitization failed, using fallback template")
-                raise ValueError("Sanitized content is invalid")
-            content = sanitized
-
-            # Extract title if present
-            lines = content.split('\n')
-            if lines[0].startswith('#') or (len(lines[0]) < 60 and not lines[0].endswith('.')):
-                title = lines[0].replace('#', '').strip()
-                content = '\n'.join(lines[1:]).strip()
-            else:
-                title = f"{synthesizer} - {exercise_type.capitalize()} Exercise"
-
-            # Extract tips
-            tips = []
-            tip_section_match = re.search(r'\*\*Tips.*?\*\*:?\s*\n(.*?)(?=\n\n|\Z)', content, re.DOTALL | re.IGNORECASE)
-            if tip_section_match:
-                tip_section = tip_section_match.group(1)
-                for line in tip_section.split('\n'):
-                    line = line.strip()
-                    if line.startswith('-') or line.startswith('•') or line.startswith('*'):
-                        tip = re.sub(r'^[-•*]\s*', '', line).strip()
-                        if tip and len(tip) > 10:
-                            tips.append(tip)
-                content = re.sub(r'\*\*Tips.*?\*\*:?\s*\n.*?(?=\n\n|\Z)', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
-
-            if not tips:
-                if exercise_type == 'technical':
-                    tips = [
-                        "Reference tracks can help guide your sound design decisions",
-                        "A/B test your patch in a mix context, not just solo",
-                        "Document your process - you'll learn patterns in your workflow"
-                    ]
-                else:  # creative/abstract
-                    tips = [
-                        "There is no destination, only discovery. Follow what makes you curious",
-                        "If you're overthinking, you're not playing. Trust your first instinct",
-                        "The 'mistake' that excites you is the exercise working",
-                        "Stop when the energy shifts. Not everything needs finishing",
-                        "Your ears know more than your eyes. Close the screen if it helps",
-                        "If nothing excites you after 5 minutes, start completely over",
-                        "The exercise is in the noticing, not the result"
-                    ]
-                    tips = random.sample(tips, 3)
 
-        except Exception as e:
-            logger.error(f"OpenAI API error: {str(e)}")
-            # Fallback to template
-            content = random.choice(templates.get(synthesizer, templates['Serum 2']))
-            title = f"{synthesizer} - {exercise_type.capitalize()} Exercise"
-            tips = ["Experiment with modulation sources", "Layer multiple oscillators", "Use effects creatively"]
+@timed_stage('extract')
+def parse_sound_design_response(content, ai_request):
+    """Sanitize a sound design completion and split it into (title, content, tips)"""
+    synthesizer = ai_request['synthesizer']
+    exercise_type = ai_request['exercise_type']
+    content = content.strip()
+
+    # Sanitize the AI-generated content to remove corruption
+    sanitized = sanitize_ai_content(content)
+    if not sanitized:
+        logger.error("[SANITIZE] Content sanitization failed, using fallback template")
+        raise ValueError("Sanitized content is invalid")
+    content = sanitized
+
+    # Extract title if present
+    lines = content.split('\n')
+    if lines[0].startswith('#') or (len(lines[0]) < 60 and not lines[0].endswith('.')):
+        title = lines[0].replace('#', '').strip()
+        content = '\n'.join(lines[1:]).strip()
+    else:
+        title = f"{synthesizer} - {exercise_type.capitalize()} Exercise"
+
+    # Extract tips
+    tips = []
+    tip_section_match = re.search(r'\*\*Tips.*?\*\*:?\s*\n(.*?)(?=\n\n|\Z)', content, re.DOTALL | re.IGNORECASE)
+    if tip_section_match:
+        tip_section = tip_section_match.group(1)
+        for line in tip_section.split('\n'):
+            line = line.strip()
+            if line.startswith('-') or line.startswith('•') or line.startswith('*'):
+                tip = re.sub(r'^[-•*]\s*', '', line).strip()
+                if tip and len(tip) > 10:
+                    tips.append(tip)
+        content = re.sub(r'\*\*Tips.*?\*\*:?\s*\n.*?(?=\n\n|\Z)', '', content, flags=re.DOTALL | re.IGNORECASE).strip()
+
+    if not tips:
+        if exercise_type == 'technical':
+            tips = [
+                "Reference tracks can help guide your sound design decisions",
+                "A/B test your patch in a mix context, not just solo",
+                "Document your process - you'll learn patterns in your workflow"
+            ]
+        else:  # creative/abstract
+            tips = [
+                "There is no destination, only discovery. Follow what makes you curious",
+                "If you're overthinking, you're not playing. Trust your first instinct",
+                "The 'mistake' that excites you is the exercise working",
+                "Stop when the energy shifts. Not everything needs finishing",
+                "Your ears know more than your eyes. Close the screen if it helps",
+                "If nothing excites you after 5 minutes, start completely over",
+                "The exercise is in the noticing, not the result"
+            ]
+            tips = random.sample(tips, 3)
+
+    return title, content, tips
 
+
+def _sound_design_from_template(synthesizer, exercise_type, catalog):
+    """Pick a template exercise when AI generation is disabled"""
+    templates = catalog['templates']
+    content = random.choice(templates.get(synthesizer, templates['Serum 2']))
+    title = f"{exercise_type.capitalize()} Sound Design Exercise"
+
+    if exercise_type == 'technical':
+        tips = [
+            "Start with initializing the synth to hear your changes clearly",
+            "Use your ears - trust what sounds good rather than just visual feedback",
+            "Save variations as you go to compare different approaches"
+        ]
+    else:  # creative/abstract
+        tips = [
+            "There is no destination, only discovery. Follow what makes you curious",
+            "If you're overthinking, you're not playing. Trust your first instinct",
+            "The 'mistake' that excites you is the exercise working",
+            "Stop when the energy shifts. Not everything needs finishing",
+            "Your ears know more than your eyes. Close the screen if it helps",
+            "If nothing excites you after 5 minutes, start completely over",
+            "The exercise is in the noticing, not the result"
+        ]
+        tips = random.sample(tips, 3)  # Pick 3 random tips
+
+    return title, content, tips
+
+
+def _sound_design_fallback(synthesizer, exercise_type, catalog):
+    """Template exercise used when the OpenAI call or its sanitization fails"""
+    templates = catalog['templates']
+    content = random.choice(templates.get(synthesizer, templates['Serum 2']))
+    title = f"{synthesizer} - {exercise_type.capitalize()} Exercise"
+    tips = ["Experiment with modulation sources", "Layer multiple oscillators", "Use effects creatively"]
+    return title, content, tips
+
+
+def _sound_design_result(title, content, synthesizer, exercise_type, tips):
+    """Assemble the sound design response with a matched difficulty and time"""
     # Determine difficulty and estimated time (matched pairs)
     difficulty_time_pairs = [
         ('Beginner', '15 minutes'),
@@ -1357,6 +2724,1126 @@ IMPORTANT:
         'timestamp': datetime.utcnow().isoformat()
     }
 
+
+def sound_design_from_ai(synthesizer, exercise_type, genre, catalog):
+    """Generate a sound design exercise with OpenAI (raises if the call or sanitization fails)"""
+    # Get next artist/book from rotation to ensure even distribution
+    redis_key, pool = sound_design_rotation_pool(exercise_type, genre)
+    reference = next_rotation_pick(redis_key, pool)
+    ai_request = build_sound_design_request(synthesizer, exercise_type, catalog, reference)
+    content = chat_completion(ai_request)
+    title, content, tips = parse_sound_design_response(content, ai_request)
+    return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+
+def generate_sound_design_prompt(synthesizer, exercise_type, genre="all"):
+    """Generate sound design exercises for electronic music production"""
+    catalog = _sound_design_catalog(exercise_type)
+
+    if not USE_AI:
+        title, content, tips = _sound_design_from_template(synthesizer, exercise_type, catalog)
+    elif LATENCY_BUDGETS['sound-design'] > 0:
+        def template():
+            title, content, tips = _sound_design_fallback(synthesizer, exercise_type, catalog)
+            return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+        return generate_within_budget('sound-design', sound_design_pregen_params(synthesizer, exercise_type, genre),
+                                      template)
+    else:
+        try:
+            return sound_design_from_ai(synthesizer, exercise_type, genre, catalog)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            note_fallback(e)
+            title, content, tips = _sound_design_fallback(synthesizer, exercise_type, catalog)
+
+    return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+
+def stream_sound_design_prompt(synthesizer, exercise_type, genre="all"):
+    """Streaming variant of generate_sound_design_prompt with AI enabled"""
+    catalog = _sound_design_catalog(exercise_type)
+    redis_key, pool = sound_design_rotation_pool(exercise_type, genre)
+    reference = next_rotation_pick(redis_key, pool)
+    ai_request = build_sound_design_request(synthesizer, exercise_type, catalog, reference)
+
+    def parse(content):
+        title, content, tips = parse_sound_design_response(content, ai_request)
+        return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+    def fallback():
+        title, content, tips = _sound_design_fallback(synthesizer, exercise_type, catalog)
+        return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+    return sse_generation("stream-sound-design", ai_request, parse, fallback)
+
+
+async def asound_design_from_ai(synthesizer, exercise_type, genre, catalog):
+    """Generate a sound design exercise with OpenAI (raises if the call or sanitization fails)"""
+    redis_key, pool = sound_design_rotation_pool(exercise_type, genre)
+    reference = await anext_rotation_pick(redis_key, pool)
+    ai_request = build_sound_design_request(synthesizer, exercise_type, catalog, reference)
+    content = await achat_completion(ai_request)
+    title, content, tips = parse_sound_design_response(content, ai_request)
+    return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+
+async def agenerate_sound_design_prompt(synthesizer, exercise_type, genre="all"):
+    """Async variant of generate_sound_design_prompt"""
+    catalog = _sound_design_catalog(exercise_type)
+
+    if not USE_AI:
+        title, content, tips = _sound_design_from_template(synthesizer, exercise_type, catalog)
+    else:
+        try:
+            return await asound_design_from_ai(synthesizer, exercise_type, genre, catalog)
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            note_fallback(e)
+            title, content, tips = _sound_design_fallback(synthesizer, exercise_type, catalog)
+
+    return _sound_design_result(title, content, synthesizer, exercise_type, tips)
+
+# Response cache for /generate. Each cached exercise is served to at most
+# PROMPT_CACHE_MAX_SERVES users (0 = unlimited) for PROMPT_CACHE_TTL seconds
+# (0 disables the cache).
+PROMPT_CACHE_TTL = int(os.getenv('PROMPT_CACHE_TTL', 300))
+PROMPT_CACHE_MAX_SERVES = int(os.getenv('PROMPT_CACHE_MAX_SERVES', 5))
+PROMPT_CACHE_STATS_KEY = 'prompt_cache:stats'
+
+# Return the cached prompt and count one serve, or nil once the entry is used
+# up, in a single round trip. Hits and misses are counted in a shared hash so
+# every worker reports the same totals.
+_cache_serve_script = redis_client.register_script("""
+local prompt = redis.call('HGET', KEYS[1], 'prompt')
+if prompt then
+    local serves = redis.call('HINCRBY', KEYS[1], 'serves', 1)
+    local max_serves = tonumber(ARGV[1])
+    if max_serves <= 0 or serves <= max_serves then
+        redis.call('HINCRBY', KEYS[2], 'hits', 1)
+        return prompt
+    end
+end
+redis.call('HINCRBY', KEYS[2], 'misses', 1)
+return false
+""")
+
+
+def prompt_cache_key(genres):
+    """Cache key for a genre selection: mode plus the sorted, de-duplicated genres"""
+    mode = 'ai' if USE_AI else 'template'
+    normalized = sorted(set(genre.strip() for genre in genres))
+    return f"prompt_cache:{mode}:{'|'.join(normalized)}"
+
+
+def get_cached_prompt(cache_key):
+    """Return a cached prompt that may still be served, or None"""
+    if PROMPT_CACHE_TTL <= 0:
+        return None
+    try:
+        cached = _cache_serve_script(keys=[cache_key, PROMPT_CACHE_STATS_KEY], args=[PROMPT_CACHE_MAX_SERVES], client=redis_client)
+        count_cache_lookup('prompt', cached)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.error(f"Prompt cache lookup failed: {str(e)}")
+        return None
+
+
+def cache_prompt(cache_key, prompt):
+    """Store a freshly generated prompt; the request that generated it counts as its first serve"""
+    if PROMPT_CACHE_TTL <= 0:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.delete(cache_key)
+        pipe.hset(cache_key, mapping={'prompt': json.dumps(prompt), 'serves': 1})
+        pipe.expire(cache_key, PROMPT_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Prompt cache store failed: {str(e)}")
+
+
+def cache_ai_prompt(cache_key, prompt):
+    """cache_prompt for the AI path. A template fallback served while OpenAI
+    is failing isn't cached, so the next request tries OpenAI again."""
+    if prompt.get('ai_generated'):
+        cache_prompt(cache_key, prompt)
+
+
+def prompt_cache_stats():
+    """Hit/miss counters for the /generate cache"""
+    counters = redis_client.hgetall(PROMPT_CACHE_STATS_KEY)
+    hits = int(counters.get(b'hits', 0))
+    misses = int(counters.get(b'misses', 0))
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hitRate': round(hits / total, 4) if total else 0.0,
+        'ttlSeconds': PROMPT_CACHE_TTL,
+        'maxServes': PROMPT_CACHE_MAX_SERVES
+    }
+
+
+# Request coalescing ("singleflight"). A request that misses while an
+# identical one is already generating waits for it instead of calling OpenAI
+# too: threads in this worker wait on an Event, and other workers wait for
+# the Redis lock the generating worker holds. Waiters then take their result
+# from the endpoint's shared store, so sharing follows that store's reuse
+# policy: /generate shares through the prompt cache (at most
+# PROMPT_CACHE_MAX_SERVES users per exercise), and the exercise endpoints
+# hand a fresh exercise to at most COALESCE_MAX_SHARED requests (1, the
+# default, keeps every exercise unique and turns coalescing off for them).
+# A waiter that finds nothing left to share leads the next generation. A
+# result that never reached the store (a template fallback served while
+# OpenAI is failing) or a failed generation is handed straight to waiters in
+# the generating worker; waiters in other workers see the unstored marker
+# and generate on their own at once instead of queueing for the lock.
+COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'true').lower() == 'true'
+COALESCE_MAX_SHARED = int(os.getenv('COALESCE_MAX_SHARED', 1))
+COALESCE_WAIT = float(os.getenv('COALESCE_WAIT', 15))
+COALESCE_LOCK_TTL = int(os.getenv('COALESCE_LOCK_TTL', 60))
+COALESCE_POLL_INTERVAL = 0.05
+COALESCE_UNSTORED_TTL = 1
+
+COALESCE_OUTCOMES = Counter(
+    'prompt_service_coalesce_requests_total',
+    'Coalesced requests per endpoint: generations run, calls saved, waits that timed out',
+    ['endpoint', 'outcome']
+)
+
+_coalesce_flights = {}
+_coalesce_flights_lock = threading.Lock()
+
+
+class _Flight:
+    """A generation in progress in this worker, and how it ended"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.unstored = False
+
+# Release the cross-worker lock only if this generation still holds it; a
+# generation that outlived COALESCE_LOCK_TTL must not delete the next
+# holder's lock. KEYS: lock. ARGV: this holder's token.
+_UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_unlock_script = redis_client.register_script(_UNLOCK_SCRIPT)
+
+
+def _count_coalesce(name, outcome):
+    COALESCE_OUTCOMES.labels(name, outcome).inc()
+
+
+def _lead_flight(name, key, lookup, generate, stored, deadline):
+    """Generate under the cross-worker lock, or share the result of the worker holding it"""
+    lock_key = f'coalesce:lock:{key}'
+    unstored_key = f'coalesce:unstored:{key}'
+    token = os.urandom(16).hex()
+    while True:
+        try:
+            acquired = redis_client.set(lock_key, token, nx=True, ex=COALESCE_LOCK_TTL)
+        except Exception as e:
+            logger.error(f"Coalescing lock failed for {key}: {str(e)}")
+            return generate()
+
+        if acquired:
+            result = None
+            unstored = True
+            try:
+                result = generate()
+                unstored = not stored(result)
+            finally:
+                try:
+                    # Mark the flight before releasing the lock so waiters
+                    # that see it released also see how it ended
+                    if unstored:
+                        redis_client.set(unstored_key, token, ex=COALESCE_UNSTORED_TTL)
+                    else:
+                        redis_client.delete(unstored_key)
+                    _unlock_script(keys=[lock_key], args=[token], client=redis_client)
+                except Exception as e:
+                    logger.error(f"Coalescing unlock failed for {key}: {str(e)}")
+            _count_coalesce(name, 'generated')
+            return result
+
+        # Another worker is generating: wait for it to release the lock
+        try:
+            while time.monotonic() < deadline and redis_client.exists(lock_key):
+                time.sleep(COALESCE_POLL_INTERVAL)
+            unstored = redis_client.exists(unstored_key)
+        except Exception as e:
+            logger.error(f"Coalescing wait failed for {key}: {str(e)}")
+            return generate()
+        result = lookup()
+        if result is not None:
+            _count_coalesce(name, 'saved')
+            return result
+        if unstored:
+            # Its result was never stored for sharing: don't queue behind
+            # the lock for another generation
+            _count_coalesce(name, 'generated')
+            return generate()
+        if time.monotonic() >= deadline:
+            _count_coalesce(name, 'timedOut')
+            return generate()
+
+
+def coalesce(name, key, lookup, generate, stored=lambda result: True):
+    """Run generate() once for concurrent identical requests (same key). The
+    others wait for it and return lookup(), which reads the shared store
+    generate() fills; after COALESCE_WAIT seconds they generate on their own.
+    stored(result) says whether generate() put its result in that store; if
+    not, or if generate() raised, waiters in this worker get its outcome."""
+    if not COALESCE_ENABLED:
+        return generate()
+
+    deadline = time.monotonic() + COALESCE_WAIT
+    if request_deadline() is not None:
+        deadline = min(deadline, request_deadline())
+    while True:
+        with _coalesce_flights_lock:
+            flight = _coalesce_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _coalesce_flights[key] = _Flight()
+
+        if leader:
+            try:
+                flight.result = _lead_flight(name, key, lookup, generate, stored, deadline)
+                flight.unstored = not stored(flight.result)
+                return flight.result
+            except Exception as e:
+                flight.error = e
+                raise
+            finally:
+                with _coalesce_flights_lock:
+                    del _coalesce_flights[key]
+                flight.done.set()
+
+        # Another thread in this worker is generating: wait, then take a share
+        if flight.done.wait(max(0.0, deadline - time.monotonic())):
+            result = lookup()
+            if result is not None:
+                _count_coalesce(name, 'saved')
+                return result
+            if flight.error is not None:
+                _count_coalesce(name, 'saved')
+                raise flight.error
+            if flight.unstored:
+                _count_coalesce(name, 'saved')
+                return copy.deepcopy(flight.result)
+        if time.monotonic() >= deadline:
+            _count_coalesce(name, 'timedOut')
+            return generate()
+
+
+def coalesce_stats():
+    """Per-endpoint coalescing counters: generations run, calls saved, waits that timed out"""
+    stats = {}
+    for metric in metrics_registry().collect():
+        if metric.name != 'prompt_service_coalesce_requests':
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith('_total'):
+                counts = stats.setdefault(sample.labels['endpoint'], {'generated': 0, 'saved': 0, 'timedOut': 0})
+                counts[sample.labels['outcome']] += int(sample.value)
+    for counts in stats.values():
+        requests = counts['generated'] + counts['saved'] + counts['timedOut']
+        counts['savedRate'] = round(counts['saved'] / requests, 4) if requests else 0.0
+    return {
+        'enabled': COALESCE_ENABLED,
+        'maxShared': COALESCE_MAX_SHARED,
+        'waitSeconds': COALESCE_WAIT,
+        'endpoints': stats
+    }
+
+
+def generate_prompt_coalesced(genres, cache_key):
+    """Generate and cache an AI writing prompt; identical concurrent requests
+    share the generation through the prompt cache"""
+    def generate_and_cache():
+        prompt = generate_prompt_with_ai(genres)
+        cache_ai_prompt(cache_key, prompt)
+        return prompt
+
+    if PROMPT_CACHE_TTL <= 0:
+        return generate_and_cache()
+    return coalesce('writing', cache_key, lambda: get_cached_prompt(cache_key), generate_and_cache,
+                    stored=lambda prompt: prompt.get('ai_generated'))
+
+
+def _shared_exercise_key(endpoint, params):
+    return f"coalesce:shared:{endpoint}:{'|'.join(params)}"
+
+
+def _pop_shared_exercise(shared_key):
+    try:
+        item = redis_client.lpop(shared_key)
+    except Exception as e:
+        logger.error(f"Shared exercise lookup failed: {str(e)}")
+        return None
+    if item is None:
+        return None
+    result = json.loads(item)
+    if 'timestamp' in result:
+        result['timestamp'] = datetime.utcnow().isoformat()
+    return result
+
+
+def generate_exercise_coalesced(endpoint, params, generate):
+    """Generate an AI exercise for a pregen combo, sharing it with up to
+    COALESCE_MAX_SHARED - 1 identical requests that arrive meanwhile"""
+    if COALESCE_MAX_SHARED <= 1 or not USE_AI:
+        return generate()
+
+    shared_key = _shared_exercise_key(endpoint, params)
+
+    def generate_and_share():
+        result = generate()
+        try:
+            pipe = redis_client.pipeline()
+            pipe.rpush(shared_key, *[json.dumps(result)] * (COALESCE_MAX_SHARED - 1))
+            pipe.expire(shared_key, max(1, int(COALESCE_WAIT)))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Shared exercise store failed: {str(e)}")
+        return result
+
+    result = _pop_shared_exercise(shared_key)
+    if result is not None:
+        _count_coalesce(endpoint, 'saved')
+        return result
+    return coalesce(endpoint, shared_key, lambda: _pop_shared_exercise(shared_key), generate_and_share)
+
+
+# Valid request parameters for the fixed-choice endpoints
+SOUND_DESIGN_SYNTHS = ('Serum 2', 'Phase Plant', 'Vital')
+SOUND_DESIGN_TYPES = ('technical', 'creative')
+SOUND_DESIGN_GENRES = ('all', 'dubstep', 'glitch-hop', 'dnb', 'experimental-bass', 'house', 'psytrance', 'hard-techno')
+DRAWING_SKILLS = (
+    'Observation', 'Proportion & Scale', 'Gesture',
+    'Form (3D Thinking)', 'Light & Shadow',
+    'Line Control & Mark-Making', 'Composition'
+)
+
+# Pre-generation pools. With PREGEN_ENABLED=true every worker runs a
+# background thread that keeps a Redis list of ready-to-serve AI exercises
+# for each parameter combo of the sound design, drawing and chord endpoints.
+# Handlers LPOP from the list and only call OpenAI live when it is empty.
+PREGEN_ENABLED = os.getenv('PREGEN_ENABLED', 'false').lower() == 'true'
+PREGEN_LOW_WATER = int(os.getenv('PREGEN_LOW_WATER', 1))
+PREGEN_TARGET = int(os.getenv('PREGEN_TARGET', 3))
+PREGEN_INTERVAL = int(os.getenv('PREGEN_INTERVAL', 30))
+PREGEN_CONCURRENCY = int(os.getenv('PREGEN_CONCURRENCY', 4))
+PREGEN_TTL = int(os.getenv('PREGEN_TTL', 86400))
+PREGEN_LOCK_TTL = 300
+
+
+def sound_design_pregen_params(synthesizer, exercise_type, genre):
+    """Pool parameters for a sound design request (creative exercises ignore the genre)"""
+    return (synthesizer, exercise_type, genre if exercise_type == 'technical' else 'all')
+
+
+def selection_pregen_params(selection):
+    """Pool parameters for a 1-2 item skill or emotion selection, independent of order"""
+    return tuple(sorted(set(selection)))
+
+
+def pregen_combos():
+    """Every (endpoint, params) pool the background worker keeps filled"""
+    for synthesizer in SOUND_DESIGN_SYNTHS:
+        for genre in SOUND_DESIGN_GENRES:
+            yield 'sound-design', (synthesizer, 'technical', genre)
+        yield 'sound-design', (synthesizer, 'creative', 'all')
+
+    for selection in _singles_and_pairs(DRAWING_SKILLS):
+        yield 'drawing', selection
+
+    for selection in _singles_and_pairs([e['emotion'] for e in EMOTIONS]):
+        yield 'chord', selection
+
+
+def _singles_and_pairs(items):
+    ordered = sorted(items)
+    for i, first in enumerate(ordered):
+        yield (first,)
+        for second in ordered[i + 1:]:
+            yield (first, second)
+
+
+def pregen_key(endpoint, params):
+    return f"pregen:{endpoint}:{'|'.join(params)}"
+
+
+def pregen_pop(endpoint, params):
+    """Pop a pre-generated exercise for this combo, or None if the pool is empty or disabled"""
+    # Latency budgets feed the pools with late AI results even without the refill worker
+    if not USE_AI or not (PREGEN_ENABLED or LATENCY_BUDGETS[endpoint] > 0):
+        return None
+    try:
+        item = redis_client.lpop(pregen_key(endpoint, params))
+    except Exception as e:
+        logger.error(f"Pre-generation pool lookup failed: {str(e)}")
+        return None
+    count_cache_lookup('pregen', item is not None)
+    if item is None:
+        return None
+    result = json.loads(item)
+    if 'timestamp' in result:
+        result['timestamp'] = datetime.utcnow().isoformat()
+    return result
+
+
+async def _pregenerate(endpoint, params):
+    """Generate one AI exercise for a pool; raises instead of falling back to templates"""
+    if endpoint == 'sound-design':
+        synthesizer, exercise_type, genre = params
+        return await asound_design_from_ai(synthesizer, exercise_type, genre, _sound_design_catalog(exercise_type))
+    if endpoint == 'drawing':
+        return await adrawing_exercise_from_ai(list(params), _drawing_catalog())
+    return await achord_progression_from_ai(list(params), _chord_emotion_data(params))
+
+
+async def _refill_pool(client, semaphore, endpoint, params, missing):
+    key = pregen_key(endpoint, params)
+    lock_key = f'{key}:lock'
+
+    # Only one worker refills a given pool at a time
+    token = os.urandom(16).hex()
+    if not await client.set(lock_key, token, nx=True, ex=PREGEN_LOCK_TTL):
+        return 0
+
+    added = 0
+    try:
+        for _ in range(missing):
+            async with semaphore:
+                try:
+                    item = await _pregenerate(endpoint, params)
+                except Exception as e:
+                    logger.error(f"[PREGEN] Generation failed for {key}: {str(e)}")
+                    break
+            pipe = client.pipeline()
+            pipe.rpush(key, json.dumps(item))
+            pipe.expire(key, PREGEN_TTL)
+            await pipe.execute()
+            added += 1
+    finally:
+        # A refill that outlived PREGEN_LOCK_TTL leaves the next holder's lock alone
+        await client.register_script(_UNLOCK_SCRIPT)(keys=[lock_key], args=[token])
+    return added
+
+
+async def refill_pregen_pools():
+    """Top up every pool that has dropped below the low-water mark; returns the number of exercises added"""
+    client = get_async_redis()
+    combos = list(pregen_combos())
+
+    pipe = client.pipeline(transaction=False)
+    for endpoint, params in combos:
+        pipe.llen(pregen_key(endpoint, params))
+    lengths = await pipe.execute()
+
+    semaphore = asyncio.Semaphore(PREGEN_CONCURRENCY)
+    refills = [
+        _refill_pool(client, semaphore, endpoint, params, PREGEN_TARGET - length)
+        for (endpoint, params), length in zip(combos, lengths)
+        if length < PREGEN_LOW_WATER
+    ]
+    added = sum(await asyncio.gather(*refills))
+    if added:
+        logger.info(f"[PREGEN] Added {added} exercises across {len(refills)} pools")
+    return added
+
+
+async def _pregen_loop():
+    while True:
+        try:
+            await refill_pregen_pools()
+        except Exception as e:
+            logger.error(f"[PREGEN] Refill pass failed: {str(e)}")
+        await asyncio.sleep(PREGEN_INTERVAL)
+
+
+_pregen_thread = None
+
+
+def start_pregen_worker():
+    """Start this process's background refill thread (no-op unless PREGEN_ENABLED and OpenAI is configured)"""
+    global _pregen_thread
+    if not (PREGEN_ENABLED and USE_AI):
+        return
+    if _pregen_thread is not None and _pregen_thread.is_alive():
+        return
+    _pregen_thread = threading.Thread(target=asyncio.run, args=(_pregen_loop(),), name='pregen-refill', daemon=True)
+    _pregen_thread.start()
+    logger.info("[PREGEN] Started background refill worker")
+
+
+# Latency budgets. With a budget set (seconds, 0 = off) an endpoint starts
+# the AI generation on a small thread pool and waits at most that long; past
+# the budget the request gets the template result instead, and the AI result
+# is kept for a later request when it lands: in the combo's pre-generation
+# pool for the exercise endpoints, in the prompt cache for /generate.
+LATENCY_BUDGETS = MappingProxyType({
+    'writing': float(os.getenv('LATENCY_BUDGET_WRITING', 0)),
+    'sound-design': float(os.getenv('LATENCY_BUDGET_SOUND_DESIGN', 0)),
+    'drawing': float(os.getenv('LATENCY_BUDGET_DRAWING', 0)),
+    'chord': float(os.getenv('LATENCY_BUDGET_CHORD', 0)),
+})
+LATENCY_BUDGET_WORKERS = int(os.getenv('LATENCY_BUDGET_WORKERS', 8))
+# AI generations that may wait for a budget worker; past this, requests get
+# the template at once instead of queueing behind calls that already missed
+LATENCY_BUDGET_QUEUE = int(os.getenv('LATENCY_BUDGET_QUEUE', 8))
+
+_budget_executor = None
+_budget_executor_lock = threading.Lock()
+_budget_slots = threading.BoundedSemaphore(LATENCY_BUDGET_WORKERS + LATENCY_BUDGET_QUEUE)
+
+
+def _latency_budget_executor():
+    global _budget_executor
+    with _budget_executor_lock:
+        if _budget_executor is None:
+            _budget_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=LATENCY_BUDGET_WORKERS, thread_name_prefix='latency-budget'
+            )
+        return _budget_executor
+
+
+def _keep_late_result(endpoint, future, keep):
+    try:
+        keep(future.result())
+        logger.info(f"[BUDGET] Kept late AI result for {endpoint}")
+    except Exception as e:
+        logger.error(f"[BUDGET] Late AI generation for {endpoint} failed: {str(e)}")
+
+
+def _in_request_scope(generate_ai):
+    """Wrap generate_ai to run on a budget worker with the request's deadline and span"""
+    deadline = request_deadline()
+    span = trace.get_current_span()
+
+    def run():
+        with app.app_context(), trace.use_span(span, end_on_exit=False):
+            g.deadline = deadline
+            return generate_ai()
+    return run
+
+
+def race_latency_budget(endpoint, generate_ai, fallback, keep_late):
+    """Return generate_ai() if it finishes within the endpoint's latency budget,
+    otherwise fallback(); an AI result that lands later goes to keep_late()"""
+    span = trace.get_current_span()
+    try:
+        budget = LATENCY_BUDGETS[endpoint]
+        remaining = deadline_remaining()
+        if not _budget_slots.acquire(blocking=False):
+            span.set_attribute("latency_budget.exceeded", True)
+            note_fallback(None, 'latency_budget')
+            return fallback()
+        future = _latency_budget_executor().submit(_in_request_scope(generate_ai))
+        future.add_done_callback(lambda _: _budget_slots.release())
+        concurrent.futures.wait([future], timeout=budget if remaining is None else min(budget, remaining))
+        if not future.done():
+            span.set_attribute("latency_budget.exceeded", True)
+            note_fallback(None, 'latency_budget')
+            # Still queued: drop it rather than spend a worker on it later
+            if not future.cancel():
+                future.add_done_callback(lambda late: _keep_late_result(endpoint, late, keep_late))
+            return fallback()
+        span.set_attribute("latency_budget.exceeded", False)
+        return future.result()
+    except Exception as e:
+        logger.error(f"AI generation for {endpoint} failed: {str(e)}")
+        note_fallback(e)
+        return fallback()
+
+
+def pregenerate(endpoint, params):
+    """Blocking variant of _pregenerate"""
+    if endpoint == 'sound-design':
+        synthesizer, exercise_type, genre = params
+        return sound_design_from_ai(synthesizer, exercise_type, genre, _sound_design_catalog(exercise_type))
+    if endpoint == 'drawing':
+        return drawing_exercise_from_ai(list(params), _drawing_catalog())
+    return chord_progression_from_ai(list(params), _chord_emotion_data(params))
+
+
+def pregen_push(endpoint, params, item):
+    """Add one AI exercise to a combo's pre-generation pool"""
+    pipe = redis_client.pipeline()
+    pipe.rpush(pregen_key(endpoint, params), json.dumps(item))
+    pipe.expire(pregen_key(endpoint, params), PREGEN_TTL)
+    pipe.execute()
+
+
+def generate_within_budget(endpoint, params, template):
+    """AI exercise for a pregen combo if it arrives within the endpoint's
+    latency budget, else template(); late AI results refill the combo's pool"""
+    return race_latency_budget(endpoint, lambda: pregenerate(endpoint, params), template,
+                               lambda item: pregen_push(endpoint, params, item))
+
+
+class InvalidParameters(ValueError):
+    """A generator request failed validation (answered with a 400)"""
+
+
+def writing_prompt_params(data):
+    """Validated genres for /generate"""
+    genres = data.get('genres', [])
+    if not genres:
+        raise InvalidParameters('At least one genre must be selected')
+    return genres
+
+
+def sound_design_params(data):
+    """Validated (synthesizer, exercise_type, genre) for /generate-sound-design"""
+    synthesizer = data.get('synthesizer', 'Serum 2')
+    exercise_type = data.get('exerciseType', 'technical')
+    genre = data.get('genre', 'all')
+
+    if synthesizer not in SOUND_DESIGN_SYNTHS:
+        raise InvalidParameters(f'Invalid synthesizer. Must be one of: {", ".join(SOUND_DESIGN_SYNTHS)}')
+    if exercise_type not in SOUND_DESIGN_TYPES:
+        raise InvalidParameters(f'Invalid exercise type. Must be one of: {", ".join(SOUND_DESIGN_TYPES)}')
+    if genre not in SOUND_DESIGN_GENRES:
+        raise InvalidParameters(f'Invalid genre. Must be one of: {", ".join(SOUND_DESIGN_GENRES)}')
+    return synthesizer, exercise_type, genre
+
+
+def drawing_exercise_params(data):
+    """Validated skills for /generate-drawing-exercise"""
+    skills = data.get('skills', [])
+    if not skills or len(skills) < 1 or len(skills) > 2:
+        raise InvalidParameters('Must select 1 or 2 skills')
+    for skill in skills:
+        if skill not in DRAWING_SKILLS:
+            raise InvalidParameters(f'Invalid skill: {skill}')
+    return skills
+
+
+def chord_progression_params(data):
+    """Validated (emotions, embed_midi) for /generate-chord-progression"""
+    emotions = data.get('emotions', [])
+    if not emotions or len(emotions) < 1 or len(emotions) > 2:
+        raise InvalidParameters('Must select 1 or 2 emotions')
+    valid_emotions = [e['emotion'] for e in EMOTIONS]
+    for emotion in emotions:
+        if emotion not in valid_emotions:
+            raise InvalidParameters(f'Invalid emotion: {emotion}')
+    return emotions, bool(data.get('embedMidi', MIDI_EMBED))
+
+
+def chord_progression_response(result, embed_midi):
+    """Drop the embedded base64 file when the client downloads it from /midi/<midiId>"""
+    if not embed_midi:
+        # Rendering through the cache makes sure this worker can serve the id
+        result['midiId'], _, _ = midi_cache.render(result['progression'])
+        result.pop('midiFile', None)
+    return result
+
+
+def wants_stream(data):
+    """Streaming is opt-in: "stream": true in the body or Accept: text/event-stream"""
+    return bool(data.get('stream')) or request.accept_mimetypes.best == 'text/event-stream'
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """Stream SSE events to the client without proxy buffering"""
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def sse_result(result):
+    """Event stream for a result that is already complete (cache hit, template, pregen)"""
+    yield sse_event('result', result)
+
+
+def sse_generation(span_name, ai_request, parse, fallback):
+    """Stream one OpenAI generation as SSE: a "delta" event for each sanitized
+    line as it arrives, then a "result" event with the parsed response. The
+    result is authoritative; if the completion fails or sanitizes to nothing
+    it carries fallback() instead, exactly as the non-streaming path would."""
+    with tracer.start_as_current_span(span_name) as span:
+        lines = []
+        try:
+            for line in sanitize_ai_stream(stream_chat_completion(ai_request)):
+                if not lines:
+                    span.add_event("first-line")
+                lines.append(line)
+                yield sse_event('delta', {'text': line + '\n'})
+            content = '\n'.join(lines).strip()
+            if not content:
+                raise ValueError("Sanitized content is empty")
+            result = parse(content)
+        except Exception as e:
+            logger.error(f"Streaming generation failed: {str(e)}")
+            span.set_attribute("fallback", True)
+            note_fallback(e)
+            result = fallback()
+        span.set_attribute("stream.lines", len(lines))
+        yield sse_event('result', result)
+
+
+# Feedback storage. Each rating is folded on write into totals hashes (count,
+# sum and a per-star count) for its prompt and for the artist, book and
+# exercise type the client sends with it, so GET /feedback/summary is one
+# pipelined round trip of HGETALLs instead of a scan of every rating. Per-user
+# records live in one hash per prompt (user id -> "rating:unix time", then a
+# "dimension:value" line per totals hash it was counted in), which Redis
+# keeps listpack-encoded while it is small; the hash expires FEEDBACK_TTL
+# seconds after the prompt's last rating. Artists and books must come from
+# the sound design catalogs, and a totals hash expires FEEDBACK_TOTALS_TTL
+# seconds after its last rating, so client strings can't pile up keys forever.
+FEEDBACK_TTL = int(os.getenv('FEEDBACK_TTL', 86400 * 30))
+FEEDBACK_TOTALS_TTL = int(os.getenv('FEEDBACK_TOTALS_TTL', 86400 * 180))
+FEEDBACK_RATINGS = range(1, 6)
+FEEDBACK_DIMENSIONS = ('promptId', 'artist', 'book', 'exerciseType')
+FEEDBACK_DIMENSION_VALUES = MappingProxyType({
+    'artist': frozenset(ALL_ARTISTS),
+    'book': frozenset(SOUND_DESIGN_BOOKS),
+})
+FEEDBACK_DIMENSION_MAX_LENGTH = 200
+
+# Store one user's rating of a prompt and update every totals hash, first
+# taking the user's earlier rating of the prompt out of the totals it was
+# counted in (read back from its record, not from this request's dimensions).
+# The caller reads that record first so every key is declared up front.
+# KEYS: per-prompt ratings hash, the totals hashes to count the rating in,
+# the totals hashes the previous record was counted in, then optionally a
+# batch key. ARGV: user id, rating, record, ratings TTL, totals TTL, the
+# previous record as read ('' for none), the number of totals hashes to
+# count the rating in, then optionally the batch token: the rating is
+# skipped (returning -1) unless the batch key holds it. Returns
+# FEEDBACK_STALE without writing if the record changed since it was read,
+# else the previous rating or 0.
+_FEEDBACK_SCRIPT = """
+local batched = ARGV[8] ~= nil
+if batched and redis.call('GET', KEYS[#KEYS]) ~= ARGV[8] then
+    return -1
+end
+local previous = redis.call('HGET', KEYS[1], ARGV[1]) or ''
+if previous ~= ARGV[6] then
+    return -2
+end
+local rating = tonumber(ARGV[2])
+local counted = tonumber(ARGV[7]) + 1
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+local old = 0
+if previous ~= '' then
+    old = tonumber(string.match(previous, '^[^:]+'))
+    for i = counted + 1, #KEYS - (batched and 1 or 0) do
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('HINCRBY', KEYS[i], 'count', -1)
+            redis.call('HINCRBY', KEYS[i], 'sum', -old)
+            redis.call('HINCRBY', KEYS[i], 'r' .. old, -1)
+        end
+    end
+end
+for i = 2, counted do
+    redis.call('HINCRBY', KEYS[i], 'count', 1)
+    redis.call('HINCRBY', KEYS[i], 'sum', rating)
+    redis.call('HINCRBY', KEYS[i], 'r' .. rating, 1)
+    redis.call('EXPIRE', KEYS[i], ARGV[5])
+end
+return old
+"""
+FEEDBACK_STALE = -2
+_feedback_script = redis_client.register_script(_FEEDBACK_SCRIPT)
+
+
+def feedback_totals_keys(prompt_id, dimensions):
+    """Totals hashes a rating is counted in: the prompt's, then one per dimension"""
+    totals = [feedback_totals_key('promptId', prompt_id)]
+    return totals + [feedback_totals_key(dimension, value) for dimension, value in dimensions.items()]
+
+
+def counted_totals_keys(prompt_id, record):
+    """Totals hashes a stored record was counted in (none for b'')"""
+    if not record:
+        return []
+    lines = record.decode().split('\n')[1:]
+    return [feedback_totals_key('promptId', prompt_id)] + [f'{FEEDBACK_TOTALS_PREFIX}{line}' for line in lines]
+
+
+def read_feedback_records(ratings):
+    """Stored records for [(prompt_id, user_id), ...] in one round trip (b'' where there is none)"""
+    pipe = redis_client.pipeline(transaction=False)
+    for prompt_id, user_id in ratings:
+        pipe.hget(feedback_ratings_key(prompt_id), user_id)
+    return [record or b'' for record in pipe.execute()]
+
+
+def feedback_record(rating, dimensions):
+    """Per-user record: "rating:unix time", then a "dimension:value" line per dimension"""
+    lines = [f'{rating}:{int(time.time())}'] + [f'{dimension}:{value}' for dimension, value in dimensions.items()]
+    return '\n'.join(lines)
+
+
+def invalid_feedback_dimension(dimension, value):
+    """Why a promptId/artist/book/exerciseType value can't be stored, or None"""
+    if not isinstance(value, str) or not value:
+        return f'{dimension} must be a non-empty string'
+    if dimension in FEEDBACK_DIMENSION_VALUES:
+        if value not in FEEDBACK_DIMENSION_VALUES[dimension]:
+            return f'Unknown {dimension} {value!r}'
+    elif len(value) > FEEDBACK_DIMENSION_MAX_LENGTH or not value.isprintable():
+        return f'{dimension} must be at most {FEEDBACK_DIMENSION_MAX_LENGTH} printable characters'
+    return None
+
+
+def record_feedback(prompt_id, user_id, rating, dimensions, client=None, batch=None, previous=None):
+    """Store a 1-5 rating and fold it into the totals for the prompt and each
+    {dimension: value}. Returns the rating it replaced, or None. Pass a
+    pipeline as client to batch ratings (the result then comes from execute()),
+    and (batch key, token) as batch to apply it only if that batch key holds the token.
+    previous is the user's stored record as read beforehand (read here if None);
+    if it has changed the script returns FEEDBACK_STALE, and without a
+    pipeline the rating is read and applied again."""
+    while True:
+        if previous is None:
+            previous = redis_client.hget(feedback_ratings_key(prompt_id), user_id) or b''
+        totals = feedback_totals_keys(prompt_id, dimensions)
+        keys = [feedback_ratings_key(prompt_id), *totals, *counted_totals_keys(prompt_id, previous)]
+        args = [user_id, rating, feedback_record(rating, dimensions), FEEDBACK_TTL, FEEDBACK_TOTALS_TTL,
+                previous, len(totals)]
+        if batch:
+            keys.append(batch[0])
+            args.append(batch[1])
+        replaced = _feedback_script(keys=keys, args=args, client=client or redis_client)
+        if client is not None:
+            return None
+        if int(replaced) != FEEDBACK_STALE:
+            return int(replaced) or None
+        previous = None
+
+
+def summarize_feedback_totals(totals):
+    """Count, average and per-star distribution from a totals hash"""
+    totals = {field.decode(): int(value) for field, value in totals.items()}
+    count = totals.get('count', 0)
+    return {
+        'count': count,
+        'average': round(totals.get('sum', 0) / count, 3) if count else None,
+        'distribution': {str(rating): totals.get(f'r{rating}', 0) for rating in FEEDBACK_RATINGS}
+    }
+
+
+def feedback_summary(queries):
+    """Summaries for [(dimension, value), ...] in one round trip"""
+    pipe = redis_client.pipeline(transaction=False)
+    for dimension, value in queries:
+        pipe.hgetall(feedback_totals_key(dimension, value))
+    summary = {}
+    for (dimension, value), totals in zip(queries, pipe.execute()):
+        summary.setdefault(dimension, {})[value] = summarize_feedback_totals(totals)
+    return summary
+
+
+# Write-behind buffer for ratings. POST /feedback queues the rating in this
+# worker and answers 202; a flusher thread writes queued ratings to Redis
+# FEEDBACK_BATCH_SIZE at a time in one MULTI/EXEC pipeline, as soon as a
+# batch is full or every FEEDBACK_FLUSH_INTERVAL seconds. The queue holds at
+# most FEEDBACK_BUFFER_SIZE ratings; when it is full a request waits up to
+# FEEDBACK_ENQUEUE_TIMEOUT seconds for room and then gets a 503. A batch
+# Redis rejects is retried FEEDBACK_FLUSH_RETRIES times, then dropped and
+# counted. Whatever is queued at shutdown is flushed (gunicorn worker_exit).
+# Retries are idempotent: each batch has an id, and each attempt's
+# transaction starts by claiming feedback_batch:{id} with SET NX, so a retry
+# of a batch that was applied (e.g. EXEC ran but its reply was lost) is
+# skipped instead of counting every rating twice.
+FEEDBACK_BUFFER_SIZE = int(os.getenv('FEEDBACK_BUFFER_SIZE', 10000))
+FEEDBACK_BATCH_SIZE = int(os.getenv('FEEDBACK_BATCH_SIZE', 500))
+FEEDBACK_FLUSH_INTERVAL = float(os.getenv('FEEDBACK_FLUSH_INTERVAL', 0.5))
+FEEDBACK_ENQUEUE_TIMEOUT = float(os.getenv('FEEDBACK_ENQUEUE_TIMEOUT', 0.1))
+FEEDBACK_FLUSH_RETRIES = int(os.getenv('FEEDBACK_FLUSH_RETRIES', 3))
+FEEDBACK_BATCH_ID_TTL = 3600
+
+FEEDBACK_BUFFER_DEPTH = Gauge(
+    'prompt_service_feedback_buffer_depth', 'Ratings queued for the next Redis flush',
+    multiprocess_mode='livesum'
+)
+FEEDBACK_FLUSH_SECONDS = Histogram(
+    'prompt_service_feedback_flush_duration_seconds', 'Time to write one batch of ratings to Redis',
+    buckets=STAGE_BUCKETS
+)
+FEEDBACK_EVENTS = Counter(
+    'prompt_service_feedback_events_total', 'Ratings accepted, rejected (buffer full), flushed or dropped',
+    ['outcome']
+)
+
+
+class FeedbackBufferFull(Exception):
+    """The write-behind buffer had no room for a rating within the enqueue timeout"""
+
+
+class FeedbackBuffer:
+    """Bounded in-process queue of ratings, flushed to Redis in pipelined batches"""
+
+    def __init__(self, max_events, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_events)
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def put(self, prompt_id, user_id, rating, dimensions, timeout=None):
+        """Queue a rating, waiting up to timeout seconds for room (raises FeedbackBufferFull)"""
+        self.start()
+        try:
+            self._queue.put((prompt_id, user_id, rating, dimensions), timeout=timeout)
+        except queue.Full:
+            FEEDBACK_EVENTS.labels('rejected').inc()
+            raise FeedbackBufferFull() from None
+        FEEDBACK_EVENTS.labels('accepted').inc()
+        FEEDBACK_BUFFER_DEPTH.inc()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Start this process's flusher thread if it isn't running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='feedback-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        FEEDBACK_BUFFER_DEPTH.dec(len(batch))
+        return batch
+
+    def flush(self):
+        """Write every queued rating to Redis, one pipeline per batch"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _write(self, batch):
+        # Only a user's latest rating of a prompt in the batch counts: applying it
+        # over the stored record leaves the same totals as applying each in turn
+        events = list({(event[0], event[1]): event for event in batch}.values())
+        batch_key = f'feedback_batch:{os.urandom(16).hex()}'
+        for attempt in range(FEEDBACK_FLUSH_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                records = read_feedback_records([(prompt_id, user_id) for prompt_id, user_id, *_ in events])
+                # MULTI/EXEC doesn't roll back, and a lost EXEC reply looks like a failure, so each
+                # attempt claims the batch key with its own token and every rating checks for it:
+                # only the attempt holding the claim applies anything
+                token = str(attempt)
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.set(batch_key, token, nx=True, ex=FEEDBACK_BATCH_ID_TTL)
+                for event, record in zip(events, records):
+                    record_feedback(*event, client=pipe, batch=(batch_key, token), previous=record)
+                claimed, *results = pipe.execute()
+            except Exception as e:
+                logger.error(f"[FEEDBACK] Flushing {len(batch)} ratings failed (attempt {attempt + 1}): {str(e)}")
+                if attempt < FEEDBACK_FLUSH_RETRIES:
+                    time.sleep(min(0.1 * 2 ** attempt, 2.0))
+                continue
+            if not claimed:
+                logger.warning(f"[FEEDBACK] {batch_key} was already applied by an earlier attempt")
+            # Ratings whose record another writer changed after it was read were skipped
+            for event, result in zip(events, results):
+                if result == FEEDBACK_STALE:
+                    try:
+                        record_feedback(*event)
+                    except Exception as e:
+                        logger.error(f"[FEEDBACK] Dropped a rating of {event[0]}: {str(e)}")
+                        FEEDBACK_EVENTS.labels('dropped').inc()
+            FEEDBACK_FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FEEDBACK_EVENTS.labels('flushed').inc(len(batch))
+            return
+        logger.error(f"[FEEDBACK] Dropped {len(batch)} ratings")
+        FEEDBACK_EVENTS.labels('dropped').inc(len(batch))
+
+    def close(self, timeout=5.0):
+        """Stop the flusher thread and flush what is still queued"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+feedback_buffer = FeedbackBuffer(FEEDBACK_BUFFER_SIZE, FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_INTERVAL)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.teardown_request
+def observe_request_time(error=None):
+    started = g.pop('request_started', None)
+    if started is not None and request.url_rule is not None:
+        REQUEST_SECONDS.labels(request.url_rule.rule, g.get('fallback_reason', 'none')).observe(
+            time.perf_counter() - started
+        )
+
+
+@app.before_request
+def start_request_deadline():
+    """Reject requests whose deadline passed while they were queued"""
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is None:
+        return None
+    try:
+        remaining = float(header) / 1000 - time.time()
+    except ValueError:
+        return jsonify({'error': f'Invalid {DEADLINE_HEADER} header'}), 400
+    trace.get_current_span().set_attribute("deadline.remaining_ms", int(remaining * 1000))
+    if remaining <= 0:
+        logger.warning(f"[DEADLINE] {request.path} expired {-remaining:.3f}s before it was handled")
+        return jsonify({'error': 'Request deadline exceeded'}), 504
+    g.deadline = time.monotonic() + remaining
+    return None
+
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(error):
+    return jsonify({'error': 'Request deadline exceeded'}), 504
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -1381,25 +3868,38 @@ def generate():
             span.set_attribute("genres.count", len(genres))
             span.set_attribute("genres.list", ','.join(genres))
             
-            if not genres:
-                return jsonify({'error': 'At least one genre must be selected'}), 400
+            try:
+                writing_prompt_params(data)
+            except InvalidParameters as e:
+                return jsonify({'error': str(e)}), 400
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
             
             # Generate cache key
-            
-            # Generate new prompt
-            span.add_event("generating-new-prompt")
-            
-            if USE_AI:
-                prompt = generate_prompt_with_ai(genres)
-            else:
-                prompt = generate_prompt_from_template(genres)
-            
+            cache_key = prompt_cache_key(genres)
+            prompt = get_cached_prompt(cache_key)
+            span.set_attribute("cache.hit", prompt is not None)
+
+            if prompt is None and stream and USE_AI:
+                return sse_response(stream_prompt_with_ai(genres, cache_key))
+
+            if prompt is None:
+                # Generate new prompt
+                span.add_event("generating-new-prompt")
+
+                if USE_AI:
+                    prompt = generate_prompt_coalesced(genres, cache_key)
+                else:
+                    prompt = generate_prompt_from_template(genres)
+                    cache_prompt(cache_key, prompt)
             
             # Track metrics
             span.set_attribute("prompt.title", prompt['title'])
             span.set_attribute("prompt.difficulty", prompt['difficulty'])
             span.set_attribute("prompt.word_count", prompt['wordCount'])
             
+            if stream:
+                return sse_response(sse_result(prompt))
             return jsonify(prompt), 200
             
         except Exception as e:
@@ -1408,9 +3908,67 @@ def generate():
             logger.error(f"Prompt generation failed: {str(e)}")
             return jsonify({'error': 'Failed to generate prompt'}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for the /generate response cache"""
+    try:
+        return jsonify(prompt_cache_stats()), 200
+    except Exception as e:
+        logger.error(f"Cache stats failed: {str(e)}")
+        return jsonify({'error': 'Cache stats unavailable'}), 503
+
+@app.route('/coalesce/stats', methods=['GET'])
+def coalescing_stats():
+    """How many upstream generations request coalescing saved"""
+    try:
+        return jsonify(coalesce_stats()), 200
+    except Exception as e:
+        logger.error(f"Coalescing stats failed: {str(e)}")
+        return jsonify({'error': 'Coalescing stats unavailable'}), 503
+
+@app.route('/circuit-breakers', methods=['GET'])
+def circuit_breakers():
+    """Per-model OpenAI circuit breaker state for this worker"""
+    return jsonify(circuit_breaker_stats()), 200
+
+@app.route('/concurrency-limits', methods=['GET'])
+def concurrency_limits():
+    """Per-model adaptive OpenAI concurrency limits for this worker"""
+    return jsonify(concurrency_limit_stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/cache/tiers/stats', methods=['GET'])
+def two_tier_cache_stats():
+    """Per-tier hit/miss/eviction counters of this worker's two-tier caches"""
+    return jsonify({'caches': {name: cache.stats() for name, cache in TWO_TIER_CACHES.items()}}), 200
+
+@app.route('/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Drop two-tier caches ({"caches": [...]}, default all) from Redis"""
+    names = (request.get_json(silent=True) or {}).get('caches')
+    if names is not None and (not isinstance(names, list) or any(name not in TWO_TIER_CACHES for name in names)):
+        return jsonify({'error': f'caches must be a list of: {", ".join(TWO_TIER_CACHES)}'}), 400
+    try:
+        invalidate_caches(names)
+    except Exception as e:
+        logger.error(f"Cache invalidation failed: {str(e)}")
+        return jsonify({'error': 'Cache invalidation failed'}), 503
+    return jsonify({'invalidated': names or list(TWO_TIER_CACHES)}), 200
+
+@app.route('/cache/midi/stats', methods=['GET'])
+def midi_cache_stats():
+    """Hit/miss counters for this worker's rendered MIDI cache"""
+    return jsonify(midi_cache.stats()), 200
+
 @app.route('/feedback', methods=['POST'])
 def feedback():
-    """Collect feedback on generated prompts"""
+    """Collect a 1-5 rating of a generated prompt, with the optional artist,
+    book and exerciseType it was generated from. The rating is queued and
+    written to Redis with the next batch."""
     with tracer.start_as_current_span("prompt-feedback") as span:
         try:
             data = request.json
@@ -1418,88 +3976,119 @@ def feedback():
             rating = data.get('rating')
             user_id = data.get('userId', 'anonymous')
 
-            span.set_attribute("user.id", user_id)
-            span.set_attribute("prompt.id", prompt_id)
-            span.set_attribute("feedback.rating", rating)
-
-            # Store feedback in Redis
-            feedback_key = f"feedback:{prompt_id}:{user_id}"
-            redis_client.setex(
-                feedback_key,
-                86400 * 30,  # 30 days TTL
-                json.dumps({
-                    'rating': rating,
-                    'timestamp': datetime.utcnow().isoformat()
-                })
-            )
+            span.set_attribute("user.id", str(user_id))
+            span.set_attribute("prompt.id", str(prompt_id))
+            span.set_attribute("feedback.rating", str(rating))
 
-            return jsonify({'status': 'success'}), 200
+            if not prompt_id:
+                return jsonify({'error': 'promptId is required'}), 400
+            if isinstance(rating, bool) or not isinstance(rating, int) or rating not in FEEDBACK_RATINGS:
+                return jsonify({'error': 'rating must be an integer from 1 to 5'}), 400
+            dimensions = {dimension: data[dimension] for dimension in FEEDBACK_DIMENSIONS[1:] if data.get(dimension)}
+            for dimension, value in [('promptId', prompt_id), *dimensions.items()]:
+                error = invalid_feedback_dimension(dimension, value)
+                if error:
+                    return jsonify({'error': error}), 400
+
+            try:
+                feedback_buffer.put(prompt_id, str(user_id), rating, dimensions, timeout=FEEDBACK_ENQUEUE_TIMEOUT)
+            except FeedbackBufferFull:
+                span.set_attribute("feedback.rejected", True)
+                return jsonify({'error': 'Too much feedback right now, try again shortly'}), 503, {'Retry-After': '1'}
+
+            return jsonify({'status': 'accepted'}), 202
 
         except Exception as e:
             span.record_exception(e)
             logger.error(f"Feedback submission failed: {str(e)}")
             return jsonify({'error': 'Failed to submit feedback'}), 500
 
-def generate_drawing_exercise(selected_skills):
-    """Generate a drawing exercise based on 1-2 selected skills"""
-    import random
-
-    # Skills with their detailed descriptions
-    SKILL_INFO = {
-        'Observation': {
-            'description': 'The ability to actually see what\'s in front of you, not what you think is there',
-            'focus': ['seeing angles and proportions accurately', 'noticing subtle shapes', 'recognizing light/shadow patterns', 'comparing distances and negative space']
-        },
-        'Proportion & Scale': {
-            'description': 'Understanding the size relationships between elements',
-            'focus': ['measuring relative sizes', 'comparative lengths', 'scale consistency', 'spatial relationships']
-        },
-        'Gesture': {
-            'description': 'Capturing the movement, flow, and energy of a pose',
-            'focus': ['body rhythm', 'weight distribution', 'pose essence', 'dynamic flow']
-        },
-        'Form (3D Thinking)': {
-            'description': 'Turning 2D shapes into 3D objects',
-            'focus': ['visualizing volumes', 'constructing from simple shapes', 'understanding form in space', 'dimensional thinking']
-        },
-        'Light & Shadow': {
-            'description': 'Understanding how light interacts with form',
-            'focus': ['cast shadows', 'core shadows', 'highlights', 'light direction', 'value relationships']
-        },
-        'Line Control & Mark-Making': {
-            'description': 'The physical skill of drawing confident, varied lines',
-            'focus': ['line weight variation', 'confident strokes', 'clean contours', 'hatching techniques', 'mark variety']
-        },
-        'Composition': {
-            'description': 'Arranging elements for maximum visual impact',
-            'focus': ['balance', 'focal points', 'depth', 'leading lines', 'visual hierarchy']
-        }
+@app.route('/feedback/summary', methods=['GET'])
+def feedback_summary_endpoint():
+    """Rating count, average and distribution per requested promptId, artist,
+    book and exerciseType (each may repeat), e.g. ?artist=Noisia&promptId=abc"""
+    queries = [(dimension, value) for dimension in FEEDBACK_DIMENSIONS
+               for value in dict.fromkeys(request.args.getlist(dimension)) if value]
+    if not queries:
+        return jsonify({'error': f'Pass at least one of: {", ".join(FEEDBACK_DIMENSIONS)}'}), 400
+    try:
+        return jsonify(feedback_summary(queries)), 200
+    except Exception as e:
+        logger.error(f"Feedback summary failed: {str(e)}")
+        return jsonify({'error': 'Failed to load feedback summary'}), 503
+
+# Drawing catalogs, built once at import and frozen
+# Skills with their detailed descriptions
+DRAWING_SKILL_INFO = _freeze({
+    'Observation': {
+        'description': 'The ability to actually see what\'s in front of you, not what you think is there',
+        'focus': ['seeing angles and proportions accurately', 'noticing subtle shapes', 'recognizing light/shadow patterns', 'comparing distances and negative space']
+    },
+    'Proportion & Scale': {
+        'description': 'Understanding the size relationships between elements',
+        'focus': ['measuring relative sizes', 'comparative lengths', 'scale consistency', 'spatial relationships']
+    },
+    'Gesture': {
+        'description': 'Capturing the movement, flow, and energy of a pose',
+        'focus': ['body rhythm', 'weight distribution', 'pose essence', 'dynamic flow']
+    },
+    'Form (3D Thinking)': {
+        'description': 'Turning 2D shapes into 3D objects',
+        'focus': ['visualizing volumes', 'constructing from simple shapes', 'understanding form in space', 'dimensional thinking']
+    },
+    'Light & Shadow': {
+        'description': 'Understanding how light interacts with form',
+        'focus': ['cast shadows', 'core shadows', 'highlights', 'light direction', 'value relationships']
+    },
+    'Line Control & Mark-Making': {
+        'description': 'The physical skill of drawing confident, varied lines',
+        'focus': ['line weight variation', 'confident strokes', 'clean contours', 'hatching techniques', 'mark variety']
+    },
+    'Composition': {
+        'description': 'Arranging elements for maximum visual impact',
+        'focus': ['balance', 'focal points', 'depth', 'leading lines', 'visual hierarchy']
     }
+})
+
+# Time durations and difficulty mappings
+DRAWING_DIFFICULTY_TIME_MAP = _freeze({
+    'Beginner': '20 minutes',
+    'Intermediate': '10 minutes',
+    'Advanced': '1 minute'
+})
+DRAWING_DIFFICULTIES = ('Beginner', 'Intermediate', 'Advanced')
+
+# Subject matter options
+DRAWING_SUBJECTS = (
+    'figure drawing', 'still life', 'landscape', 'architecture',
+    'hands', 'feet', 'faces', 'drapery', 'animals', 'vehicles',
+    'plants', 'interiors', 'portraits', 'urban sketching'
+)
 
-    # Time durations and difficulty mappings
-    difficulty_time_map = {
-        'Beginner': '20 minutes',
-        'Intermediate': '10 minutes',
-        'Advanced': '1 minute'
-    }
-    difficulties = ['Beginner', 'Intermediate', 'Advanced']
+DRAWING_CATALOG = MappingProxyType({
+    'skill_info': DRAWING_SKILL_INFO,
+    'difficulty_time_map': DRAWING_DIFFICULTY_TIME_MAP,
+    'difficulties': DRAWING_DIFFICULTIES,
+    'subjects': DRAWING_SUBJECTS
+})
+
+
+def _drawing_catalog():
+    """Return the frozen skill descriptions, difficulty/time mappings and subjects for drawing exercises"""
+    return DRAWING_CATALOG
 
-    # Subject matter options
-    subjects = [
-        'figure drawing', 'still life', 'landscape', 'architecture',
-        'hands', 'feet', 'faces', 'drapery', 'animals', 'vehicles',
-        'plants', 'interiors', 'portraits', 'urban sketching'
-    ]
+
+def build_drawing_exercise_request(selected_skills, catalog):
+    """Build the OpenAI request for a drawing exercise targeting 1-2 skills"""
+    SKILL_INFO = catalog['skill_info']
 
     skill_string = ' and '.join(selected_skills)
     skill_focus_points = []
     for skill in selected_skills:
         skill_focus_points.extend(SKILL_INFO[skill]['focus'])
 
-    # Create skill-specific exercise prompt based on combinations
-    if USE_AI:
-        # Build comprehensive prompt for AI
-        system_prompt = f"""You are an expert drawing instructor who creates targeted skill-building exercises.
+    # Build comprehensive prompt for AI
+    system_prompt = f"""You are an expert drawing instructor who creates targeted skill-building exercises.
 
 Create a drawing exercise focusing on: {skill_string}
 
@@ -1523,65 +4112,83 @@ IMPORTANT FORMAT:
 
 Be specific and actionable. Focus on the METHOD, not just the outcome."""
 
-        user_prompt = f"Create a {'skill-fusion' if len(selected_skills) > 1 else skill_string} drawing exercise"
+    user_prompt = f"Create a {'skill-fusion' if len(selected_skills) > 1 else skill_string} drawing exercise"
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8,
-                max_tokens=600
-            )
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        'params': {
+            'temperature': 0.8,
+            'max_tokens': 600
+        },
+        'selected_skills': selected_skills,
+        'skill_string': skill_string,
+        'skill_focus_points': skill_focus_points
+    }
 
-            content = response.choices[0].message.content.strip()
 
-            # Extract title
-            title = f"{skill_string} Exercise"
-            lines = content.split('\n')
-            for line in lines[:3]:
-                if line.startswith('Exercise:'):
-                    title = line.replace('Exercise:', '').strip()
-                    break
+@timed_stage('extract')
+def parse_drawing_exercise_response(content, ai_request, catalog):
+    """Turn an OpenAI completion into a drawing exercise response"""
+    selected_skills = ai_request['selected_skills']
+    skill_string = ai_request['skill_string']
+    skill_focus_points = ai_request['skill_focus_points']
+    difficulties = catalog['difficulties']
+    difficulty_time_map = catalog['difficulty_time_map']
+    content = content.strip()
 
-            # Randomly assign difficulty and get corresponding time
-            difficulty = random.choice(difficulties)
-            estimated_time = difficulty_time_map[difficulty]
-
-            # Extract tips
-            tips = []
-            in_tips_section = False
-            for line in content.split('\n'):
-                if 'tip' in line.lower() or 'remember' in line.lower():
-                    in_tips_section = True
-                if in_tips_section and (line.strip().startswith('-') or line.strip().startswith('•')):
-                    tip = line.strip().lstrip('-•').strip()
-                    if len(tip) > 10:
-                        tips.append(tip)
-
-            if not tips:
-                tips = [
-                    f"Focus on {skill_focus_points[0]} throughout the exercise",
-                    "Don't rush - quality of observation matters more than speed",
-                    f"Review your work specifically for {skill_string} development"
-                ]
+    # Extract title
+    title = f"{skill_string} Exercise"
+    lines = content.split('\n')
+    for line in lines[:3]:
+        if line.startswith('Exercise:'):
+            title = line.replace('Exercise:', '').strip()
+            break
 
-            return {
-                'title': title,
-                'content': content,
-                'skills': selected_skills,
-                'difficulty': difficulty,
-                'estimatedTime': estimated_time,
-                'tips': tips[:3],
-                'timestamp': datetime.utcnow().isoformat(),
-                'ai_generated': True
-            }
+    # Randomly assign difficulty and get corresponding time
+    difficulty = random.choice(difficulties)
+    estimated_time = difficulty_time_map[difficulty]
+
+    # Extract tips
+    tips = []
+    in_tips_section = False
+    for line in content.split('\n'):
+        if 'tip' in line.lower() or 'remember' in line.lower():
+            in_tips_section = True
+        if in_tips_section and (line.strip().startswith('-') or line.strip().startswith('•')):
+            tip = line.strip().lstrip('-•').strip()
+            if len(tip) > 10:
+                tips.append(tip)
+
+    if not tips:
+        tips = [
+            f"Focus on {skill_focus_points[0]} throughout the exercise",
+            "Don't rush - quality of observation matters more than speed",
+            f"Review your work specifically for {skill_string} development"
+        ]
+
+    return {
+        'title': title,
+        'content': content,
+        'skills': selected_skills,
+        'difficulty': difficulty,
+        'estimatedTime': estimated_time,
+        'tips': tips[:3],
+        'timestamp': datetime.utcnow().isoformat(),
+        'ai_generated': True
+    }
 
-        except Exception as e:
-            logger.error(f"AI drawing exercise generation failed: {str(e)}")
-            # Fall through to template fallback
+
+def drawing_exercise_from_template(selected_skills, catalog):
+    """Fill one of the drawing exercise templates for the selected skills"""
+    SKILL_INFO = catalog['skill_info']
+    difficulties = catalog['difficulties']
+    difficulty_time_map = catalog['difficulty_time_map']
+    subjects = catalog['subjects']
+    skill_string = ' and '.join(selected_skills)
 
     # Template fallback
     templates = [
@@ -1648,44 +4255,104 @@ The goal isn't a "good" drawing - it's training your eye-hand connection and obs
         }
     ]
 
-    template = random.choice(templates)
-    difficulty = random.choice(difficulties)
-    estimated_time = difficulty_time_map[difficulty]
+    template = random.choice(templates)
+    difficulty = random.choice(difficulties)
+    estimated_time = difficulty_time_map[difficulty]
+
+    tips = [
+        f"The exercise specifically targets {skill_string} - stay focused on these aspects",
+        f"{'Notice how ' + ' and '.join(selected_skills) + ' inform each other as you work' if len(selected_skills) > 1 else 'Every decision should reinforce ' + selected_skills[0]}",
+        "Repetition builds skill - consider doing this exercise multiple times this week"
+    ]
+
+    return {
+        'title': f"{skill_string} - {template['type']}",
+        'content': template['content'],
+        'skills': selected_skills,
+        'difficulty': difficulty,
+        'estimatedTime': estimated_time,
+        'tips': tips,
+        'timestamp': datetime.utcnow().isoformat(),
+        'ai_generated': False
+    }
+
+
+def drawing_exercise_from_ai(selected_skills, catalog):
+    """Generate a drawing exercise with OpenAI (raises if the call fails)"""
+    ai_request = build_drawing_exercise_request(selected_skills, catalog)
+    content = chat_completion(ai_request)
+    return parse_drawing_exercise_response(content, ai_request, catalog)
+
+
+def generate_drawing_exercise(selected_skills):
+    """Generate a drawing exercise based on 1-2 selected skills"""
+    catalog = _drawing_catalog()
+
+    if USE_AI and LATENCY_BUDGETS['drawing'] > 0:
+        return generate_within_budget('drawing', selection_pregen_params(selected_skills),
+                                      lambda: drawing_exercise_from_template(selected_skills, catalog))
+
+    if USE_AI:
+        try:
+            return drawing_exercise_from_ai(selected_skills, catalog)
+        except Exception as e:
+            logger.error(f"AI drawing exercise generation failed: {str(e)}")
+            note_fallback(e)
+            # Fall through to template fallback
+
+    return drawing_exercise_from_template(selected_skills, catalog)
+
+
+def stream_drawing_exercise(selected_skills):
+    """Streaming variant of generate_drawing_exercise with AI enabled"""
+    catalog = _drawing_catalog()
+    ai_request = build_drawing_exercise_request(selected_skills, catalog)
+    return sse_generation(
+        "stream-drawing-exercise", ai_request,
+        lambda content: parse_drawing_exercise_response(content, ai_request, catalog),
+        lambda: drawing_exercise_from_template(selected_skills, catalog)
+    )
+
+
+async def adrawing_exercise_from_ai(selected_skills, catalog):
+    """Generate a drawing exercise with OpenAI (raises if the call fails)"""
+    ai_request = build_drawing_exercise_request(selected_skills, catalog)
+    content = await achat_completion(ai_request)
+    return parse_drawing_exercise_response(content, ai_request, catalog)
 
-    tips = [
-        f"The exercise specifically targets {skill_string} - stay focused on these aspects",
-        f"{'Notice how ' + ' and '.join(selected_skills) + ' inform each other as you work' if len(selected_skills) > 1 else 'Every decision should reinforce ' + selected_skills[0]}",
-        "Repetition builds skill - consider doing this exercise multiple times this week"
-    ]
 
-    return {
-        'title': f"{skill_string} - {template['type']}",
-        'content': template['content'],
-        'skills': selected_skills,
-        'difficulty': difficulty,
-        'estimatedTime': estimated_time,
-        'tips': tips,
-        'timestamp': datetime.utcnow().isoformat(),
-        'ai_generated': False
-    }
+async def agenerate_drawing_exercise(selected_skills):
+    """Async variant of generate_drawing_exercise"""
+    catalog = _drawing_catalog()
 
-def generate_chord_progression(selected_emotions):
-    """Generate a chord progression based on 1-2 selected emotions"""
+    if USE_AI:
+        try:
+            return await adrawing_exercise_from_ai(selected_skills, catalog)
+        except Exception as e:
+            logger.error(f"AI drawing exercise generation failed: {str(e)}")
+            note_fallback(e)
+
+    return drawing_exercise_from_template(selected_skills, catalog)
+
+def _chord_emotion_data(selected_emotions):
+    """Look up the EMOTIONS entries for the selected emotion names"""
     # Get emotion data
     emotion_data = [e for e in EMOTIONS if e['emotion'] in selected_emotions]
 
     if not emotion_data:
         raise ValueError("No valid emotions selected")
+    return emotion_data
 
+
+def build_chord_progression_request(selected_emotions, emotion_data):
+    """Build the OpenAI request for an emotion-driven chord progression"""
     # Combine emotion notes for AI prompt
     combined_notes = " ".join([e['notes_for_generation'] for e in emotion_data])
     combined_tonal_centers = ", ".join([e['tonal_center'] for e in emotion_data])
     combined_chord_colors = list(set([color for e in emotion_data for color in e['chord_colors']]))
     emotion_names = " + ".join([e['emotion'] for e in emotion_data])
 
-    # Generate with AI if available
-    if USE_AI:
-        system_prompt = f"""You are a music theory expert and composer specializing in emotional harmonic progression.
+    system_prompt = f"""You are a music theory expert and composer specializing in emotional harmonic progression.
 
 Create a chord progression that evokes: {emotion_names}
 
@@ -1705,71 +4372,79 @@ IMPORTANT FORMAT:
 
 Keep the progression 4-8 chords. Be specific about chord qualities (maj7, add9, sus2, etc)."""
 
-        user_prompt = f"Create a chord progression for: {emotion_names}"
+    user_prompt = f"Create a chord progression for: {emotion_names}"
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        'params': {
+            'temperature': 0.7,
+            'max_tokens': 500
+        },
+        'selected_emotions': selected_emotions,
+        'emotion_names': emotion_names
+    }
 
-            content = response.choices[0].message.content.strip()
-
-            # Parse the response to extract progression and explanation
-            lines = content.split('\n')
-            progression_line = ""
-            explanation = []
-
-            for i, line in enumerate(lines):
-                if line.startswith("Progression:"):
-                    progression_line = line.replace("Progression:", "").strip()
-                elif progression_line:  # After we found the progression, rest is explanation
-                    explanation.append(line)
-
-            if not progression_line:
-                # Try to find chord progression in first line
-                progression_line = lines[0].strip()
-                explanation = lines[1:]
-
-            explanation_text = "\n".join(explanation).strip()
-
-            # Parse chord progression
-            chords = parse_chord_progression(progression_line)
-
-            # Create MIDI file
-            midi_bytes = create_midi_file(chords, tempo=80, duration_per_chord=4.0)
-            midi_base64 = base64.b64encode(midi_bytes).decode('utf-8')
-
-            # Determine difficulty and time based on complexity
-            num_chords = len(chords)
-            if num_chords <= 4:
-                difficulty = "Beginner"
-                estimated_time = "10 minutes"
-            elif num_chords <= 6:
-                difficulty = "Intermediate"
-                estimated_time = "15 minutes"
-            else:
-                difficulty = "Advanced"
-                estimated_time = "20 minutes"
 
-            return {
-                'title': f"{emotion_names} Chord Progression",
-                'progression': progression_line,
-                'explanation': explanation_text,
-                'emotions': selected_emotions,
-                'difficulty': difficulty,
-                'estimatedTime': estimated_time,
-                'midiFile': midi_base64
-            }
+@timed_stage('extract')
+def parse_chord_progression_response(content, ai_request):
+    """Turn an OpenAI completion into a chord progression response with a rendered MIDI file"""
+    selected_emotions = ai_request['selected_emotions']
+    emotion_names = ai_request['emotion_names']
+    content = content.strip()
+
+    # Parse the response to extract progression and explanation
+    lines = content.split('\n')
+    progression_line = ""
+    explanation = []
+
+    for i, line in enumerate(lines):
+        if line.startswith("Progression:"):
+            progression_line = line.replace("Progression:", "").strip()
+        elif progression_line:  # After we found the progression, rest is explanation
+            explanation.append(line)
+
+    if not progression_line:
+        # Try to find chord progression in first line
+        progression_line = lines[0].strip()
+        explanation = lines[1:]
+
+    explanation_text = "\n".join(explanation).strip()
+
+    # Parse chord progression and render (or reuse) its MIDI file
+    chords = parse_chord_progression(progression_line)
+    midi_key, _, midi_base64 = midi_cache.render(progression_line, tempo=80, duration_per_chord=4.0)
+
+    # Determine difficulty and time based on complexity
+    num_chords = len(chords)
+    if num_chords <= 4:
+        difficulty = "Beginner"
+        estimated_time = "10 minutes"
+    elif num_chords <= 6:
+        difficulty = "Intermediate"
+        estimated_time = "15 minutes"
+    else:
+        difficulty = "Advanced"
+        estimated_time = "20 minutes"
+
+    return {
+        'title': f"{emotion_names} Chord Progression",
+        'progression': progression_line,
+        'explanation': explanation_text,
+        'emotions': selected_emotions,
+        'difficulty': difficulty,
+        'estimatedTime': estimated_time,
+        'midiId': midi_key,
+        'midiFile': midi_base64
+    }
 
-        except Exception as e:
-            logger.error(f"Chord progression AI generation failed: {str(e)}")
-            # Fall through to template-based generation
+
+def chord_progression_from_template(selected_emotions, emotion_data):
+    """Build a simple progression from the first emotion's tonal center"""
+    emotion_names = " + ".join([e['emotion'] for e in emotion_data])
 
     # Template-based fallback
     # Simple progression based on first emotion
@@ -1784,9 +4459,7 @@ Keep the progression 4-8 chords. Be specific about chord qualities (maj7, add9,
         key_note = tonal_center.split(' ')[0]
         progression = f"{key_note} - {key_note}maj7 - {key_note} add9 - {key_note}"
 
-    chords = parse_chord_progression(progression)
-    midi_bytes = create_midi_file(chords)
-    midi_base64 = base64.b64encode(midi_bytes).decode('utf-8')
+    midi_key, _, midi_base64 = midi_cache.render(progression)
 
     return {
         'title': f"{emotion_names} Chord Progression",
@@ -1795,9 +4468,71 @@ Keep the progression 4-8 chords. Be specific about chord qualities (maj7, add9,
         'emotions': selected_emotions,
         'difficulty': "Beginner",
         'estimatedTime': "10 minutes",
+        'midiId': midi_key,
         'midiFile': midi_base64
     }
 
+
+def generate_chord_progression(selected_emotions):
+    """Generate a chord progression based on 1-2 selected emotions"""
+    emotion_data = _chord_emotion_data(selected_emotions)
+
+    if USE_AI and LATENCY_BUDGETS['chord'] > 0:
+        return generate_within_budget('chord', selection_pregen_params(selected_emotions),
+                                      lambda: chord_progression_from_template(selected_emotions, emotion_data))
+
+    # Generate with AI if available
+    if USE_AI:
+        try:
+            return chord_progression_from_ai(selected_emotions, emotion_data)
+        except Exception as e:
+            logger.error(f"Chord progression AI generation failed: {str(e)}")
+            note_fallback(e)
+            # Fall through to template-based generation
+
+    return chord_progression_from_template(selected_emotions, emotion_data)
+
+
+def stream_chord_progression(selected_emotions, embed_midi):
+    """Streaming variant of generate_chord_progression with AI enabled"""
+    emotion_data = _chord_emotion_data(selected_emotions)
+    ai_request = build_chord_progression_request(selected_emotions, emotion_data)
+    return sse_generation(
+        "stream-chord-progression", ai_request,
+        lambda content: chord_progression_response(parse_chord_progression_response(content, ai_request), embed_midi),
+        lambda: chord_progression_response(chord_progression_from_template(selected_emotions, emotion_data), embed_midi)
+    )
+
+
+def chord_progression_from_ai(selected_emotions, emotion_data):
+    """Generate a chord progression with OpenAI (raises if the call fails)"""
+    ai_request = build_chord_progression_request(selected_emotions, emotion_data)
+    content = chat_completion(ai_request)
+    return parse_chord_progression_response(content, ai_request)
+
+
+async def achord_progression_from_ai(selected_emotions, emotion_data):
+    """Generate a chord progression with OpenAI (raises if the call fails)"""
+    ai_request = build_chord_progression_request(selected_emotions, emotion_data)
+    content = await achat_completion(ai_request)
+    # Parsing renders the MIDI, which reads and writes the Redis render cache
+    return await asyncio.to_thread(parse_chord_progression_response, content, ai_request)
+
+
+async def agenerate_chord_progression(selected_emotions):
+    """Async variant of generate_chord_progression"""
+    emotion_data = _chord_emotion_data(selected_emotions)
+
+    if USE_AI:
+        try:
+            return await achord_progression_from_ai(selected_emotions, emotion_data)
+        except Exception as e:
+            logger.error(f"Chord progression AI generation failed: {str(e)}")
+            note_fallback(e)
+
+    return await asyncio.to_thread(chord_progression_from_template, selected_emotions, emotion_data)
+
+
 @app.route('/generate-chord-progression', methods=['POST'])
 def generate_chord_progression_endpoint():
     """Generate a chord progression based on selected emotions"""
@@ -1811,22 +4546,33 @@ def generate_chord_progression_endpoint():
             span.set_attribute("emotions", str(emotions))
 
             # Validate inputs
-            if not emotions or len(emotions) < 1 or len(emotions) > 2:
-                return jsonify({'error': 'Must select 1 or 2 emotions'}), 400
-
-            valid_emotions = [e['emotion'] for e in EMOTIONS]
-            for emotion in emotions:
-                if emotion not in valid_emotions:
-                    return jsonify({'error': f'Invalid emotion: {emotion}'}), 400
+            try:
+                emotions, embed_midi = chord_progression_params(data)
+            except InvalidParameters as e:
+                return jsonify({'error': str(e)}), 400
+            span.set_attribute("midi.embedded", embed_midi)
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
 
             # Generate progression
             span.add_event("generating-chord-progression")
-            result = generate_chord_progression(emotions)
+            result = pregen_pop('chord', selection_pregen_params(emotions))
+            span.set_attribute("pregen.hit", result is not None)
+            if result is None and stream and USE_AI:
+                return sse_response(stream_chord_progression(emotions, embed_midi))
+            if result is None:
+                result = generate_exercise_coalesced('chord', selection_pregen_params(emotions),
+                                                     lambda: generate_chord_progression(emotions))
+            result['emotions'] = emotions
+
+            result = chord_progression_response(result, embed_midi)
 
             # Track metrics
             span.set_attribute("progression.title", result['title'])
             span.set_attribute("progression.difficulty", result['difficulty'])
 
+            if stream:
+                return sse_response(sse_result(result))
             return jsonify(result), 200
 
         except Exception as e:
@@ -1835,6 +4581,29 @@ def generate_chord_progression_endpoint():
             logger.error(f"Chord progression generation failed: {str(e)}")
             return jsonify({'error': 'Failed to generate chord progression'}), 500
 
+@app.route('/midi/<midi_key>', methods=['GET'])
+def download_midi(midi_key):
+    """Serve a rendered chord progression as audio/midi; ids are content
+    addresses, so the file never changes and repeat downloads get a 304.
+    A cached copy lives for MIDI_CACHE_REDIS_TTL (or only in the rendering
+    worker when that is 0); after that the file is rendered again from the
+    ?progression= the id was issued for."""
+    if not re.fullmatch(r'[0-9a-f]{32}', midi_key):
+        return jsonify({'error': 'Invalid MIDI id'}), 400
+
+    midi_bytes = midi_cache.lookup(midi_key)
+    if midi_bytes is None:
+        progression = request.args.get('progression')
+        if progression is None or midi_id(progression) != midi_key:
+            return jsonify({'error': 'MIDI file not found'}), 404
+        _, midi_bytes, _ = midi_cache.render(progression)
+
+    response = Response(midi_bytes, mimetype='audio/midi')
+    response.set_etag(midi_key)
+    response.headers['Cache-Control'] = f'public, max-age={MIDI_HTTP_MAX_AGE}, immutable'
+    response.headers['Content-Disposition'] = f'attachment; filename="chord-progression-{midi_key[:8]}.mid"'
+    return response.make_conditional(request)
+
 @app.route('/generate-sound-design', methods=['POST'])
 def generate_sound_design():
     """Generate a sound design exercise based on synthesizer and exercise type"""
@@ -1852,28 +4621,32 @@ def generate_sound_design():
             span.set_attribute("genre", genre)
 
             # Validate inputs
-            valid_synths = ['Serum 2', 'Phase Plant', 'Vital']
-            valid_types = ['technical', 'creative']
-            valid_genres = ['all', 'dubstep', 'glitch-hop', 'dnb', 'experimental-bass', 'house', 'psytrance', 'hard-techno']
-
-            if synthesizer not in valid_synths:
-                return jsonify({'error': f'Invalid synthesizer. Must be one of: {", ".join(valid_synths)}'}), 400
-
-            if exercise_type not in valid_types:
-                return jsonify({'error': f'Invalid exercise type. Must be one of: {", ".join(valid_types)}'}), 400
-
-            if genre not in valid_genres:
-                return jsonify({'error': f'Invalid genre. Must be one of: {", ".join(valid_genres)}'}), 400
+            try:
+                sound_design_params(data)
+            except InvalidParameters as e:
+                return jsonify({'error': str(e)}), 400
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
 
             # Generate prompt
             span.add_event("generating-sound-design-prompt")
-            prompt = generate_sound_design_prompt(synthesizer, exercise_type, genre)
+            prompt = pregen_pop('sound-design', sound_design_pregen_params(synthesizer, exercise_type, genre))
+            span.set_attribute("pregen.hit", prompt is not None)
+            if prompt is None and stream and USE_AI:
+                return sse_response(stream_sound_design_prompt(synthesizer, exercise_type, genre))
+            if prompt is None:
+                prompt = generate_exercise_coalesced(
+                    'sound-design', sound_design_pregen_params(synthesizer, exercise_type, genre),
+                    lambda: generate_sound_design_prompt(synthesizer, exercise_type, genre)
+                )
 
             # Track metrics
             span.set_attribute("prompt.title", prompt['title'])
             span.set_attribute("prompt.difficulty", prompt['difficulty'])
             span.set_attribute("prompt.estimated_time", prompt['estimatedTime'])
 
+            if stream:
+                return sse_response(sse_result(prompt))
             return jsonify(prompt), 200
 
         except Exception as e:
@@ -1895,27 +4668,31 @@ def generate_drawing_exercise_endpoint():
             span.set_attribute("skills", str(skills))
 
             # Validate inputs
-            if not skills or len(skills) < 1 or len(skills) > 2:
-                return jsonify({'error': 'Must select 1 or 2 skills'}), 400
-
-            valid_skills = [
-                'Observation', 'Proportion & Scale', 'Gesture',
-                'Form (3D Thinking)', 'Light & Shadow',
-                'Line Control & Mark-Making', 'Composition'
-            ]
-            for skill in skills:
-                if skill not in valid_skills:
-                    return jsonify({'error': f'Invalid skill: {skill}'}), 400
+            try:
+                drawing_exercise_params(data)
+            except InvalidParameters as e:
+                return jsonify({'error': str(e)}), 400
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
 
             # Generate exercise
             span.add_event("generating-drawing-exercise")
-            result = generate_drawing_exercise(skills)
+            result = pregen_pop('drawing', selection_pregen_params(skills))
+            span.set_attribute("pregen.hit", result is not None)
+            if result is None and stream and USE_AI:
+                return sse_response(stream_drawing_exercise(skills))
+            if result is None:
+                result = generate_exercise_coalesced('drawing', selection_pregen_params(skills),
+                                                     lambda: generate_drawing_exercise(skills))
+            result['skills'] = skills
 
             # Track metrics
             span.set_attribute("exercise.title", result['title'])
             span.set_attribute("exercise.difficulty", result['difficulty'])
             span.set_attribute("exercise.estimated_time", result['estimatedTime'])
 
+            if stream:
+                return sse_response(sse_result(result))
             return jsonify(result), 200
 
         except Exception as e:
@@ -1924,35 +4701,234 @@ def generate_drawing_exercise_endpoint():
             logger.error(f"Drawing exercise generation failed: {str(e)}")
             return jsonify({'error': 'Failed to generate drawing exercise'}), 500
 
-@app.route('/generate-writing-feedback', methods=['POST'])
-def generate_writing_feedback_endpoint():
-    """Generate AI feedback for a writing exercise submission"""
-    with tracer.start_as_current_span("generate-writing-feedback") as span:
+# Batch variants of the generator endpoints. Items run concurrently on the
+# async generation path, at most BATCH_CONCURRENCY at a time, and results
+# come back in request order with per-item errors. Blocking Redis work (the
+# prompt cache, pre-generation pools, MIDI rendering) runs in a thread so it
+# doesn't stall the other items on the event loop. Items don't coalesce with
+# identical requests and have no latency budget: the client waits for the
+# whole batch anyway, and the items of one batch are meant to differ.
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 50))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+
+
+async def abatch_writing_prompt(data):
+    genres = writing_prompt_params(data)
+    cache_key = prompt_cache_key(genres)
+    prompt = await asyncio.to_thread(get_cached_prompt, cache_key)
+    if prompt is None and USE_AI:
+        prompt = await agenerate_prompt_with_ai(genres)
+        await asyncio.to_thread(cache_ai_prompt, cache_key, prompt)
+    elif prompt is None:
+        prompt = generate_prompt_from_template(genres)
+        await asyncio.to_thread(cache_prompt, cache_key, prompt)
+    return prompt
+
+
+async def abatch_sound_design(data):
+    synthesizer, exercise_type, genre = sound_design_params(data)
+    prompt = await asyncio.to_thread(pregen_pop, 'sound-design',
+                                     sound_design_pregen_params(synthesizer, exercise_type, genre))
+    if prompt is None:
+        prompt = await agenerate_sound_design_prompt(synthesizer, exercise_type, genre)
+    return prompt
+
+
+async def abatch_drawing_exercise(data):
+    skills = drawing_exercise_params(data)
+    result = await asyncio.to_thread(pregen_pop, 'drawing', selection_pregen_params(skills))
+    if result is None:
+        return await agenerate_drawing_exercise(skills)
+    result['skills'] = skills
+    return result
+
+
+async def abatch_chord_progression(data):
+    emotions, embed_midi = chord_progression_params(data)
+    result = await asyncio.to_thread(pregen_pop, 'chord', selection_pregen_params(emotions))
+    if result is None:
+        result = await agenerate_chord_progression(emotions)
+    else:
+        result['emotions'] = emotions
+    return await asyncio.to_thread(chord_progression_response, result, embed_midi)
+
+
+async def _run_batch(generate_item, items):
+    """Run one generator over every item with bounded concurrency"""
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index, item):
+        async with semaphore:
+            try:
+                if not isinstance(item, dict):
+                    raise InvalidParameters('Each item must be an object')
+                return {'ok': True, 'result': await generate_item(item)}
+            except InvalidParameters as e:
+                return {'ok': False, 'status': 400, 'error': str(e)}
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {str(e)}")
+                return {'ok': False, 'status': 500, 'error': 'Generation failed'}
+
+    try:
+        return await asyncio.gather(*[run(index, item) for index, item in enumerate(items)])
+    finally:
+        await close_async_redis()
+
+
+def batch_endpoint(span_name, generate_item):
+    """Shared body of the /batch routes"""
+    with tracer.start_as_current_span(span_name) as span:
+        data = request.get_json(silent=True) or {}
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({'error': f'At most {BATCH_MAX_ITEMS} items per batch'}), 400
+
+        span.set_attribute("user.id", data.get('userId', 'anonymous'))
+        span.set_attribute("batch.items", len(items))
+
+        results = asyncio.run(_run_batch(generate_item, items))
+        failed = sum(1 for result in results if not result['ok'])
+        span.set_attribute("batch.failed", failed)
+
+        return jsonify({'results': results, 'succeeded': len(results) - failed, 'failed': failed}), 200
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Generate writing prompts for a list of genre selections"""
+    return batch_endpoint("generate-prompt-batch", abatch_writing_prompt)
+
+@app.route('/generate-sound-design/batch', methods=['POST'])
+def generate_sound_design_batch():
+    """Generate sound design exercises for a list of parameter sets"""
+    return batch_endpoint("generate-sound-design-batch", abatch_sound_design)
+
+@app.route('/generate-drawing-exercise/batch', methods=['POST'])
+def generate_drawing_exercise_batch():
+    """Generate drawing exercises for a list of skill selections"""
+    return batch_endpoint("generate-drawing-exercise-batch", abatch_drawing_exercise)
+
+@app.route('/generate-chord-progression/batch', methods=['POST'])
+def generate_chord_progression_batch():
+    """Generate chord progressions for a list of emotion selections"""
+    return batch_endpoint("generate-chord-progression-batch", abatch_chord_progression)
+
+# Two-tier cache for generator outputs that are a pure function of their
+# request. L1 is a bounded LRU in each worker whose entries live at most
+# CACHE_L1_TTL seconds. L2 is Redis, shared by every worker for the cache's
+# TTL. Concurrent misses on one key compute once, through request
+# coalescing. Keys hash the whole OpenAI request (model, messages, params),
+# so changing a prompt or model starts a fresh set of entries by itself.
+# POST /cache/invalidate drops a cache's L2 entries on demand and bumps its
+# generation in Redis; every worker drops L1 entries stored under an older
+# generation, rechecking it at most every CACHE_GENERATION_CHECK seconds.
+CACHE_L1_TTL = float(os.getenv('CACHE_L1_TTL', 60))
+CACHE_GENERATION_CHECK = float(os.getenv('CACHE_GENERATION_CHECK', 1))
+FEEDBACK_CACHE_SIZE = int(os.getenv('FEEDBACK_CACHE_SIZE', 256))
+FEEDBACK_CACHE_TTL = int(os.getenv('FEEDBACK_CACHE_TTL', 3600))
+
+
+def request_cache_key(ai_request):
+    """Cache key for an OpenAI request: a hash of its model, messages and params"""
+    key = json.dumps([ai_request['model'], ai_request['messages'], ai_request['params']], sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+class TwoTierCache(TieredCache):
+    """JSON values cached in both tiers for `ttl` seconds (0 disables), at most CACHE_L1_TTL in L1"""
+
+    def __init__(self, name, max_entries, ttl):
+        super().__init__(name, max_entries, ttl)
+        self._generation = None
+        self._generation_checked = float('-inf')
+
+    def generation_key(self):
+        return f'cache:generation:{self.name}'
+
+    def generation(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._generation_checked < CACHE_GENERATION_CHECK:
+                return self._generation
         try:
-            data = request.json
-            exercise = data.get('exercise', '')
-            exercise_type = data.get('exerciseType', '')
-            user_writing = data.get('userWriting', '')
-            genres = data.get('genres', [])
-            difficulty = data.get('difficulty', '')
-            word_count = data.get('wordCount', 0)
+            generation = redis_client.get(self.generation_key())
+        except Exception as e:
+            # Keep serving L1 under the last known generation until the next check
+            logger.error(f"{self.name} cache generation check failed: {str(e)}")
+            generation = self._generation
+        with self._lock:
+            self._generation, self._generation_checked = generation, now
+        return generation
+
+    def invalidate(self):
+        """Drop every worker's entries: delete L2, then bump the generation L1 entries are checked against"""
+        self.clear_shared()
+        generation = redis_client.incr(self.generation_key())
+        with self._lock:
+            self._entries.clear()
+            self._generation, self._generation_checked = str(generation).encode(), time.monotonic()
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation_checked = float('-inf')
+
+    def local_ttl(self):
+        return min(CACHE_L1_TTL, self.ttl)
+
+    def encode(self, value):
+        return json.dumps(value)
+
+    def decode(self, raw):
+        return json.loads(raw)
+
+    def get(self, key, count=True):
+        if self.ttl <= 0:
+            return None
+        return super().get(key, count)
 
-            span.set_attribute("exercise.type", exercise_type)
-            span.set_attribute("genres", str(genres))
-            span.set_attribute("difficulty", difficulty)
-            span.set_attribute("wordCount.target", word_count)
-            span.set_attribute("wordCount.actual", len(user_writing.split()))
+    def set(self, key, value):
+        if self.ttl > 0:
+            super().set(key, value)
 
-            # Validate inputs
-            if not user_writing or not exercise:
-                return jsonify({'error': 'Missing required fields'}), 400
+    def get_or_compute(self, key, compute):
+        """Cached value for key, else compute() once for all concurrent misses and cache it.
+        Exceptions from compute() are not cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        if self.ttl <= 0:
+            return compute()
+
+        def compute_and_store():
+            result = compute()
+            self.set(key, result)
+            return result
+
+        return coalesce(f'cache:{self.name}', self.redis_key(key), lambda: self.get(key, count=False),
+                        compute_and_store)
+
+    def stats(self):
+        return {**super().stats(), 'ttlSeconds': self.ttl, 'l1TtlSeconds': self.local_ttl()}
 
-            # Generate feedback using AI
-            if USE_AI:
-                try:
-                    span.add_event("generating-ai-feedback")
 
-                    system_prompt = f"""You are an experienced creative writing instructor providing direct, one-on-one feedback. Address the writer as "you" throughout—speak to them directly, as if you're sitting across from them reviewing their work together.
+writing_feedback_cache = TwoTierCache('writing-feedback', FEEDBACK_CACHE_SIZE, FEEDBACK_CACHE_TTL)
+drawing_feedback_cache = TwoTierCache('drawing-feedback', FEEDBACK_CACHE_SIZE, FEEDBACK_CACHE_TTL)
+TWO_TIER_CACHES = MappingProxyType({cache.name: cache for cache in (writing_feedback_cache, drawing_feedback_cache)})
+
+
+def invalidate_caches(names=None):
+    """Drop the named caches (all by default) from Redis and every worker's L1"""
+    caches = [TWO_TIER_CACHES[name] for name in names] if names else list(TWO_TIER_CACHES.values())
+    for cache in caches:
+        cache.invalidate()
+    logger.info(f"[CACHE] Invalidated {', '.join(cache.name for cache in caches)}")
+
+
+def build_writing_feedback_request(exercise, exercise_type, user_writing, genres, difficulty, word_count):
+    """Build the OpenAI request for feedback on a writing exercise submission"""
+    system_prompt = f"""You are an experienced creative writing instructor providing direct, one-on-one feedback. Address the writer as "you" throughout—speak to them directly, as if you're sitting across from them reviewing their work together.
 
 The writer completed this exercise:
 {exercise}
@@ -1996,36 +4972,43 @@ CRITICAL APPROACH:
 - End with genuine belief in their potential IF they apply the feedback
 - Use a mentor's voice: firm, honest, but invested in their growth"""
 
-                    user_prompt = f"Here is my writing for you to review:\n\n{user_writing}"
+    user_prompt = f"Here is my writing for you to review:\n\n{user_writing}"
+
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        'params': {
+            'temperature': 0.7,
+            'max_tokens': 800
+        }
+    }
 
-                    response = openai.ChatCompletion.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        temperature=0.7,
-                        max_tokens=800
-                    )
+def generate_writing_feedback(exercise, exercise_type, user_writing, genres, difficulty, word_count):
+    """Get AI feedback on a writing submission (raises if the OpenAI call fails)"""
+    ai_request = build_writing_feedback_request(exercise, exercise_type, user_writing, genres, difficulty, word_count)
+    return writing_feedback_cache.get_or_compute(request_cache_key(ai_request),
+                                                 lambda: chat_completion(ai_request).strip())
 
-                    feedback = response.choices[0].message.content.strip()
 
-                    span.set_attribute("feedback.length", len(feedback))
-                    return jsonify({'feedback': feedback}), 200
+async def agenerate_writing_feedback(exercise, exercise_type, user_writing, genres, difficulty, word_count):
+    """Async variant of generate_writing_feedback"""
+    ai_request = build_writing_feedback_request(exercise, exercise_type, user_writing, genres, difficulty, word_count)
+    return (await achat_completion(ai_request)).strip()
 
-                except Exception as ai_error:
-                    logger.error(f"AI feedback generation failed: {str(ai_error)}")
-                    # Fall through to template feedback
 
-            # Template fallback feedback
-            actual_word_count = len(user_writing.split())
-            word_count_feedback = ""
-            if actual_word_count >= word_count:
-                word_count_feedback = f"Great job meeting the {word_count} word target!"
-            else:
-                word_count_feedback = f"You wrote {actual_word_count} words. Consider expanding to reach the {word_count} word goal."
+def writing_feedback_template(exercise_type, user_writing, genres, word_count):
+    """Template feedback for a writing submission when AI is unavailable or fails"""
+    actual_word_count = len(user_writing.split())
+    word_count_feedback = ""
+    if actual_word_count >= word_count:
+        word_count_feedback = f"Great job meeting the {word_count} word target!"
+    else:
+        word_count_feedback = f"You wrote {actual_word_count} words. Consider expanding to reach the {word_count} word goal."
 
-            template_feedback = f"""**Feedback on your {exercise_type}**
+    template_feedback = f"""**Feedback on your {exercise_type}**
 
 **Strengths:**
 • You completed the writing exercise and engaged with the prompt
@@ -2044,43 +5027,83 @@ CRITICAL APPROACH:
 
 Keep writing and developing your craft!"""
 
-            return jsonify({'feedback': template_feedback}), 200
+    return template_feedback
 
-        except Exception as e:
-            span.record_exception(e)
-            span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
-            logger.error(f"Writing feedback generation failed: {str(e)}")
-            return jsonify({'error': 'Failed to generate writing feedback'}), 500
 
-@app.route('/generate-drawing-feedback', methods=['POST'])
-def generate_drawing_feedback_endpoint():
-    """Generate AI feedback for a drawing submission with image analysis"""
-    with tracer.start_as_current_span("generate-drawing-feedback") as span:
+def stream_writing_feedback(exercise, exercise_type, user_writing, genres, difficulty, word_count):
+    """Streaming variant of generate_writing_feedback, falling back to the template"""
+    ai_request = build_writing_feedback_request(exercise, exercise_type, user_writing, genres, difficulty, word_count)
+    return sse_generation(
+        "stream-writing-feedback", ai_request,
+        lambda content: {'feedback': content},
+        lambda: {'feedback': writing_feedback_template(exercise_type, user_writing, genres, word_count)}
+    )
+
+
+
+@app.route('/generate-writing-feedback', methods=['POST'])
+def generate_writing_feedback_endpoint():
+    """Generate AI feedback for a writing exercise submission"""
+    with tracer.start_as_current_span("generate-writing-feedback") as span:
         try:
             data = request.json
-            image_data = data.get('image', '')
             exercise = data.get('exercise', '')
-            skills = data.get('skills', [])
+            exercise_type = data.get('exerciseType', '')
+            user_writing = data.get('userWriting', '')
+            genres = data.get('genres', [])
             difficulty = data.get('difficulty', '')
+            word_count = data.get('wordCount', 0)
 
-            span.set_attribute("skills", str(skills))
+            span.set_attribute("exercise.type", exercise_type)
+            span.set_attribute("genres", str(genres))
             span.set_attribute("difficulty", difficulty)
-            span.set_attribute("has_image", bool(image_data))
+            span.set_attribute("wordCount.target", word_count)
+            span.set_attribute("wordCount.actual", len(user_writing.split()))
 
             # Validate inputs
-            if not image_data or not skills:
+            if not user_writing or not exercise:
                 return jsonify({'error': 'Missing required fields'}), 400
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
+
+            # Generate feedback using AI, token by token when streaming
+            if USE_AI and stream:
+                span.add_event("streaming-ai-feedback")
+                return sse_response(stream_writing_feedback(exercise, exercise_type, user_writing, genres, difficulty, word_count))
 
-            # Generate feedback using OpenAI Vision API
             if USE_AI:
                 try:
-                    span.add_event("generating-ai-vision-feedback")
+                    span.add_event("generating-ai-feedback")
+
+                    feedback = generate_writing_feedback(exercise, exercise_type, user_writing, genres, difficulty, word_count)
+
+                    span.set_attribute("feedback.length", len(feedback))
+                    return jsonify({'feedback': feedback}), 200
+
+                except Exception as ai_error:
+                    logger.error(f"AI feedback generation failed: {str(ai_error)}")
+                    note_fallback(ai_error)
+                    # Fall through to template feedback
+
+            # Template fallback feedback
+            template_feedback = writing_feedback_template(exercise_type, user_writing, genres, word_count)
+            if stream:
+                return sse_response(sse_result({'feedback': template_feedback}))
+            return jsonify({'feedback': template_feedback}), 200
+
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+            logger.error(f"Writing feedback generation failed: {str(e)}")
+            return jsonify({'error': 'Failed to generate writing feedback'}), 500
 
-                    # Image data should be in base64 format
-                    # If it includes data URL prefix, keep it for the API
-                    image_url = image_data if image_data.startswith('data:image') else f"data:image/jpeg;base64,{image_data}"
+def build_drawing_feedback_request(image_data, exercise, skills, difficulty):
+    """Build the OpenAI vision request for feedback on a drawing submission"""
+    # Image data should be in base64 format
+    # If it includes data URL prefix, keep it for the API
+    image_url = image_data if image_data.startswith('data:image') else f"data:image/jpeg;base64,{image_data}"
 
-                    user_prompt = f"""You are an experienced art instructor providing direct, one-on-one feedback on student drawings. Address the artist as "you" throughout.
+    user_prompt = f"""You are an experienced art instructor providing direct, one-on-one feedback on student drawings. Address the artist as "you" throughout.
 
 The artist completed this exercise:
 {exercise}
@@ -2116,47 +5139,52 @@ APPROACH:
 - Use drawing terminology appropriately for their level
 - End with genuine encouragement IF they focus on the feedback"""
 
-                    # Use GPT-4 Vision API (gpt-4o has vision capabilities)
-                    response = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": user_prompt
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_url,
-                                            "detail": "high"
-                                        }
-                                    }
-                                ]
-                            }
-                        ],
-                        max_tokens=800,
-                        temperature=0.7
-                    )
-
-                    feedback = response.choices[0].message.content.strip()
 
-                    span.set_attribute("feedback.length", len(feedback))
-                    span.set_attribute("model", "gpt-4o")
-                    return jsonify({'feedback': feedback}), 200
+    # Use GPT-4 Vision API (gpt-4o has vision capabilities)
+    return {
+        'model': 'gpt-4o',
+        'messages': [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": user_prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url,
+                            "detail": "high"
+                        }
+                    }
+                ]
+            }
+        ],
+        'params': {
+            'max_tokens': 800,
+            'temperature': 0.7
+        }
+    }
 
-                except Exception as ai_error:
-                    logger.error(f"AI vision feedback failed: {str(ai_error)}")
-                    logger.error(f"Error details: {type(ai_error).__name__}: {str(ai_error)}")
-                    logger.warning("Falling back to template feedback for drawing")
-                    # Fall through to template feedback
+def generate_drawing_feedback(image_data, exercise, skills, difficulty):
+    """Get AI vision feedback on a drawing submission (raises if the OpenAI call fails)"""
+    ai_request = build_drawing_feedback_request(image_data, exercise, skills, difficulty)
+    return drawing_feedback_cache.get_or_compute(request_cache_key(ai_request),
+                                                 lambda: chat_completion(ai_request).strip())
 
-            # Template fallback feedback
-            logger.info("Using template feedback for drawing (AI not available or failed)")
-            skill_string = ' and '.join(skills)
-            template_feedback = f"""**Feedback on Your Drawing Exercise**
+
+async def agenerate_drawing_feedback(image_data, exercise, skills, difficulty):
+    """Async variant of generate_drawing_feedback"""
+    ai_request = build_drawing_feedback_request(image_data, exercise, skills, difficulty)
+    return (await achat_completion(ai_request)).strip()
+
+
+def drawing_feedback_template(skills):
+    """Template feedback for a drawing submission when AI is unavailable or fails"""
+    logger.info("Using template feedback for drawing (AI not available or failed)")
+    skill_string = ' and '.join(skills)
+    template_feedback = f"""**Feedback on Your Drawing Exercise**
 
 Thank you for submitting your work! Here's feedback on your {skill_string} practice:
 
@@ -2183,6 +5211,67 @@ Drawing is a skill that develops with consistent, focused practice. Keep working
 
 *Note: For detailed visual analysis and specific feedback on your technique, consider working with an art instructor who can provide personalized guidance.*"""
 
+    return template_feedback
+
+
+def stream_drawing_feedback(image_data, exercise, skills, difficulty):
+    """Streaming variant of generate_drawing_feedback, falling back to the template"""
+    ai_request = build_drawing_feedback_request(image_data, exercise, skills, difficulty)
+    return sse_generation(
+        "stream-drawing-feedback", ai_request,
+        lambda content: {'feedback': content},
+        lambda: {'feedback': drawing_feedback_template(skills)}
+    )
+
+
+
+@app.route('/generate-drawing-feedback', methods=['POST'])
+def generate_drawing_feedback_endpoint():
+    """Generate AI feedback for a drawing submission with image analysis"""
+    with tracer.start_as_current_span("generate-drawing-feedback") as span:
+        try:
+            data = request.json
+            image_data = data.get('image', '')
+            exercise = data.get('exercise', '')
+            skills = data.get('skills', [])
+            difficulty = data.get('difficulty', '')
+
+            span.set_attribute("skills", str(skills))
+            span.set_attribute("difficulty", difficulty)
+            span.set_attribute("has_image", bool(image_data))
+
+            # Validate inputs
+            if not image_data or not skills:
+                return jsonify({'error': 'Missing required fields'}), 400
+            stream = wants_stream(data)
+            span.set_attribute("stream", stream)
+
+            # Generate feedback using OpenAI Vision API, token by token when streaming
+            if USE_AI and stream:
+                span.add_event("streaming-ai-vision-feedback")
+                return sse_response(stream_drawing_feedback(image_data, exercise, skills, difficulty))
+
+            if USE_AI:
+                try:
+                    span.add_event("generating-ai-vision-feedback")
+
+                    feedback = generate_drawing_feedback(image_data, exercise, skills, difficulty)
+
+                    span.set_attribute("feedback.length", len(feedback))
+                    span.set_attribute("model", "gpt-4o")
+                    return jsonify({'feedback': feedback}), 200
+
+                except Exception as ai_error:
+                    logger.error(f"AI vision feedback failed: {str(ai_error)}")
+                    logger.error(f"Error details: {type(ai_error).__name__}: {str(ai_error)}")
+                    logger.warning("Falling back to template feedback for drawing")
+                    note_fallback(ai_error)
+                    # Fall through to template feedback
+
+            # Template fallback feedback
+            template_feedback = drawing_feedback_template(skills)
+            if stream:
+                return sse_response(sse_result({'feedback': template_feedback}))
             return jsonify({'feedback': template_feedback}), 200
 
         except Exception as e:
@@ -2193,4 +5282,6 @@ Drawing is a skill that develops with consistent, focused practice. Keep working
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
+    start_pregen_worker()
+    atexit.register(feedback_buffer.close)
     app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_ENV') == 'development')
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""Measure how many OpenAI calls one process keeps in flight on the async path.
+
+Starts the same fake OpenAI upstream as loadtest.py and awaits N concurrent
+agenerate_prompt_with_ai() calls on a single event loop, then reports the
+wall-clock time next to the ideal (one upstream latency).
+
+Usage:
+    python benchmarks/async_fanout.py --calls 100 300 --upstream-latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadtest import start_fake_openai  # noqa: E402
+
+
+async def fan_out(app_module, calls):
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[app_module.agenerate_prompt_with_ai(['Fantasy', 'Mystery']) for _ in range(calls)],
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for r in results if isinstance(r, Exception))
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--upstream-latency', type=float, default=1.0)
+    args = parser.parse_args()
+
+    upstream = start_fake_openai(args.upstream_latency)
+    os.environ['OPENAI_API_KEY'] = 'sk-loadtest'
+    os.environ['OPENAI_API_BASE'] = f'http://127.0.0.1:{upstream.server_address[1]}/v1'
+
+    import app as app_module
+
+    for calls in args.calls:
+        elapsed, errors = asyncio.run(fan_out(app_module, calls))
+        print(json.dumps({
+            'calls': calls,
+            'errors': errors,
+            'wall_s': round(elapsed, 2),
+            'ideal_s': args.upstream_latency,
+            'calls_per_s': round(calls / elapsed, 1),
+        }))
+
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
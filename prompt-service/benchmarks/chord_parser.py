@@ -0,0 +1,163 @@
+"""Chord progression parsing throughput: the chord grammar against the old parser.
+
+Builds a large batch of LLM-style progression lines (dash, arrow and pipe
+separators, extensions, alterations, slash chords, Unicode accidentals,
+"Am add9"-style spacing and trailing roman-numeral analysis) and reports
+progressions per second for both parsers, plus how many chords each one
+could only play as the default major triad.
+
+Usage:
+    python benchmarks/chord_parser.py --progressions 20000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+ROOTS = ['C', 'C#', 'Db', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B', 'B♭', 'F♯']
+QUALITIES = ['', '', 'm', 'm', '7', 'maj7', 'm7', 'm9', 'maj9', 'add9', ' add9', 'm add9', 'sus2', 'sus4',
+             '7sus4', 'dim', 'dim7', 'm7b5', 'ø7', '7b9', '7#9', 'maj7#11', '13', '6', 'm6', '6/9', 'aug', '5']
+SEPARATORS = [' - ', ' → ', ' | ', ' – ']
+
+
+def load_app():
+    import fakeredis
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()):
+        import app
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+# The parser this benchmark compares against, as it was before the chord grammar
+def legacy_chord_name_to_midi_notes(chord_name, root_note=60):
+    """
+    Convert a chord name like 'Cmaj7' or 'Am add9' to MIDI note numbers.
+    Returns a list of MIDI note numbers.
+    """
+    # Basic chord note mappings (intervals from root)
+    chord_patterns = {
+        'major': [0, 4, 7],
+        'minor': [0, 3, 7],
+        'maj7': [0, 4, 7, 11],
+        'minor7': [0, 3, 7, 10],
+        'm7': [0, 3, 7, 10],
+        'add9': [0, 4, 7, 14],  # root, major 3rd, 5th, 9th (octave + 2)
+        'sus2': [0, 2, 7],
+        'sus4': [0, 5, 7],
+        'dim': [0, 3, 6],
+        'dim7': [0, 3, 6, 9],
+        'maj9': [0, 4, 7, 11, 14],
+        'minor9': [0, 3, 7, 10, 14],
+        'm9': [0, 3, 7, 10, 14],
+        'add11': [0, 4, 7, 17],
+        '6': [0, 4, 7, 9],
+        'minor6': [0, 3, 7, 9],
+        'm6': [0, 3, 7, 9],
+        'power': [0, 7],  # power chord (root and 5th)
+    }
+
+    # Default to major triad if pattern not found
+    return [root_note + interval for interval in chord_patterns.get(chord_name.lower(), [0, 4, 7])]
+
+def legacy_parse_chord_progression(progression_text):
+    """
+    Parse AI-generated chord progression text into a list of chord dictionaries.
+    Expected format: "Cmaj7 - Am - Fmaj7 - G"
+    Returns: [{'name': 'Cmaj7', 'root': 60, 'notes': [60, 64, 67, 71]}, ...]
+    """
+    # Note name to MIDI number mapping (C4 = 60)
+    note_map = {
+        'C': 60, 'C#': 61, 'Db': 61, 'D': 62, 'D#': 63, 'Eb': 63,
+        'E': 64, 'F': 65, 'F#': 66, 'Gb': 66, 'G': 67, 'G#': 68,
+        'Ab': 68, 'A': 69, 'A#': 70, 'Bb': 70, 'B': 71
+    }
+
+    chords = []
+    # Split by common delimiters
+    chord_names = [c.strip() for c in progression_text.replace('→', '-').split('-')]
+
+    for chord_name in chord_names:
+        if not chord_name:
+            continue
+
+        # Extract root note
+        root_name = chord_name[0].upper()
+        if len(chord_name) > 1 and chord_name[1] in ['#', 'b', '♭', '♯']:
+            root_name += 'b' if chord_name[1] in ['b', '♭'] else '#'
+            quality = chord_name[2:].strip()
+        else:
+            quality = chord_name[1:].strip()
+
+        root_midi = note_map.get(root_name, 60)
+        notes = legacy_chord_name_to_midi_notes(quality if quality else 'major', root_midi)
+
+        chords.append({
+            'name': chord_name,
+            'root': root_midi,
+            'notes': notes
+        })
+
+    return chords
+
+
+def progression_lines(count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        chords = []
+        for _ in range(rng.randint(3, 8)):
+            chord = rng.choice(ROOTS) + rng.choice(QUALITIES)
+            if rng.random() < 0.1:
+                chord += '/' + rng.choice(ROOTS)
+            chords.append(chord)
+        line = rng.choice(SEPARATORS).join(chords)
+        if rng.random() < 0.2:
+            line += ' (i - VI - III - VII)'
+        lines.append(line)
+    return lines
+
+
+def major_fallbacks(parse, lines, default_intervals=(0, 4, 7)):
+    """Chords played as a plain major triad although their symbol says otherwise"""
+    count = 0
+    for line in lines:
+        for chord in parse(line):
+            name = chord['name'].split('/')[0]
+            plain = name[1:].lstrip('#b♯♭').strip() == ''
+            if not plain and tuple(n - chord['root'] for n in chord['notes']) == default_intervals:
+                count += 1
+    return count
+
+
+def progressions_per_second(parse, lines):
+    start = time.perf_counter()
+    for line in lines:
+        parse(line)
+    return round(len(lines) / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--progressions', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = load_app()
+    lines = progression_lines(args.progressions)
+    print(json.dumps({
+        'progressions': len(lines),
+        'legacy_per_s': progressions_per_second(legacy_parse_chord_progression, lines),
+        'grammar_per_s': progressions_per_second(app.parse_chord_progression, lines),
+        'legacy_major_fallbacks': major_fallbacks(legacy_parse_chord_progression, lines),
+        'grammar_major_fallbacks': major_fallbacks(app.parse_chord_progression, lines),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Throughput of export_feedback.py against a seeded local Redis.
+
+Seeds an empty Redis database with --ratings ratings through
+record_feedback() (--raters-per-prompt per prompt, like
+feedback_memory.py), then exports them once per --batch size to a
+gzip-compressed CSV in a temporary directory and reports ratings/s and
+file size. Then, at the largest batch size, it exports once per output
+format to compare size and throughput:
+
+    csv      plain CSV
+    csv.gz   gzip CSV (what export_feedback.py writes for a .gz path)
+    parquet  export_feedback.py's Parquet output (needs pyarrow, which the
+             service doesn't depend on; skipped without it)
+
+The database must be empty and is flushed afterwards.
+
+Usage:
+    python benchmarks/feedback_export.py --ratings 1000000
+    python benchmarks/feedback_export.py --batch 100 1000 5000 --redis-url redis://localhost:6379/15
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+
+def seed(app, client, ratings, raters_per_prompt, batch=10000):
+    rng = random.Random(42)
+    pipe = client.pipeline(transaction=False)
+    for n in range(ratings):
+        prompt = n // raters_per_prompt
+        # Every (prompt, user) is new, so there is no previous record to read first
+        app.record_feedback(f'{prompt:016x}', f'user-{n % raters_per_prompt:03d}', rng.randint(1, 5),
+                            {'artist': app.ALL_ARTISTS[prompt % len(app.ALL_ARTISTS)]}, client=pipe, previous=b'')
+        if (n + 1) % batch == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+def export_to(export_feedback, app, client, path, batch):
+    """Export every rating to path with export_feedback.py's writer for it; returns the number of rows"""
+    with export_feedback.open_writer(path) as writer:
+        return export_feedback.export_ratings(client, writer, app.feedback_ratings_key(''), batch_size=batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--raters-per-prompt', type=int, default=20)
+    parser.add_argument('--batch', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    args = parser.parse_args()
+
+    os.environ['REDIS_URL'] = args.redis_url
+    os.environ.pop('OPENAI_API_KEY', None)
+    import app
+    import export_feedback
+    logging.disable(logging.CRITICAL)
+
+    client = app.redis_client
+    if client.dbsize():
+        sys.exit(f'{args.redis_url} is not empty; point --redis-url at an unused database')
+
+    started = time.perf_counter()
+    seed(app, client, args.ratings, args.raters_per_prompt)
+    print(json.dumps({'seeded': args.ratings, 'keys': client.dbsize(),
+                      'seed_seconds': round(time.perf_counter() - started, 1)}))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for batch in args.batch:
+                path = os.path.join(tmp, f'ratings-{batch}.csv.gz')
+                started = time.perf_counter()
+                rows = export_to(export_feedback, app, client, path, batch)
+                elapsed = time.perf_counter() - started
+                print(json.dumps({'batch': batch, 'rows': rows, 'seconds': round(elapsed, 2),
+                                  'ratings_per_second': round(rows / elapsed),
+                                  'file_mb': round(os.path.getsize(path) / 2 ** 20, 2)}))
+
+            for fmt in ('csv', 'csv.gz', 'parquet'):
+                if fmt == 'parquet':
+                    try:
+                        import pyarrow.parquet  # noqa: F401
+                    except ImportError:
+                        print(json.dumps({'format': fmt, 'skipped': 'pyarrow is not installed'}))
+                        continue
+                path = os.path.join(tmp, f'ratings.{fmt}')
+                started = time.perf_counter()
+                rows = export_to(export_feedback, app, client, path, max(args.batch))
+                elapsed = time.perf_counter() - started
+                print(json.dumps({'format': fmt, 'rows': rows, 'seconds': round(elapsed, 2),
+                                  'ratings_per_second': round(rows / elapsed),
+                                  'file_mb': round(os.path.getsize(path) / 2 ** 20, 2)}))
+    finally:
+        client.flushdb()
+
+
+if __name__ == '__main__':
+    main()
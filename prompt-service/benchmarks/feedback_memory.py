@@ -0,0 +1,117 @@
+"""Redis memory used by stored ratings, before and after the hash layout.
+
+Writes the same synthetic ratings into an empty Redis database twice and
+reports, for each layout, INFO used_memory growth and the sum of MEMORY
+USAGE over every key written:
+
+    strings  one feedback:{promptId}:{userId} JSON string key per rating
+             with its own TTL (the layout before totals hashes)
+    hashes   record_feedback(): one ratings hash per prompt plus the
+             promptId/artist/exerciseType totals hashes
+
+Each prompt gets --raters-per-prompt ratings from distinct users, with an
+artist drawn from the sound design catalog. The database must be empty; it
+is flushed between and after layouts.
+
+Usage:
+    python benchmarks/feedback_memory.py --ratings 1000000
+    python benchmarks/feedback_memory.py --redis-url redis://localhost:6379/15 --raters-per-prompt 50
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+
+def synthetic_ratings(count, raters_per_prompt, artists):
+    rng = random.Random(42)
+    for n in range(count):
+        prompt = n // raters_per_prompt
+        yield (f'{prompt:016x}', f'user-{rng.randrange(10 ** 7):07d}', rng.randint(1, 5),
+               {'artist': artists[prompt % len(artists)], 'exerciseType': 'technical'})
+
+
+def write_strings(pipe, prompt_id, user_id, rating, dimensions, ttl):
+    pipe.setex(f'feedback:{prompt_id}:{user_id}', ttl,
+               json.dumps({'rating': rating, 'timestamp': datetime.utcnow().isoformat()}))
+
+
+def memory_usage(client, batch):
+    """Sum of MEMORY USAGE (all nested values sampled) over the database's keys"""
+    total = 0
+    keys = client.scan_iter(count=batch)
+    while True:
+        pipe = client.pipeline(transaction=False)
+        for _, key in zip(range(batch), keys):
+            pipe.memory_usage(key, samples=0)
+        sizes = pipe.execute()
+        if not sizes:
+            return total
+        total += sum(size or 0 for size in sizes)
+
+
+def measure(client, write, ratings, batch):
+    client.flushdb()
+    before = client.info('memory')['used_memory']
+    started = time.perf_counter()
+    pipe = client.pipeline(transaction=False)
+    for n, rating in enumerate(ratings, 1):
+        write(pipe, *rating)
+        if n % batch == 0:
+            pipe.execute()
+    pipe.execute()
+    elapsed = time.perf_counter() - started
+    used = client.info('memory')['used_memory'] - before
+    keys = client.dbsize()
+    usage = memory_usage(client, batch)
+    client.flushdb()
+    return used, usage, keys, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--raters-per-prompt', type=int, default=20)
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    parser.add_argument('--batch', type=int, default=10000, help='ratings per pipeline round trip')
+    args = parser.parse_args()
+
+    os.environ['REDIS_URL'] = args.redis_url
+    os.environ.pop('OPENAI_API_KEY', None)
+    import app
+    logging.disable(logging.CRITICAL)
+
+    client = app.redis_client
+    if client.dbsize():
+        sys.exit(f'{args.redis_url} is not empty; point --redis-url at an unused database')
+
+    layouts = {
+        'strings': lambda pipe, *rating: write_strings(pipe, *rating, app.FEEDBACK_TTL),
+        # Seeding an empty database: no previous records to read first
+        'hashes': lambda pipe, prompt_id, user_id, rating, dimensions: app.record_feedback(
+            prompt_id, user_id, rating, dimensions, client=pipe, previous=b''),
+    }
+    results = {}
+    for layout, write in layouts.items():
+        ratings = synthetic_ratings(args.ratings, args.raters_per_prompt, app.ALL_ARTISTS)
+        used, usage, keys, elapsed = measure(client, write, ratings, args.batch)
+        results[layout] = used, usage
+        print(json.dumps({'layout': layout, 'ratings': args.ratings, 'keys': keys,
+                          'used_memory_mb': round(used / 2 ** 20, 1),
+                          'memory_usage_mb': round(usage / 2 ** 20, 1),
+                          'bytes_per_rating': round(used / args.ratings, 1),
+                          'write_seconds': round(elapsed, 1)}))
+    (strings_used, strings_usage), (hashes_used, hashes_usage) = results['strings'], results['hashes']
+    print(json.dumps({'used_memory_saved_pct': round(100 * (1 - hashes_used / strings_used), 1),
+                      'memory_usage_saved_pct': round(100 * (1 - hashes_usage / strings_usage), 1)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Load test comparing the Flask dev server with the gunicorn serving mode.
+
+Starts a fake OpenAI upstream that answers chat completions after a fixed
+delay, boots the prompt service against it (OPENAI_API_BASE) in the
+requested mode, and fires waves of concurrent POST /generate requests.
+
+Usage:
+    python benchmarks/loadtest.py --mode dev
+    python benchmarks/loadtest.py --mode gunicorn
+    python benchmarks/loadtest.py --mode both --concurrency 1 16 64 256
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+FAKE_COMPLETION = """**Exercise Name**: Layered Omens
+**Goal**: Practice generating ideas from a single image.
+**Exercise**: Write ten one-line premises that grow from the same object.
+
+**Writing Tips for This Exercise**:
+- Push past the first three obvious ideas before judging any of them
+- Let each premise borrow one detail from the previous one
+- Read the list aloud and circle the line that surprises you"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai(latency):
+    """Serve /v1/chat/completions, sleeping `latency` seconds per call."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            body = json.dumps({
+                'id': 'chatcmpl-loadtest',
+                'object': 'chat.completion',
+                'model': 'gpt-3.5-turbo',
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': FAKE_COMPLETION},
+                    'finish_reason': 'stop'
+                }]
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        # The default backlog of 5 drops SYNs once hundreds of clients connect
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_service(mode, port, upstream_port, workers, threads):
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'OPENAI_API_KEY': 'sk-loadtest',
+        'OPENAI_API_BASE': f'http://127.0.0.1:{upstream_port}/v1',
+        'FLASK_ENV': 'production',
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'GUNICORN_ACCESS_LOG': '',
+    })
+    if mode == 'dev':
+        cmd = [sys.executable, 'app.py']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+
+    proc = subprocess.Popen(cmd, cwd=SERVICE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1)
+            return proc
+        except urllib.error.HTTPError:
+            # 503 from /health just means Redis is down; the server is up
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'{mode} server did not start on port {port}')
+
+
+def post_generate(port):
+    payload = json.dumps({'genres': ['Fantasy', 'Mystery'], 'userId': 'loadtest'}).encode('utf-8')
+    req = urllib.request.Request(f'http://127.0.0.1:{port}/generate', data=payload,
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except OSError:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_wave(port, concurrency, requests_per_client):
+    total = concurrency * requests_per_client
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: post_generate(port), range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for ok, latency in results if ok)
+    errors = sum(1 for ok, _ in results if not ok)
+    if not latencies:
+        return {'concurrency': concurrency, 'requests': total, 'errors': errors}
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['dev', 'gunicorn', 'both'], default='both')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64, 256])
+    parser.add_argument('--requests-per-client', type=int, default=4)
+    parser.add_argument('--upstream-latency', type=float, default=1.0,
+                        help='Seconds the fake OpenAI upstream takes per completion')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=64)
+    args = parser.parse_args()
+
+    upstream = start_fake_openai(args.upstream_latency)
+    modes = ['dev', 'gunicorn'] if args.mode == 'both' else [args.mode]
+
+    for mode in modes:
+        port = free_port()
+        proc = start_service(mode, port, upstream.server_address[1], args.workers, args.threads)
+        try:
+            label = mode if mode == 'dev' else f'gunicorn ({args.workers} workers x {args.threads} threads)'
+            print(f'== {label}, upstream latency {args.upstream_latency}s')
+            for concurrency in args.concurrency:
+                print(json.dumps(run_wave(port, concurrency, args.requests_per_client)))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
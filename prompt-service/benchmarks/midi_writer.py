@@ -0,0 +1,89 @@
+"""Files per second of create_midi_file against the midiutil reference writer.
+
+Renders every template chord progression plus a spread of AI-style
+progressions (4-8 chords, extended qualities) and checks that the native
+writer's bytes match midiutil's before timing both.
+
+Usage:
+    python benchmarks/midi_writer.py --seconds 2
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+QUALITIES = ['', 'm', '7', 'maj7', 'm7', 'add9', 'sus2', 'sus4', 'dim', '9', 'm9', '6']
+ROOTS = ['C', 'C#', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B']
+
+
+def load_app():
+    import fakeredis
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()):
+        import app
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def midiutil_file(chord_progression, tempo=80, duration_per_chord=4.0):
+    """The midiutil-based writer create_midi_file replaced"""
+    from midiutil import MIDIFile
+    midi = MIDIFile(1)
+    time_ = 0
+    midi.addTrackName(0, time_, "Chord Progression")
+    midi.addTempo(0, time_, tempo)
+    for chord in chord_progression:
+        for note in chord['notes']:
+            midi.addNote(0, 0, note, time_, duration_per_chord, 100)
+        time_ += duration_per_chord
+    buffer = io.BytesIO()
+    midi.writeFile(buffer)
+    return buffer.getvalue()
+
+
+def progressions(app, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for emotion in app.EMOTIONS:
+        texts.append(app.chord_progression_from_template([emotion['emotion']], [emotion])['progression'])
+    for _ in range(100):
+        texts.append(' - '.join(rng.choice(ROOTS) + rng.choice(QUALITIES) for _ in range(rng.randint(4, 8))))
+    return [app.parse_chord_progression(text) for text in texts]
+
+
+def files_per_second(writer, chord_lists, seconds):
+    rendered = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for chords in chord_lists:
+            writer(chords)
+        rendered += len(chord_lists)
+    return round(rendered / (time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    app = load_app()
+    chord_lists = progressions(app)
+    mismatches = sum(1 for chords in chord_lists if app.create_midi_file(chords) != midiutil_file(chords))
+    print(json.dumps({
+        'progressions': len(chord_lists),
+        'mismatches': mismatches,
+        'native_files_per_s': files_per_second(app.create_midi_file, chord_lists, args.seconds),
+        'midiutil_files_per_s': files_per_second(midiutil_file, chord_lists, args.seconds),
+    }))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Per-sample latency and allocations of sanitize_ai_content on the golden corpus.
+
+Runs every sample in tests/fixtures/sanitizer_corpus.json (clean, garbled,
+HTML-injected, block-character and word-salad completions), checks the
+output against the recorded expectation, and reports for each sample the
+median wall time per call and the bytes allocated (tracemalloc peak). A
+per-category summary is printed at the end.
+
+When a behavior change to the sanitizer is intentional, rewrite the
+expected outputs with --update-expected and review the fixture diff.
+
+Usage:
+    python benchmarks/sanitizer_corpus.py --iterations 200
+    python benchmarks/sanitizer_corpus.py --summary-only
+    python benchmarks/sanitizer_corpus.py --update-expected
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+CORPUS_PATH = os.path.join(SERVICE_DIR, 'tests', 'fixtures', 'sanitizer_corpus.json')
+
+
+def load_app():
+    import fakeredis
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()):
+        import app
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_corpus(samples, path=CORPUS_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(samples, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def measure(sanitize, text, iterations):
+    sanitize(text)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        sanitize(text)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    sanitize(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'median_us': round(statistics.median(timings) * 1e6, 2),
+        'p95_us': round(sorted(timings)[int(len(timings) * 0.95) - 1] * 1e6, 2),
+        'peak_alloc_bytes': peak - base,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--summary-only', action='store_true')
+    parser.add_argument('--update-expected', action='store_true',
+                        help='Rewrite expected outputs from the current sanitizer and exit')
+    args = parser.parse_args()
+
+    app = load_app()
+    samples = load_corpus(args.corpus)
+
+    if args.update_expected:
+        changed = 0
+        for sample in samples:
+            output = app.sanitize_ai_content(sample['input'])
+            if output != sample['expected']:
+                changed += 1
+                sample['expected'] = output
+        write_corpus(samples, args.corpus)
+        print(json.dumps({'samples': len(samples), 'updated': changed}))
+        return
+
+    by_category = {}
+    mismatches = 0
+    for sample in samples:
+        result = measure(app.sanitize_ai_content, sample['input'], args.iterations)
+        matches = app.sanitize_ai_content(sample['input']) == sample['expected']
+        mismatches += not matches
+        by_category.setdefault(sample['category'], []).append(result)
+        if not args.summary_only:
+            print(json.dumps({
+                'id': sample['id'],
+                'category': sample['category'],
+                'bytes': len(sample['input'].encode('utf-8')),
+                'matches_expected': matches,
+                **result,
+            }))
+
+    for category, results in by_category.items():
+        print(json.dumps({
+            'category': category,
+            'samples': len(results),
+            'median_us': round(statistics.median(r['median_us'] for r in results), 2),
+            'max_us': max(r['median_us'] for r in results),
+            'median_alloc_bytes': int(statistics.median(r['peak_alloc_bytes'] for r in results)),
+            'max_alloc_bytes': max(r['peak_alloc_bytes'] for r in results),
+        }))
+    print(json.dumps({'samples': len(samples), 'mismatches': mismatches}))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
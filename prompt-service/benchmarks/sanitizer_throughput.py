@@ -0,0 +1,122 @@
+"""Throughput of sanitize_ai_content on clean and corrupted LLM output.
+
+The corpus is built from the service's own exercise texts (sound design
+templates, rendered drawing exercises, and completion-shaped writing and
+sound design answers). Each clean document also gets corrupted copies:
+control characters, escaped-byte noise, HTML/JS fragments, block
+characters, and capitalized word salad. Results are reported in MB/s of
+UTF-8 input.
+
+Usage:
+    python benchmarks/sanitizer_throughput.py --repeat 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+COMPLETION_SHAPES = [
+    """**Exercise Name**: {title}
+**Goal**: Practice {focus} while keeping the scene grounded.
+**Exercise**: {body}
+
+**Writing Tips for This Exercise**:
+- Push past the first three obvious ideas before judging any of them
+- Let each draft borrow one concrete detail from the previous one
+- Read the result aloud and mark the line that surprises you""",
+    """Title: {title}
+
+{body}
+
+**Step 1**: Initialize the patch and set the oscillator to a saw wave.
+**Step 2**: Route an LFO to the filter cutoff at a slow rate for {focus}.
+**Step 3**: Resample the result and slice it into a playable rack.
+
+**Tips**:
+- Reference tracks can help guide your sound design decisions
+- A/B test your patch in a mix context, not just solo
+- Document your process so you notice patterns in your workflow""",
+]
+
+CORRUPTIONS = [
+    lambda rng, line: line + ' \\\\x4f\\\\x2a\\\\x7e' * rng.randint(1, 4),
+    lambda rng, line: '<div id="x" innerHTML="' + line[:20] + '"></div><script>getElementById()</script>',
+    lambda rng, line: '█▓▒░' * rng.randint(3, 10) + line,
+    lambda rng, line: ''.join(ch + ('\x00' if rng.random() < 0.1 else '') for ch in line),
+    lambda rng, line: '{@' + line + ' $(".entrySet(") @@ µ°†Δφε☐',
+    lambda rng, line: 'The ' + ' '.join(rng.choice(['Quantum', 'Velvet', 'Harbor', 'Signal', 'Copper', 'Lantern', 'Echo', 'Meridian'])
+                                         for _ in range(rng.randint(9, 14))) + ' and more words follow here',
+    lambda rng, line: line + ' !!!@@@###$$$%%%^^^&&&***' + '​ \xa0' * 5,
+]
+
+
+def load_app():
+    import fakeredis
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()):
+        import app
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def build_corpus(app, seed=0):
+    """Return (clean_documents, corrupted_documents)"""
+    rng = random.Random(seed)
+    bodies = []
+    for catalog in (app.SOUND_DESIGN_TECHNICAL_TEMPLATES, app.SOUND_DESIGN_CREATIVE_TEMPLATES):
+        for templates in catalog.values():
+            bodies.extend(templates)
+    for skills in (['Gesture'], ['Composition', 'Light & Shadow'], ['Observation', 'Proportion & Scale']):
+        bodies.append(app.drawing_exercise_from_template(skills, app.DRAWING_CATALOG)['content'])
+
+    clean = []
+    for i, body in enumerate(bodies):
+        clean.append(COMPLETION_SHAPES[i % len(COMPLETION_SHAPES)].format(
+            title=f'Exercise {i}', focus=rng.choice(['pacing', 'contrast', 'tension', 'movement']), body=body))
+
+    corrupted = []
+    for doc in clean:
+        lines = doc.split('\n')
+        for corruption in CORRUPTIONS:
+            damaged = list(lines)
+            for index in rng.sample(range(len(damaged)), max(1, len(damaged) // 3)):
+                damaged[index] = corruption(rng, damaged[index])
+            corrupted.append('\n'.join(damaged))
+    return clean, corrupted
+
+
+def throughput(sanitize, documents, repeat):
+    size_mb = sum(len(doc.encode('utf-8')) for doc in documents) / 1e6
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for doc in documents:
+            sanitize(doc)
+    elapsed = time.perf_counter() - start
+    return round(size_mb * repeat / elapsed, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = load_app()
+    clean, corrupted = build_corpus(app)
+    rejected = sum(1 for doc in corrupted if app.sanitize_ai_content(doc) is None)
+    print(json.dumps({
+        'clean_docs': len(clean),
+        'corrupted_docs': len(corrupted),
+        'corrupted_rejected': rejected,
+        'clean_mb_per_s': throughput(app.sanitize_ai_content, clean, args.repeat),
+        'corrupted_mb_per_s': throughput(app.sanitize_ai_content, corrupted, args.repeat),
+    }))
+
+
+if __name__ == '__main__':
+    main()
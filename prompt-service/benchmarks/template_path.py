@@ -0,0 +1,74 @@
+"""Microbenchmark for the template (no OpenAI) generation path.
+
+Times generate_sound_design_prompt, generate_drawing_exercise and
+generate_writing_tips with USE_AI off and reports, per call, the mean CPU
+time and the bytes allocated (tracemalloc peak). Redis is replaced with
+fakeredis so only in-process work is measured.
+
+Usage:
+    python benchmarks/template_path.py --iterations 20000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+
+def load_app():
+    import fakeredis
+    os.environ.pop('OPENAI_API_KEY', None)
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()):
+        import app
+    logging.disable(logging.CRITICAL)
+    return app
+
+
+def cases(app):
+    return {
+        'sound_design_technical': lambda: app.generate_sound_design_prompt('Vital', 'technical', 'dnb'),
+        'sound_design_creative': lambda: app.generate_sound_design_prompt('Serum 2', 'creative'),
+        'drawing_exercise': lambda: app.generate_drawing_exercise(['Gesture', 'Composition']),
+        'writing_tips': lambda: app.generate_writing_tips(['Fantasy', 'Mystery']),
+    }
+
+
+def measure(fn, iterations):
+    random.seed(0)
+    for _ in range(min(iterations, 1000)):
+        fn()
+
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'cpu_us_per_call': round(cpu_us, 2), 'peak_alloc_bytes_per_call': peak - base}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = load_app()
+    for name, fn in cases(app).items():
+        print(json.dumps({'case': name, **measure(fn, args.iterations)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Per-request cost of tracing under each sampling setup.
+
+Each mode runs in its own process (tracing is configured at import) and
+sends POST /generate-sound-design through the Flask test client on the
+template path, so only in-process work is measured. The OTLP exporter is
+stubbed to accept spans without sending them, so export cost is the
+BatchSpanProcessor queueing plus span encoding up to the exporter call.
+
+Modes:
+    disabled         no collector configured (no-op tracer, no instrumentation)
+    before           always_on, no attribute limits, no error/slow retention
+                     (the setup before sampling was configurable)
+    ratio            the defaults: parentbased_traceidratio at 10%, unsampled
+                     spans not recorded
+    ratio_keep       10% plus TRACE_KEEP_ERRORS and TRACE_SLOW_SECONDS=2, so
+                     unsampled spans are recorded and held until the
+                     request's local trace ends
+
+Usage:
+    python benchmarks/tracing_overhead.py --requests 5000
+    python benchmarks/tracing_overhead.py --modes disabled before
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, SERVICE_DIR)
+
+COLLECTOR = {'OTEL_EXPORTER_OTLP_ENDPOINT': 'http://127.0.0.1:4318'}
+MODES = {
+    'disabled': {},
+    'before': {**COLLECTOR, 'OTEL_TRACES_SAMPLER': 'always_on', 'TRACE_KEEP_ERRORS': 'false',
+               'TRACE_SLOW_SECONDS': '0', 'OTEL_SPAN_ATTRIBUTE_COUNT_LIMIT': '128',
+               'OTEL_SPAN_ATTRIBUTE_VALUE_LENGTH_LIMIT': '65536'},
+    'ratio': {**COLLECTOR, 'OTEL_TRACES_SAMPLER_ARG': '0.1'},
+    'ratio_keep': {**COLLECTOR, 'OTEL_TRACES_SAMPLER_ARG': '0.1', 'TRACE_KEEP_ERRORS': 'true',
+                   'TRACE_SLOW_SECONDS': '2'},
+}
+REQUEST = {'synthesizer': 'Vital', 'exerciseType': 'technical', 'genre': 'dnb'}
+
+
+def run_mode(requests):
+    """Child process: time `requests` requests against this process's tracing setup"""
+    import fakeredis
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.trace.export import SpanExportResult
+
+    exported = []
+    os.environ.pop('OPENAI_API_KEY', None)
+    with mock.patch('redis.from_url', lambda *args, **kwargs: fakeredis.FakeRedis()), \
+         mock.patch.object(OTLPSpanExporter, 'export', lambda self, spans: exported.extend(spans) or SpanExportResult.SUCCESS):
+        import app
+        logging.disable(logging.CRITICAL)
+        client = app.app.test_client()
+
+        def flush():
+            if app.TRACING_ENABLED:
+                app.trace.get_tracer_provider().force_flush()
+
+        for _ in range(min(requests, 500)):
+            client.post('/generate-sound-design', json=REQUEST)
+        flush()
+        exported.clear()
+
+        start = time.process_time()
+        for _ in range(requests):
+            client.post('/generate-sound-design', json=REQUEST)
+        cpu_us = (time.process_time() - start) / requests * 1e6
+        flush()
+
+    return {'cpu_us_per_request': round(cpu_us, 1), 'spans_exported_per_request': round(len(exported) / requests, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.requests)))
+        return
+
+    baseline = None
+    for mode in args.modes:
+        env = {key: value for key, value in os.environ.items()
+               if not key.startswith(('OTEL_', 'TRACE_'))}
+        env.update(MODES[mode])
+        output = subprocess.run([sys.executable, __file__, '--child', '--requests', str(args.requests)],
+                                env=env, cwd=SERVICE_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if mode == 'disabled':
+            baseline = result['cpu_us_per_request']
+        if baseline is not None and mode != 'disabled':
+            result['tracing_overhead_us'] = round(result['cpu_us_per_request'] - baseline, 1)
+        print(json.dumps({'mode': mode, **result}))
+
+
+if __name__ == '__main__':
+    main()
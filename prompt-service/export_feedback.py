@@ -0,0 +1,174 @@
+"""Export every stored prompt rating from Redis to CSV, gzip CSV or Parquet.
+
+Walks the keyspace with SCAN (never KEYS), fetches each batch of keys with
+one pipelined round trip and writes rows as they arrive, so memory stays
+bounded by --batch however many ratings there are. Reads the per-prompt
+ratings hashes written by POST /feedback and, unless --no-legacy, the
+feedback:{promptId}:{userId} string keys stored before them that haven't
+expired yet. Totals hashes are aggregates and are not exported.
+
+Columns: prompt_id, user_id, rating, rated_at (ISO 8601, UTC). A path
+ending in .gz is gzip-compressed CSV; one ending in .parquet is written
+as Parquet (snappy, in row groups of 100,000) if pyarrow is installed.
+Parquet came out about 3.4x smaller than gzip CSV and faster to write in
+benchmarks/feedback_export.py, but the service doesn't depend on pyarrow.
+SCAN may return a key twice if Redis resizes its keyspace during the
+export, so deduplicate on (prompt_id, user_id) downstream if that matters.
+
+Usage:
+    python export_feedback.py ratings.csv.gz
+    python export_feedback.py ratings.parquet
+    python export_feedback.py - --redis-url redis://localhost:6379/0 --batch 2000
+"""
+import argparse
+import csv
+import gzip
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from redis_store import FEEDBACK_RATINGS_PREFIX, REDIS_URL, connect
+
+COLUMNS = ('prompt_id', 'user_id', 'rating', 'rated_at')
+LEGACY_PATTERN = 'feedback:*'
+
+
+def _batches(keys, size):
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _rated_at(unix_time):
+    return datetime.fromtimestamp(int(unix_time), timezone.utc).isoformat()
+
+
+def _hash_rows(ratings_prefix, key, ratings):
+    prompt_id = key.decode()[len(ratings_prefix):]
+    for user_id, record in ratings.items():
+        # "rating:unix time", then the dimension lines it was counted under
+        rating, unix_time = record.decode().split('\n', 1)[0].split(':', 1)
+        yield prompt_id, user_id.decode(), int(rating), _rated_at(unix_time)
+
+
+def _legacy_rows(key, value):
+    # feedback:{promptId}:{userId}; prompt ids may contain ':' but user ids are last
+    prompt_id, user_id = key.decode()[len('feedback:'):].rsplit(':', 1)
+    record = json.loads(value)
+    yield prompt_id, user_id, record.get('rating'), record.get('timestamp')
+
+
+def _scan_and_fetch(client, pattern, key_type, batch_size):
+    """Yield (key, value) for every key_type key matching pattern, one pipelined fetch per batch"""
+    keys = client.scan_iter(match=pattern, count=batch_size, _type=key_type)
+    for batch in _batches(keys, batch_size):
+        pipe = client.pipeline(transaction=False)
+        for key in batch:
+            if key_type == 'hash':
+                pipe.hgetall(key)
+            else:
+                pipe.get(key)
+        for key, value in zip(batch, pipe.execute()):
+            if value:  # empty when the key expired between SCAN and the fetch
+                yield key, value
+
+
+def export_ratings(client, writer, ratings_prefix, batch_size=1000, legacy=True):
+    """Write a row per stored rating to a csv writer; returns the number of rows"""
+    rows = 0
+    for key, ratings in _scan_and_fetch(client, f'{ratings_prefix}*', 'hash', batch_size):
+        for row in _hash_rows(ratings_prefix, key, ratings):
+            writer.writerow(row)
+            rows += 1
+    if legacy:
+        # Ratings and totals are hashes, so the only feedback:* strings are legacy ratings
+        for key, value in _scan_and_fetch(client, LEGACY_PATTERN, 'string', batch_size):
+            for row in _legacy_rows(key, value):
+                writer.writerow(row)
+                rows += 1
+    return rows
+
+
+class ParquetRows:
+    """csv.writer stand-in that writes rows to a Parquet file in row groups"""
+
+    def __init__(self, path, row_group=100000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit('Writing .parquet needs pyarrow: pip install pyarrow') from None
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([('prompt_id', pyarrow.string()), ('user_id', pyarrow.string()),
+                                       ('rating', pyarrow.int8()), ('rated_at', pyarrow.string())])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression='snappy')
+        self._row_group = row_group
+        self._rows = []
+
+    def writerow(self, row):
+        self._rows.append(row)
+        if len(self._rows) == self._row_group:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = [self._pa.array(column, type=field.type)
+                       for column, field in zip(zip(*self._rows), self._schema)]
+            self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='', encoding='utf-8')
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+@contextmanager
+def open_writer(path):
+    """Row writer for path: Parquet for .parquet, else CSV starting with a header row"""
+    if path.endswith('.parquet'):
+        writer = ParquetRows(path)
+        try:
+            yield writer
+        finally:
+            writer.close()
+        return
+    with open_output(path) as out:
+        writer = csv.writer(out)
+        writer.writerow(COLUMNS)
+        yield writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help="CSV path (.gz to compress), .parquet path, or - for stdout")
+    parser.add_argument('--redis-url', default=REDIS_URL)
+    parser.add_argument('--batch', type=int, default=1000, help='keys per SCAN step and pipelined fetch')
+    parser.add_argument('--no-legacy', dest='legacy', action='store_false',
+                        help='skip feedback:{promptId}:{userId} string keys')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with open_writer(args.output) as writer:
+        rows = export_ratings(connect(args.redis_url), writer, FEEDBACK_RATINGS_PREFIX, args.batch, args.legacy)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {rows} ratings in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} ratings/s)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
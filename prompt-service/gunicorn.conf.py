@@ -0,0 +1,84 @@
+"""Gunicorn configuration for the prompt service.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+
+Every setting can be overridden through environment variables, the same way
+PORT and REDIS_URL configure the Flask app.
+"""
+import gc
+import glob
+import multiprocessing
+import os
+
+# Bind to the same port the dev server uses
+bind = f"0.0.0.0:{int(os.getenv('PORT', 5001))}"
+
+# Worker processes. Requests spend almost all of their time waiting on
+# OpenAI/Redis I/O, so each worker runs a thread pool instead of handling
+# one request at a time.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+# OpenAI calls (especially gpt-4o vision feedback) can take well over the
+# default 30s, so give workers room before the arbiter kills them
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Import app.py once in the master so the module-level catalogs (templates,
+# artists, books, emotions) are built once and shared copy-on-write by forks
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+# Prometheus multiprocess mode: workers write metric samples to this
+# directory and GET /metrics aggregates them. Samples from a previous run
+# would be counted again, so the directory starts empty.
+prometheus_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if prometheus_multiproc_dir:
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(prometheus_multiproc_dir, '*.db')):
+        os.remove(path)
+
+# Set GUNICORN_ACCESS_LOG to an empty string to turn access logging off
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Freeze everything the preloaded app allocated before workers fork.
+
+    Moving these objects into the permanent GC generation stops the cyclic
+    collector in each worker from touching their headers, which would
+    otherwise copy the shared pages into every worker.
+    """
+    if preload_app:
+        gc.freeze()
+        server.log.info("Froze %d preloaded objects before forking workers", gc.get_freeze_count())
+
+
+def post_worker_init(worker):
+    """Start the pre-generation refill thread inside each worker.
+
+    Threads don't survive fork, so this can't happen at import time in the
+    preloading master.
+    """
+    from app import start_pregen_worker
+    start_pregen_worker()
+
+
+def worker_exit(server, worker):
+    """Write the worker's queued ratings to Redis before it exits"""
+    from app import feedback_buffer
+    feedback_buffer.close()
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (feedback buffer depth) from /metrics"""
+    if prometheus_multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
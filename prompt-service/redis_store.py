@@ -0,0 +1,26 @@
+"""Redis connection settings and key layouts shared by the service and its
+scripts (export_feedback.py), which shouldn't have to import the Flask app."""
+import os
+
+import redis
+
+# Socket timeouts are fixed per connection pool, so they bound each command
+# rather than tracking a request's deadline.
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+
+FEEDBACK_RATINGS_PREFIX = 'feedback:ratings:'
+FEEDBACK_TOTALS_PREFIX = 'feedback:totals:'
+
+
+def connect(url=REDIS_URL):
+    """Sync Redis client with the service's socket timeouts"""
+    return redis.from_url(url, socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_TIMEOUT)
+
+
+def feedback_ratings_key(prompt_id):
+    return f'{FEEDBACK_RATINGS_PREFIX}{prompt_id}'
+
+
+def feedback_totals_key(dimension, value):
+    return f'{FEEDBACK_TOTALS_PREFIX}{dimension}:{value}'
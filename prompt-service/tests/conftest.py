@@ -38,3 +38,41 @@ def mock_feedback_response():
             }
         }]
     }
+
+@pytest.fixture
+def fake_redis(app):
+    """Swap the service's Redis client for an in-memory fakeredis server."""
+    import fakeredis
+    import app as prompt_app
+    client = fakeredis.FakeRedis()
+    client.flushall()  # FakeRedis instances share one server
+    original = prompt_app.redis_client
+    prompt_app.redis_client = client
+    yield client
+    prompt_app.redis_client = original
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Start every test with closed OpenAI circuit breakers."""
+    import app as prompt_app
+    prompt_app._circuit_breakers.clear()
+    yield
+    prompt_app._circuit_breakers.clear()
+
+@pytest.fixture(autouse=True)
+def reset_concurrency_limiters():
+    """Start every test with fresh per-model OpenAI concurrency limits."""
+    import app as prompt_app
+    prompt_app._concurrency_limiters.clear()
+    yield
+    prompt_app._concurrency_limiters.clear()
+
+@pytest.fixture(autouse=True)
+def reset_two_tier_caches():
+    """Start every test with empty in-process (L1) generator caches."""
+    import app as prompt_app
+    for cache in prompt_app.TWO_TIER_CACHES.values():
+        cache.clear_local()
+    yield
+    for cache in prompt_app.TWO_TIER_CACHES.values():
+        cache.clear_local()
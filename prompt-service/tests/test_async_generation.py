@@ -0,0 +1,90 @@
+import asyncio
+import random
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+
+import app as prompt_app
+
+
+def completion(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+WRITING_COMPLETION = completion(
+    "**Exercise Name**: Layered Omens\n"
+    "**Goal**: Practice generating ideas.\n"
+    "**Exercise**: Write ten one-line premises.\n\n"
+    "**Writing Tips for This Exercise**:\n"
+    "- Push past the obvious\n"
+    "- Borrow a detail\n"
+    "- Read it aloud"
+)
+
+
+class TestAsyncGeneration:
+    """Test the asyncio variants of the OpenAI-backed generators."""
+
+    def test_async_writing_prompt_matches_sync(self):
+        """Async and sync writing prompts send the same request and parse the same way."""
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=WRITING_COMPLETION) as mock_create, \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, return_value=WRITING_COMPLETION) as mock_acreate:
+            random.seed(7)
+            sync_result = prompt_app.generate_prompt_with_ai(['Fantasy'])
+            random.seed(7)
+            async_result = asyncio.run(prompt_app.agenerate_prompt_with_ai(['Fantasy']))
+
+        assert mock_create.call_args.kwargs['messages'] == mock_acreate.call_args.kwargs['messages']
+        sync_result.pop('timestamp')
+        async_result.pop('timestamp')
+        assert sync_result == async_result
+
+    def test_async_chord_progression(self):
+        """Async chord progression parses the completion and renders MIDI."""
+        content = "Progression: Am - F - C - G\nA falling minor line."
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, return_value=completion(content)):
+            result = asyncio.run(prompt_app.agenerate_chord_progression(['Melancholy']))
+
+        assert result['progression'] == 'Am - F - C - G'
+        assert result['difficulty'] == 'Beginner'
+        assert result['midiFile']
+
+    def test_async_chord_progression_invalid_emotion(self):
+        """Unknown emotions still raise before any OpenAI call."""
+        with pytest.raises(ValueError):
+            asyncio.run(prompt_app.agenerate_chord_progression(['Nonexistent']))
+
+    def test_async_feedback_calls_run_concurrently(self):
+        """Many in-flight feedback calls overlap instead of queueing."""
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.2)
+            return completion('  Solid draft.  ')
+
+        async def fan_out():
+            return await asyncio.gather(*[
+                prompt_app.agenerate_writing_feedback('Exercise', 'Type', 'Some writing', ['Horror'], 'Easy', 100)
+                for _ in range(100)
+            ])
+
+        with patch('openai.ChatCompletion.acreate', side_effect=slow_completion):
+            start = time.perf_counter()
+            results = asyncio.run(fan_out())
+            elapsed = time.perf_counter() - start
+
+        assert results == ['Solid draft.'] * 100
+        assert elapsed < 2.0
+
+    def test_async_sound_design_uses_async_redis_rotation(self):
+        """Async sound design picks its reference through the async Redis client."""
+        import fakeredis
+        server = fakeredis.FakeServer()
+        content = "Title: Neuro Growl\n\nLayer two oscillators.\n\nTips:\n- Tip one\n- Tip two\n- Tip three"
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'get_async_redis', side_effect=lambda: fakeredis.aioredis.FakeRedis(server=server)), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, return_value=completion(content)):
+            result = asyncio.run(prompt_app.agenerate_sound_design_prompt('Vital', 'technical', 'dubstep'))
+
+        assert fakeredis.FakeRedis(server=server).get('sound_design:artist_rotation_index:dubstep:position') == b'1'
+        assert result['synthesizer'] == 'Vital'
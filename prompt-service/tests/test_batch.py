@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch, AsyncMock
+
+import app as prompt_app
+
+
+def post_batch(client, path, items):
+    with patch.object(prompt_app, 'pregen_pop', return_value=None):
+        response = client.post(path, json={'items': items})
+    return response.status_code, json.loads(response.data)
+
+
+class TestBatchEndpoints:
+    """Test the /batch variants of the generator endpoints."""
+
+    def test_results_come_back_in_request_order(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', False):
+            status, body = post_batch(client, '/generate-chord-progression/batch', [
+                {'emotions': ['Melancholy']},
+                {'emotions': ['Elation']},
+                {'emotions': ['Melancholy']},
+            ])
+
+        assert status == 200
+        assert body['succeeded'] == 3 and body['failed'] == 0
+        emotions = [item['result']['emotions'] for item in body['results']]
+        assert emotions == [['Melancholy'], ['Elation'], ['Melancholy']]
+
+    def test_invalid_items_fail_individually(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', False):
+            status, body = post_batch(client, '/generate-drawing-exercise/batch', [
+                {'skills': [prompt_app.DRAWING_SKILLS[0]]},
+                {'skills': []},
+                'not an object',
+                {'skills': ['Juggling']},
+            ])
+
+        assert status == 200
+        assert body['succeeded'] == 1 and body['failed'] == 3
+        assert body['results'][0]['ok']
+        assert body['results'][1] == {'ok': False, 'status': 400, 'error': 'Must select 1 or 2 skills'}
+        assert body['results'][2]['status'] == 400
+        assert body['results'][3]['error'] == 'Invalid skill: Juggling'
+
+    def test_validation_matches_single_endpoint(self, client, fake_redis):
+        """Batch items report the same errors the single endpoint returns."""
+        item = {'synthesizer': 'Minimoog'}
+        single = client.post('/generate-sound-design', json=item)
+        _, body = post_batch(client, '/generate-sound-design/batch', [item])
+        assert body['results'][0]['error'] == json.loads(single.data)['error']
+
+    def test_generation_failures_are_500_items(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'agenerate_chord_progression', side_effect=RuntimeError('boom')):
+            _, body = post_batch(client, '/generate-chord-progression/batch', [{'emotions': ['Elation']}])
+        assert body['results'][0] == {'ok': False, 'status': 500, 'error': 'Generation failed'}
+
+    def test_batch_limits(self, client):
+        assert client.post('/generate/batch', json={'items': []}).status_code == 400
+        assert client.post('/generate/batch', json={'genres': ['Fantasy']}).status_code == 400
+        with patch.object(prompt_app, 'BATCH_MAX_ITEMS', 2):
+            response = client.post('/generate/batch', json={'items': [{'genres': ['Fantasy']}] * 3})
+        assert response.status_code == 400
+
+    def test_writing_prompts_share_the_prompt_cache(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'generate_prompt_from_template',
+                          wraps=prompt_app.generate_prompt_from_template) as template:
+            _, body = post_batch(client, '/generate/batch', [{'genres': ['Fantasy']}, {}])
+            client.post('/generate', json={'genres': ['Fantasy']})
+
+        assert body['results'][0]['ok']
+        assert body['results'][1]['error'] == 'At least one genre must be selected'
+        assert template.call_count == 1
+
+    def test_embed_midi_applies_per_item(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', False):
+            _, body = post_batch(client, '/generate-chord-progression/batch', [
+                {'emotions': ['Elation']},
+                {'emotions': ['Elation'], 'embedMidi': False},
+            ])
+        embedded, by_id = (item['result'] for item in body['results'])
+        assert 'midiFile' in embedded and 'midiFile' not in by_id
+        assert client.get(f"/midi/{by_id['midiId']}").status_code == 200
+
+    def test_concurrency_is_bounded(self, client, fake_redis):
+        """No more than BATCH_CONCURRENCY OpenAI calls are in flight at once."""
+        in_flight = peak = 0
+
+        async def slow_completion(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {'choices': [{'message': {'content': 'Progression: Am - F - C - G\nFalling.'}}]}
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'BATCH_CONCURRENCY', 3), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, side_effect=slow_completion):
+            _, body = post_batch(client, '/generate-chord-progression/batch', [{'emotions': ['Elation']}] * 10)
+
+        assert body['succeeded'] == 10
+        assert peak == 3
+
+    def test_blocking_redis_work_does_not_serialize_items(self, client, fake_redis):
+        """A slow pre-generation pool lookup in one item doesn't hold up the others."""
+        def slow_pop(endpoint, params):
+            time.sleep(0.2)
+            return None
+
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'pregen_pop', side_effect=slow_pop):
+            started = time.monotonic()
+            response = client.post('/generate-drawing-exercise/batch',
+                                   json={'items': [{'skills': [prompt_app.DRAWING_SKILLS[0]]}] * 4})
+            elapsed = time.monotonic() - started
+
+        assert json.loads(response.data)['succeeded'] == 4
+        assert elapsed < 0.6
+
+    def test_midi_rendering_does_not_serialize_items(self, client, fake_redis):
+        """A slow MIDI render in one chord item doesn't hold up the others."""
+        render = prompt_app.midi_cache.render
+
+        def slow_render(*args, **kwargs):
+            time.sleep(0.2)
+            return render(*args, **kwargs)
+
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'pregen_pop', return_value=None), \
+             patch.object(prompt_app.midi_cache, 'render', side_effect=slow_render):
+            started = time.monotonic()
+            response = client.post('/generate-chord-progression/batch',
+                                   json={'items': [{'emotions': ['Elation']}] * 4})
+            elapsed = time.monotonic() - started
+
+        assert json.loads(response.data)['succeeded'] == 4
+        assert elapsed < 0.6
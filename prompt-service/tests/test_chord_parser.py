@@ -0,0 +1,103 @@
+from app import parse_chord_progression, chord_name_to_midi_notes, CHORD_QUALITY_INTERVALS
+
+
+def intervals(progression_text):
+    """(name, intervals above the root) for each parsed chord"""
+    return [(chord['name'], [note - chord['root'] for note in chord['notes']])
+            for chord in parse_chord_progression(progression_text)]
+
+
+class TestChordGrammar:
+    """Test chord symbol parsing for AI-generated progressions."""
+
+    def test_basic_progression(self):
+        chords = parse_chord_progression('Cmaj7 - Am - Fmaj7 - G')
+        assert [c['name'] for c in chords] == ['Cmaj7', 'Am', 'Fmaj7', 'G']
+        assert [c['root'] for c in chords] == [60, 69, 65, 67]
+        assert chords[0]['notes'] == [60, 64, 67, 71]
+        assert chords[1]['notes'] == [69, 72, 76]
+
+    def test_sevenths_extensions_and_alterations(self):
+        assert intervals('G7 - Dm9 - Bm7b5 - E7b9 - Cmaj7#11 - A13') == [
+            ('G7', [0, 4, 7, 10]),
+            ('Dm9', [0, 3, 7, 10, 14]),
+            ('Bm7b5', [0, 3, 6, 10]),
+            ('E7b9', [0, 4, 7, 10, 13]),
+            ('Cmaj7#11', [0, 4, 7, 11, 18]),
+            ('A13', [0, 4, 7, 10, 14, 21]),
+        ]
+
+    def test_alternative_spellings(self):
+        """Δ, M, min, ø, °, + and parenthesized alterations map to the same qualities."""
+        assert intervals('CΔ7 - CM7 - Cmin7 - Cø7 - C°7 - C+ - C7(b9)') == [
+            ('CΔ7', [0, 4, 7, 11]),
+            ('CM7', [0, 4, 7, 11]),
+            ('Cmin7', [0, 3, 7, 10]),
+            ('Cø7', [0, 3, 6, 10]),
+            ('C°7', [0, 3, 6, 9]),
+            ('C+', [0, 4, 8]),
+            ('C7(b9)', [0, 4, 7, 10, 13]),
+        ]
+
+    def test_unicode_accidentals(self):
+        chords = parse_chord_progression('B♭maj7 → F♯m → E♭ → G#')
+        assert [c['root'] for c in chords] == [70, 66, 63, 68]
+
+    def test_quality_after_a_space(self):
+        assert intervals('Am add9 - C major - A minor') == [
+            ('Am add9', [0, 3, 7, 14]),
+            ('C major', [0, 4, 7]),
+            ('A minor', [0, 3, 7]),
+        ]
+
+    def test_slash_chords_put_the_bass_below(self):
+        chords = parse_chord_progression('C/E - F#m7/C#')
+        assert chords[0]['notes'] == [52, 60, 64, 67]
+        assert chords[1]['notes'] == [49, 66, 69, 73, 76]
+
+    def test_six_nine_is_not_a_slash_chord(self):
+        assert intervals('C6/9') == [('C6/9', [0, 4, 7, 9, 14])]
+
+    def test_separators(self):
+        for text in ['Dm7 G7 Cmaj7', 'Dm7 | G7 | Cmaj7', 'Dm7, G7, Cmaj7', 'Dm7 – G7 – Cmaj7', 'Dm7-G7-Cmaj7',
+                     'Dm7 -G7- Cmaj7']:
+            assert [c['name'] for c in parse_chord_progression(text)] == ['Dm7', 'G7', 'Cmaj7'], text
+
+    def test_hyphens_inside_a_symbol(self):
+        """A hyphen that doesn't start a new chord is part of the spelling."""
+        assert intervals('Bm7-5 - E7 - C half-dim - Am') == [
+            ('Bm7-5', [0, 3, 6, 10]),
+            ('E7', [0, 4, 7, 10]),
+            ('C half-dim', [0, 3, 6, 10]),
+            ('Am', [0, 3, 7]),
+        ]
+
+    def test_roman_numerals_are_skipped_and_logged(self, caplog):
+        assert [c['name'] for c in parse_chord_progression('Am - F - C - G - VI - VII')] == ['Am', 'F', 'C', 'G']
+        assert parse_chord_progression('i - iv - V') == []
+        assert parse_chord_progression('ii-V-I') == []
+        assert "'ii-V-I'" in caplog.text
+        assert "'VII'" in caplog.text
+
+    def test_tokens_that_are_not_whole_symbols_are_skipped(self, caplog):
+        """A leading note letter alone doesn't make a word a chord."""
+        assert [c['name'] for c in parse_chord_progression('C7alt - Fxyz - and - a - Am')] == ['Am']
+        assert [c['name'] for c in parse_chord_progression('Dm7 and G7, then Cmaj7')] == ['Dm7', 'G7', 'Cmaj7']
+        assert "'and'" in caplog.text
+        assert "'C7alt'" in caplog.text
+        assert "'then'" in caplog.text
+
+    def test_legacy_quality_names(self):
+        """Quality names the old lookup table accepted still map the same way."""
+        assert chord_name_to_midi_notes('major') == [60, 64, 67]
+        assert chord_name_to_midi_notes('minor7', 62) == [62, 65, 69, 72]
+        assert chord_name_to_midi_notes('power', 67) == [67, 74]
+        assert chord_name_to_midi_notes('add11') == [60, 64, 67, 77]
+        assert chord_name_to_midi_notes('minor9') == [60, 63, 67, 70, 74]
+        assert chord_name_to_midi_notes('no such chord') == [60, 64, 67]
+
+    def test_returned_notes_are_independent_lists(self):
+        first = parse_chord_progression('Cmaj7')[0]['notes']
+        first.append(0)
+        assert parse_chord_progression('Cmaj7')[0]['notes'] == [60, 64, 67, 71]
+        assert list(CHORD_QUALITY_INTERVALS['maj7']) == [0, 4, 7, 11]
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import openai
+import pytest
+from unittest.mock import patch, AsyncMock
+
+import app as prompt_app
+
+
+FEEDBACK_REQUEST = {'exercise': 'Write a scene', 'userWriting': 'Once upon a time', 'genres': ['Fantasy'],
+                    'exerciseType': 'Scene', 'difficulty': 'Easy', 'wordCount': 250}
+WRITING_FEEDBACK = prompt_app.build_writing_feedback_request('Write a scene', 'Scene', 'Once upon a time',
+                                                             ['Fantasy'], 'Easy', 250)
+
+
+def completion(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+@pytest.fixture
+def breaker_settings():
+    """Open after three calls at a 50% failure rate, for 30 seconds."""
+    with patch.object(prompt_app, 'CIRCUIT_BREAKER_MIN_CALLS', 3), \
+         patch.object(prompt_app, 'CIRCUIT_BREAKER_FAILURE_RATE', 0.5), \
+         patch.object(prompt_app, 'CIRCUIT_BREAKER_OPEN_SECONDS', 30):
+        yield
+
+
+class TestCircuitBreaker:
+    """Test the per-model circuit breaker around OpenAI calls."""
+
+    def trip(self, model='gpt-3.5-turbo'):
+        breaker = prompt_app.circuit_breaker(model)
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record(0.1, openai.error.APIError('upstream down'))
+        assert breaker.state == 'open'
+        return breaker
+
+    def test_outage_opens_the_breaker_and_skips_openai(self, client, breaker_settings):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=openai.error.Timeout('timed out')) as create:
+            for _ in range(5):
+                response = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST)
+                assert response.status_code == 200
+                assert json.loads(response.data)['feedback'].startswith('**Feedback on your Scene**')
+
+        assert create.call_count == 3
+        assert prompt_app.circuit_breaker('gpt-3.5-turbo').snapshot()['rejected'] == 2
+
+    def test_slow_calls_count_as_failures(self, breaker_settings):
+        with patch.object(prompt_app, 'CIRCUIT_BREAKER_SLOW_SECONDS', 0), \
+             patch('openai.ChatCompletion.create', return_value=completion('Fine')):
+            for _ in range(3):
+                prompt_app.chat_completion(WRITING_FEEDBACK)
+            with pytest.raises(prompt_app.CircuitOpenError):
+                prompt_app.chat_completion(WRITING_FEEDBACK)
+
+    def test_half_open_lets_one_probe_through(self, breaker_settings):
+        breaker = self.trip()
+        assert not breaker.allow()
+        breaker.opened_at -= 30
+        assert breaker.allow()
+        assert breaker.state == 'half_open'
+        assert not breaker.allow()
+        breaker.record(0.2)
+        assert breaker.state == 'closed'
+        assert breaker.allow()
+
+    def test_failed_probe_reopens(self, breaker_settings):
+        breaker = self.trip()
+        breaker.opened_at -= 30
+        assert breaker.allow()
+        breaker.record(0.2, openai.error.ServiceUnavailableError('still down'))
+        assert breaker.state == 'open'
+        assert not breaker.allow()
+
+    def test_breakers_are_per_model(self, breaker_settings):
+        self.trip('gpt-4o')
+        with patch('openai.ChatCompletion.create', return_value=completion('Fine')):
+            assert prompt_app.chat_completion(WRITING_FEEDBACK) == 'Fine'
+
+    def test_invalid_requests_do_not_count(self, breaker_settings):
+        with patch('openai.ChatCompletion.create', side_effect=openai.error.InvalidRequestError('bad', 'messages')):
+            for _ in range(5):
+                with pytest.raises(openai.error.InvalidRequestError):
+                    prompt_app.chat_completion(WRITING_FEEDBACK)
+        assert prompt_app.circuit_breaker('gpt-3.5-turbo').snapshot()['calls'] == 0
+
+    def test_async_calls_share_the_breaker(self, breaker_settings):
+        self.trip()
+        with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as acreate:
+            with pytest.raises(prompt_app.CircuitOpenError):
+                asyncio.run(prompt_app.achat_completion(WRITING_FEEDBACK))
+        acreate.assert_not_called()
+
+    def test_streaming_falls_back_while_open(self, client, breaker_settings):
+        self.trip()
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create') as create:
+            response = client.post('/generate-writing-feedback', json={**FEEDBACK_REQUEST, 'stream': True})
+        create.assert_not_called()
+        assert response.get_data(as_text=True).startswith('event: result\n')
+
+    def test_state_endpoint(self, client, breaker_settings):
+        self.trip('gpt-4o')
+        body = json.loads(client.get('/circuit-breakers').data)
+        assert body['breakers']['gpt-4o']['state'] == 'open'
+        assert body['breakers']['gpt-4o']['failureRate'] == 1.0
+        assert body['breakers']['gpt-4o']['retryInSeconds'] > 0
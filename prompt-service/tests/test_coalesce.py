@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import openai
+
+import app as prompt_app
+
+
+WRITING_CONTENT = "**Layered Omens**\n**Exercise**: Write ten one-line premises."
+CHORD_CONTENT = "Progression: Am - F - C - G\nA falling minor line."
+
+
+def slow_completion(content, delay=0.3):
+    """A blocking OpenAI call that stays in flight long enough for others to pile up"""
+    def create(**kwargs):
+        time.sleep(delay)
+        return {'choices': [{'message': {'content': content}}]}
+    return create
+
+
+def outcomes(name):
+    """This endpoint's coalescing counters, without the derived savedRate"""
+    counts = prompt_app.coalesce_stats()['endpoints'].get(name, {'generated': 0, 'saved': 0, 'timedOut': 0})
+    return {outcome: counts[outcome] for outcome in ('generated', 'saved', 'timedOut')}
+
+
+def outcome_changes(name, before):
+    return {outcome: count - before[outcome] for outcome, count in outcomes(name).items()}
+
+
+def post_concurrently(app, path, body, count):
+    """POST the same body from `count` threads at once; returns the JSON responses"""
+    responses = [None] * count
+
+    def post(index):
+        response = app.test_client().post(path, json=body)
+        assert response.status_code == 200
+        responses[index] = json.loads(response.data)
+
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+class TestRequestCoalescing:
+    """Test singleflight coalescing of identical concurrent generations."""
+
+    def test_concurrent_writing_prompts_share_one_call(self, app, fake_redis):
+        before = outcomes('writing')
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(WRITING_CONTENT)) as create:
+            responses = post_concurrently(app, '/generate', {'genres': ['Fantasy']}, 4)
+
+        assert create.call_count == 1
+        assert len({response['title'] for response in responses}) == 1
+        assert outcome_changes('writing', before) == {'generated': 1, 'saved': 3, 'timedOut': 0}
+
+    def test_prompt_cache_serve_limit_still_applies(self, app, fake_redis):
+        """Waiters beyond PROMPT_CACHE_MAX_SERVES lead another generation instead of sharing."""
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'PROMPT_CACHE_MAX_SERVES', 2), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(WRITING_CONTENT)) as create:
+            post_concurrently(app, '/generate', {'genres': ['Horror']}, 4)
+
+        assert create.call_count == 2
+
+    def test_waits_for_another_workers_generation(self, client, fake_redis):
+        """A request that finds the Redis lock held reads the other worker's result from the cache."""
+        other_workers_prompt = {'title': 'From another worker', 'difficulty': 'Easy', 'wordCount': 250}
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create') as create:
+            cache_key = prompt_app.prompt_cache_key(['Mystery'])
+            lock_key = f'coalesce:lock:{cache_key}'
+            fake_redis.set(lock_key, 1)
+
+            def other_worker_finishes():
+                time.sleep(0.2)
+                prompt_app.cache_prompt(cache_key, other_workers_prompt)
+                fake_redis.delete(lock_key)
+
+            finisher = threading.Thread(target=other_worker_finishes)
+            finisher.start()
+            response = client.post('/generate', json={'genres': ['Mystery']})
+            finisher.join()
+
+        create.assert_not_called()
+        assert json.loads(response.data)['title'] == 'From another worker'
+
+    def test_unstored_fallback_is_handed_to_waiters(self, app, fake_redis):
+        """A template fallback isn't cached, so waiters in this worker take the leader's copy."""
+        def slow_failure(**kwargs):
+            time.sleep(0.3)
+            raise openai.error.APIError('upstream down')
+
+        before = outcomes('writing')
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=slow_failure) as create:
+            responses = post_concurrently(app, '/generate', {'genres': ['Thriller']}, 4)
+
+        assert create.call_count == 1
+        assert len({response['title'] for response in responses}) == 1
+        assert outcome_changes('writing', before) == {'generated': 1, 'saved': 3, 'timedOut': 0}
+
+    def test_failed_generation_is_raised_to_waiters(self, fake_redis):
+        calls = []
+        errors = []
+
+        def failing_generation():
+            calls.append(1)
+            time.sleep(0.2)
+            raise ValueError('generation failed')
+
+        def request():
+            try:
+                prompt_app.coalesce('test', 'failing', lambda: None, failing_generation)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len(errors) == 3
+
+    def test_other_workers_unstored_result_is_not_queued_behind(self, fake_redis):
+        """Once another worker's generation ends unstored, waiters generate without taking the lock."""
+        lock_key = 'coalesce:lock:unstored'
+        fake_redis.set(lock_key, 'other worker')
+
+        def other_worker_finishes():
+            time.sleep(0.2)
+            fake_redis.set('coalesce:unstored:unstored', 'other worker', ex=prompt_app.COALESCE_UNSTORED_TTL)
+            fake_redis.delete(lock_key)
+
+        def generation():
+            assert not fake_redis.exists(lock_key)
+            return 'result'
+
+        finisher = threading.Thread(target=other_worker_finishes)
+        finisher.start()
+        assert prompt_app.coalesce('test', 'unstored', lambda: None, generation) == 'result'
+        finisher.join()
+
+    def test_unstored_result_is_marked_for_other_workers(self, fake_redis):
+        prompt_app.coalesce('test', 'marked', lambda: None, lambda: 'result', stored=lambda result: False)
+        assert fake_redis.exists('coalesce:unstored:marked')
+        prompt_app.coalesce('test', 'marked', lambda: None, lambda: 'result')
+        assert not fake_redis.exists('coalesce:unstored:marked')
+
+    def test_waiters_give_up_after_coalesce_wait(self, client, fake_redis):
+        before = outcomes('writing')
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'COALESCE_WAIT', 0.2), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(WRITING_CONTENT, 0)) as create:
+            fake_redis.set(f"coalesce:lock:{prompt_app.prompt_cache_key(['Romance'])}", 1)
+            response = client.post('/generate', json={'genres': ['Romance']})
+
+        assert response.status_code == 200
+        assert create.call_count == 1
+        assert outcome_changes('writing', before)['timedOut'] == 1
+
+    def test_exercises_stay_unique_by_default(self, app, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(CHORD_CONTENT, 0.1)) as create:
+            post_concurrently(app, '/generate-chord-progression', {'emotions': ['Awe']}, 3)
+        assert create.call_count == 3
+
+    def test_exercises_are_shared_up_to_max_shared(self, app, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'COALESCE_MAX_SHARED', 3), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(CHORD_CONTENT)) as create:
+            responses = post_concurrently(app, '/generate-chord-progression', {'emotions': ['Awe', 'Wonder']}, 3)
+
+        assert create.call_count == 1
+        assert all(response['progression'] == 'Am - F - C - G' for response in responses)
+        assert all(response['emotions'] == ['Awe', 'Wonder'] for response in responses)
+        assert not fake_redis.exists(prompt_app._shared_exercise_key('chord', ('Awe', 'Wonder')))
+
+    def test_disabled(self, app, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'COALESCE_ENABLED', False), \
+             patch('openai.ChatCompletion.create', side_effect=slow_completion(WRITING_CONTENT, 0.1)) as create:
+            post_concurrently(app, '/generate', {'genres': ['Western']}, 3)
+        assert create.call_count == 3
+
+    def test_expired_lock_held_by_another_worker_is_not_released(self, fake_redis):
+        """A generation that outlives its lock leaves the next holder's lock alone."""
+        lock_key = 'coalesce:lock:slow'
+
+        def slow_generation():
+            # Our lock expired mid-generation and another worker took it
+            fake_redis.set(lock_key, 'other worker')
+            return 'result'
+
+        assert prompt_app.coalesce('test', 'slow', lambda: None, slow_generation) == 'result'
+        assert fake_redis.get(lock_key) == b'other worker'
+
+    def test_own_lock_is_released(self, fake_redis):
+        assert prompt_app.coalesce('test', 'quick', lambda: None, lambda: 'result') == 'result'
+        assert not fake_redis.exists('coalesce:lock:quick')
+
+    def test_redis_failure_while_waiting_generates(self, fake_redis):
+        fake_redis.set('coalesce:lock:blip', 'other worker')
+        with patch.object(fake_redis, 'exists', side_effect=ConnectionError('down')):
+            assert prompt_app.coalesce('test', 'blip', lambda: None, lambda: 'result') == 'result'
+
+    def test_stats_endpoint(self, client, fake_redis):
+        before = outcomes('test-stats')
+        prompt_app.coalesce('test-stats', 'stats', lambda: None, lambda: 'result')
+        response = client.get('/coalesce/stats')
+        assert response.status_code == 200
+        counts = json.loads(response.data)['endpoints']['test-stats']
+        assert counts['generated'] == before['generated'] + 1
+        assert 0 <= counts['savedRate'] <= 1
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+import openai
+import pytest
+from unittest.mock import patch, AsyncMock
+
+import app as prompt_app
+
+
+FEEDBACK_REQUEST = {'exercise': 'Write a scene', 'userWriting': 'Once upon a time', 'genres': ['Fantasy'],
+                    'exerciseType': 'Scene', 'difficulty': 'Easy', 'wordCount': 250}
+WRITING_FEEDBACK = prompt_app.build_writing_feedback_request('Write a scene', 'Scene', 'Once upon a time',
+                                                             ['Fantasy'], 'Easy', 250)
+
+
+def completion(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+def rate_limited(retry_after=None):
+    headers = {'retry-after': retry_after} if retry_after is not None else {}
+    return openai.error.RateLimitError('Rate limit reached', headers=headers)
+
+
+@pytest.fixture
+def fast_retries():
+    with patch.object(prompt_app, 'OPENAI_RETRY_BASE_SECONDS', 0.01), \
+         patch.object(prompt_app, 'OPENAI_RETRY_MAX_SECONDS', 0.02):
+        yield
+
+
+class TestAdaptiveLimiter:
+    """Test the AIMD concurrency limit on one model's OpenAI calls."""
+
+    def test_fast_calls_grow_the_limit_additively(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 4, 1, 16, 1.0)
+        for _ in range(4):
+            assert limiter.try_acquire()
+            limiter.release(time.monotonic(), 0.1)
+        assert limiter.limit == pytest.approx(5, abs=0.1)
+
+    def test_limit_stops_at_its_maximum(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 2, 1, 2, 1.0)
+        for _ in range(10):
+            assert limiter.try_acquire()
+            limiter.release(time.monotonic(), 0.1)
+        assert limiter.snapshot()['limit'] == 2
+
+    def test_rate_limits_halve_the_limit_once_per_round(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 8, 1, 16, 1.0)
+        started = time.monotonic()
+        for _ in range(4):
+            assert limiter.try_acquire()
+        for _ in range(4):
+            limiter.release(started, 0.1, rate_limited())
+        assert limiter.limit == 4
+        assert limiter.snapshot()['throttled'] == 4
+
+        assert limiter.try_acquire()
+        limiter.release(time.monotonic(), 0.1, rate_limited())
+        assert limiter.limit == 2
+
+    def test_slow_calls_shrink_the_limit(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 8, 2, 16, 1.0)
+        for _ in range(3):
+            assert limiter.try_acquire()
+            limiter.release(time.monotonic(), 1.5)
+        assert limiter.limit == 2
+
+    def test_full_pool_rejects_after_the_queue_timeout(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 1, 1, 4, 1.0)
+        assert limiter.acquire(0)
+        started = time.monotonic()
+        assert not limiter.acquire(0.05)
+        assert time.monotonic() - started >= 0.05
+        assert limiter.snapshot()['rejected'] == 1
+
+    def test_waiters_get_freed_slots(self):
+        limiter = prompt_app.AdaptiveLimiter('model', 1, 1, 4, 1.0)
+        assert limiter.acquire(0)
+        threading.Timer(0.05, limiter.release, args=(time.monotonic(), 0.05)).start()
+        assert limiter.acquire(1)
+        assert limiter.in_flight == 1
+
+
+class TestUpstreamConcurrency:
+    """Test concurrency slots and 429 retries around OpenAI calls."""
+
+    def test_models_have_separate_pools(self):
+        with patch.object(prompt_app, 'CONCURRENCY_QUEUE_SECONDS', 0):
+            vision = prompt_app.concurrency_limiter('gpt-4o')
+            slots = [prompt_app.acquire_upstream_slot('gpt-4o') for _ in range(int(vision.limit))]
+            with pytest.raises(prompt_app.ConcurrencyLimitExceeded):
+                prompt_app.acquire_upstream_slot('gpt-4o')
+
+            with patch('openai.ChatCompletion.create', return_value=completion('Fine')):
+                assert prompt_app.chat_completion(WRITING_FEEDBACK) == 'Fine'
+            for slot in slots:
+                slot.release()
+
+    def test_saturated_model_falls_back_without_calling_openai(self, client):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'CONCURRENCY_QUEUE_SECONDS', 0), \
+             patch.object(prompt_app, 'CONCURRENCY_LIMITS', {'gpt-3.5-turbo': (1, 1, 1, 8.0)}), \
+             patch('openai.ChatCompletion.create') as create:
+            slot = prompt_app.acquire_upstream_slot('gpt-3.5-turbo')
+            response = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST)
+            slot.release()
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['feedback'].startswith('**Feedback on your Scene**')
+        create.assert_not_called()
+        assert prompt_app.circuit_breaker_stats()['breakers']['gpt-3.5-turbo']['calls'] == 0
+
+    def test_rate_limits_are_retried(self, fast_retries):
+        with patch('openai.ChatCompletion.create',
+                   side_effect=[rate_limited(), rate_limited(), completion('Fine')]) as create:
+            assert prompt_app.chat_completion(WRITING_FEEDBACK) == 'Fine'
+
+        assert create.call_count == 3
+        stats = prompt_app.concurrency_limit_stats()['limits']['gpt-3.5-turbo']
+        assert stats['retries'] == 2
+        assert stats['throttled'] == 2
+        assert stats['inFlight'] == 0
+
+    def test_retries_give_up_after_the_maximum(self, fast_retries):
+        with patch('openai.ChatCompletion.create', side_effect=rate_limited()) as create:
+            with pytest.raises(openai.error.RateLimitError):
+                prompt_app.chat_completion(WRITING_FEEDBACK)
+        assert create.call_count == prompt_app.OPENAI_MAX_RETRIES + 1
+
+    def test_other_errors_are_not_retried(self, fast_retries):
+        with patch('openai.ChatCompletion.create', side_effect=openai.error.Timeout('timed out')) as create:
+            with pytest.raises(openai.error.Timeout):
+                prompt_app.chat_completion(WRITING_FEEDBACK)
+        assert create.call_count == 1
+
+    def test_retries_respect_the_request_deadline(self, client):
+        deadline = {'X-Request-Deadline': str(int((time.time() + 0.5) * 1000))}
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=rate_limited(retry_after='5')) as create:
+            started = time.monotonic()
+            response = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST, headers=deadline)
+
+        assert time.monotonic() - started < 0.5
+        assert response.status_code == 200
+        create.assert_called_once()
+
+    def test_async_calls_share_the_pool(self, fast_retries):
+        async def run():
+            return await prompt_app.achat_completion(WRITING_FEEDBACK)
+
+        with patch('openai.ChatCompletion.acreate',
+                   new=AsyncMock(side_effect=[rate_limited(), completion('Fine')])) as acreate:
+            assert asyncio.run(run()) == 'Fine'
+
+        assert acreate.await_count == 2
+        assert prompt_app.concurrency_limiter('gpt-3.5-turbo').in_flight == 0
+
+    def test_streams_hold_their_slot_until_done(self):
+        chunks = [{'choices': [{'delta': {'content': text}}]} for text in ['One ', 'two']]
+        with patch('openai.ChatCompletion.create', return_value=iter(chunks)):
+            stream = prompt_app.stream_chat_completion(WRITING_FEEDBACK)
+            assert next(stream) == 'One '
+            assert prompt_app.concurrency_limiter('gpt-3.5-turbo').in_flight == 1
+            assert list(stream) == ['two']
+        assert prompt_app.concurrency_limiter('gpt-3.5-turbo').in_flight == 0
+
+    def test_stats_endpoint(self, client):
+        prompt_app.concurrency_limiter('gpt-4o')
+        response = client.get('/concurrency-limits')
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['limits']['gpt-4o']['limit'] == prompt_app.CONCURRENCY_LIMITS['gpt-4o'][0]
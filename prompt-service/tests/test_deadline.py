@@ -0,0 +1,90 @@
+import json
+import time
+from unittest.mock import patch
+
+import openai
+import app as prompt_app
+
+
+CHORD_CONTENT = "Progression: Dm7 - G7 - Cmaj7\nA gentle ii-V-I."
+
+
+def deadline_in(seconds):
+    """X-Request-Deadline header for a deadline `seconds` from now"""
+    return {'X-Request-Deadline': str(int((time.time() + seconds) * 1000))}
+
+
+class TestRequestDeadlines:
+    """Test deadline propagation from the X-Request-Deadline header."""
+
+    def test_expired_requests_are_rejected_before_any_work(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create') as create:
+            response = client.post('/generate-chord-progression', json={'emotions': ['Awe']},
+                                   headers=deadline_in(-1))
+        assert response.status_code == 504
+        create.assert_not_called()
+
+    def test_invalid_header(self, client):
+        response = client.post('/generate-chord-progression', json={'emotions': ['Awe']},
+                               headers={'X-Request-Deadline': 'soon'})
+        assert response.status_code == 400
+
+    def test_remaining_budget_becomes_the_openai_timeout(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create',
+                   return_value={'choices': [{'message': {'content': CHORD_CONTENT}}]}) as create:
+            response = client.post('/generate-chord-progression', json={'emotions': ['Awe']},
+                                   headers=deadline_in(5))
+        assert json.loads(response.data)['progression'] == 'Dm7 - G7 - Cmaj7'
+        assert 4 < create.call_args.kwargs['request_timeout'] <= 5
+
+    def test_no_header_leaves_openai_params_alone(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create',
+                   return_value={'choices': [{'message': {'content': CHORD_CONTENT}}]}) as create:
+            client.post('/generate-chord-progression', json={'emotions': ['Awe']})
+        assert 'request_timeout' not in create.call_args.kwargs
+
+    def test_coalescing_wait_stops_at_the_deadline(self, client, fake_redis):
+        """A request waiting on another worker's generation gives up at its deadline and skips OpenAI."""
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create') as create:
+            fake_redis.set(f"coalesce:lock:{prompt_app.prompt_cache_key(['Mystery'])}", 1)
+            started = time.monotonic()
+            response = client.post('/generate', json={'genres': ['Mystery']}, headers=deadline_in(0.3))
+
+        assert time.monotonic() - started < prompt_app.COALESCE_WAIT
+        assert response.status_code == 200
+        create.assert_not_called()
+
+    def test_upstream_timeouts_under_a_deadline_open_the_breaker(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=openai.error.Timeout('timed out')) as create:
+            for _ in range(20):
+                response = client.post('/generate-sound-design', json={'synthesizer': 'Vital'},
+                                       headers=deadline_in(5))
+                assert response.status_code == 200
+
+        assert create.call_count == prompt_app.CIRCUIT_BREAKER_MIN_CALLS
+        assert prompt_app.circuit_breaker_stats()['breakers']['gpt-3.5-turbo']['state'] == 'open'
+
+    def test_expired_deadline_calls_are_not_recorded(self, client, fake_redis):
+        breaker = prompt_app.circuit_breaker('gpt-3.5-turbo')
+        prompt_app._circuit_record(breaker, time.monotonic(), prompt_app.DeadlineExceeded('late'))
+        assert breaker.snapshot()['calls'] == 0
+
+    def test_streams_are_abandoned_at_the_deadline(self, client):
+        def slow_stream():
+            for text in ['First line\n', 'Second line\n', 'Third line\n']:
+                yield {'choices': [{'delta': {'content': text}}]}
+                time.sleep(0.2)
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=slow_stream()):
+            response = client.post('/generate-drawing-feedback', headers=deadline_in(0.3),
+                                   json={'image': 'abc', 'skills': ['Shading'], 'stream': True})
+            body = response.get_data(as_text=True)
+
+        assert 'Third line' not in body
+        assert json.dumps({'feedback': prompt_app.drawing_feedback_template(['Shading'])}) in body
@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app as prompt_app
+import export_feedback
+
+
+def export(fake_redis, **kwargs):
+    out = io.StringIO()
+    rows = export_feedback.export_ratings(fake_redis, csv.writer(out), export_feedback.FEEDBACK_RATINGS_PREFIX,
+                                          **kwargs)
+    return rows, sorted(tuple(row) for row in csv.reader(io.StringIO(out.getvalue())))
+
+
+class TestExportFeedback:
+    """Test the SCAN-based ratings export."""
+
+    def test_exports_every_rating(self, fake_redis):
+        for n in range(7):
+            prompt_app.record_feedback(f'p{n % 3}', f'u{n}', n % 5 + 1, {'artist': 'Noisia'})
+
+        rows, exported = export(fake_redis, batch_size=2)
+
+        assert rows == 7
+        assert [row[:3] for row in exported] == [
+            ('p0', 'u0', '1'), ('p0', 'u3', '4'), ('p0', 'u6', '2'),
+            ('p1', 'u1', '2'), ('p1', 'u4', '5'), ('p2', 'u2', '3'), ('p2', 'u5', '1'),
+        ]
+        assert exported[0][3].endswith('+00:00')
+
+    def test_legacy_string_keys(self, fake_redis):
+        prompt_app.record_feedback('p1', 'u1', 5, {})
+        fake_redis.set('feedback:old:prompt:u2', json.dumps({'rating': 3, 'timestamp': '2026-01-01T00:00:00'}))
+
+        rows, exported = export(fake_redis)
+        assert rows == 2
+        assert ('old:prompt', 'u2', '3', '2026-01-01T00:00:00') in exported
+
+        rows, _ = export(fake_redis, legacy=False)
+        assert rows == 1
+
+    def test_totals_are_not_exported(self, fake_redis):
+        prompt_app.record_feedback('p1', 'u1', 4, {'book': 'Welsh', 'exerciseType': 'creative'})
+        rows, _ = export(fake_redis)
+        assert rows == 1
+
+    def test_gzip_output(self, fake_redis, tmp_path):
+        prompt_app.record_feedback('p1', 'u1', 4, {})
+        path = str(tmp_path / 'ratings.csv.gz')
+        with export_feedback.open_output(path) as out:
+            writer = csv.writer(out)
+            writer.writerow(export_feedback.COLUMNS)
+            export_feedback.export_ratings(fake_redis, writer, prompt_app.feedback_ratings_key(''))
+        with gzip.open(path, 'rt') as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == list(export_feedback.COLUMNS)
+        assert rows[1][:3] == ['p1', 'u1', '4']
+
+    def test_parquet_output(self, fake_redis, tmp_path):
+        parquet = pytest.importorskip('pyarrow.parquet')
+        for n in range(3):
+            prompt_app.record_feedback('p1', f'u{n}', n + 1, {})
+        path = str(tmp_path / 'ratings.parquet')
+        with export_feedback.open_writer(path) as writer:
+            export_feedback.export_ratings(fake_redis, writer, prompt_app.feedback_ratings_key(''))
+        table = parquet.read_table(path)
+        assert table.column_names == list(export_feedback.COLUMNS)
+        assert sorted(table.column('rating').to_pylist()) == [1, 2, 3]
+
+    def test_does_not_import_the_service(self):
+        """The script only needs the shared Redis settings, not the Flask app."""
+        code = 'import sys, export_feedback; sys.exit("app" in sys.modules)'
+        service_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        assert subprocess.run([sys.executable, '-c', code], cwd=service_dir).returncode == 0
@@ -0,0 +1,190 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+import app as prompt_app
+
+
+RATING = {'promptId': 'p1', 'rating': 4, 'userId': 'u1', 'artist': 'Noisia'}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_buffer(fake_redis):
+    """Build FeedbackBuffers that are closed after the test."""
+    buffers = []
+
+    def make(max_events=100, batch_size=100, interval=60):
+        buffer = prompt_app.FeedbackBuffer(max_events, batch_size, interval)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.close()
+
+
+def stored(fake_redis, prompt_id='p1'):
+    return fake_redis.hlen(prompt_app.feedback_ratings_key(prompt_id))
+
+
+class TestFeedbackBuffer:
+    """Test write-behind batching of ratings."""
+
+    def test_endpoint_queues_the_rating(self, client, fake_redis, make_buffer):
+        buffer = make_buffer()
+        with patch.object(prompt_app, 'feedback_buffer', buffer):
+            response = client.post('/feedback', json=RATING)
+
+            assert response.status_code == 202
+            assert buffer.depth() == 1
+            assert stored(fake_redis) == 0
+
+            buffer.flush()
+        assert buffer.depth() == 0
+        assert stored(fake_redis) == 1
+        assert fake_redis.hget(prompt_app.feedback_totals_key('artist', 'Noisia'), 'count') == b'1'
+
+    def test_full_batch_flushes_immediately(self, fake_redis, make_buffer):
+        buffer = make_buffer(batch_size=2)
+        buffer.put('p1', 'u1', 5, {})
+        buffer.put('p1', 'u2', 3, {})
+        wait_for(lambda: stored(fake_redis) == 2)
+
+    def test_partial_batch_flushes_on_interval(self, fake_redis, make_buffer):
+        buffer = make_buffer(interval=0.05)
+        buffer.put('p1', 'u1', 5, {})
+        wait_for(lambda: stored(fake_redis) == 1)
+
+    def test_batches_are_pipelined(self, fake_redis, make_buffer):
+        """Each batch reads the stored records in one pipeline and writes in another."""
+        buffer = make_buffer(batch_size=3)
+        for user in range(7):
+            buffer._queue.put(('p1', f'u{user}', 4, {}))
+        with patch.object(fake_redis, 'pipeline', wraps=fake_redis.pipeline) as pipeline:
+            buffer.flush()
+        assert pipeline.call_count == 6
+        assert stored(fake_redis) == 7
+
+    def test_close_flushes_what_is_queued(self, fake_redis, make_buffer):
+        buffer = make_buffer()
+        buffer.put('p1', 'u1', 2, {})
+        buffer.close()
+        assert stored(fake_redis) == 1
+        assert not buffer._thread.is_alive()
+
+    def test_backpressure_when_full(self, fake_redis, make_buffer):
+        buffer = make_buffer(max_events=1)
+        buffer.put('p1', 'u1', 2, {})
+        with pytest.raises(prompt_app.FeedbackBufferFull):
+            buffer.put('p1', 'u2', 2, {}, timeout=0.01)
+
+    def test_endpoint_rejects_when_full(self, client, fake_redis, make_buffer):
+        buffer = make_buffer(max_events=1)
+        with patch.object(prompt_app, 'feedback_buffer', buffer), \
+             patch.object(prompt_app, 'FEEDBACK_ENQUEUE_TIMEOUT', 0.01):
+            assert client.post('/feedback', json=RATING).status_code == 202
+            response = client.post('/feedback', json=RATING)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert 'error' in json.loads(response.data)
+
+    def test_failed_batch_is_retried_then_dropped(self, fake_redis, make_buffer):
+        buffer = make_buffer()
+        buffer._queue.put(('p1', 'u1', 2, {}))
+        dropped = sample('prompt_service_feedback_events_total', outcome='dropped')
+        with patch.object(prompt_app, 'FEEDBACK_FLUSH_RETRIES', 1), \
+             patch.object(prompt_app.time, 'sleep'), \
+             patch.object(fake_redis, 'pipeline', side_effect=ConnectionError('down')) as pipeline:
+            buffer.flush()
+        assert pipeline.call_count == 2
+        assert sample('prompt_service_feedback_events_total', outcome='dropped') == dropped + 1
+
+    def test_retry_after_a_lost_reply_is_not_reapplied(self, fake_redis, make_buffer):
+        buffer = make_buffer()
+        buffer._queue.put(('p1', 'u1', 2, {'artist': 'Noisia'}))
+        buffer._queue.put(('p1', 'u2', 4, {'artist': 'Noisia'}))
+        original = fake_redis.pipeline
+        attempts = []
+
+        def losing_first_reply(*args, transaction=True, **kwargs):
+            pipe = original(*args, transaction=transaction, **kwargs)
+            if not transaction:
+                return pipe  # reading the stored records
+            attempts.append(pipe)
+            execute = pipe.execute
+
+            def execute_then_fail(*args, **kwargs):
+                results = execute(*args, **kwargs)
+                if len(attempts) == 1:
+                    raise ConnectionError('connection reset after EXEC')
+                return results
+            pipe.execute = execute_then_fail
+            return pipe
+
+        # Records name the attempt that wrote them
+        def record(rating, dimensions):
+            return f'{rating}:{len(attempts)}'
+
+        with patch.object(prompt_app.time, 'sleep'), \
+             patch.object(prompt_app, 'feedback_record', side_effect=record), \
+             patch.object(fake_redis, 'pipeline', side_effect=losing_first_reply):
+            buffer.flush()
+
+        assert len(attempts) == 2
+        assert fake_redis.hgetall(prompt_app.feedback_ratings_key('p1')) == {b'u1': b'2:1', b'u2': b'4:1'}
+        totals = fake_redis.hgetall(prompt_app.feedback_totals_key('artist', 'Noisia'))
+        assert totals[b'count'] == b'2'
+        assert totals[b'sum'] == b'6'
+
+    def test_rating_changed_after_the_read_is_applied_again(self, fake_redis, make_buffer):
+        """A record another writer replaces between the read and the write is re-read, not double-counted."""
+        buffer = make_buffer()
+        prompt_app.record_feedback('p1', 'u1', 1, {'artist': 'Noisia'})
+        buffer._queue.put(('p1', 'u1', 5, {'book': 'Dune'}))
+        read = prompt_app.read_feedback_records
+
+        def read_then_rerate(ratings):
+            records = read(ratings)
+            prompt_app.record_feedback('p1', 'u1', 3, {'artist': 'Noisia'})
+            return records
+
+        with patch.object(prompt_app, 'read_feedback_records', side_effect=read_then_rerate):
+            buffer.flush()
+
+        assert fake_redis.hget(prompt_app.feedback_ratings_key('p1'), 'u1').startswith(b'5:')
+        assert fake_redis.hget(prompt_app.feedback_totals_key('promptId', 'p1'), 'count') == b'1'
+        assert fake_redis.hget(prompt_app.feedback_totals_key('promptId', 'p1'), 'sum') == b'5'
+        assert fake_redis.hget(prompt_app.feedback_totals_key('artist', 'Noisia'), 'count') == b'0'
+        assert fake_redis.hget(prompt_app.feedback_totals_key('book', 'Dune'), 'count') == b'1'
+
+    def test_latest_rating_in_a_batch_wins(self, fake_redis, make_buffer):
+        buffer = make_buffer()
+        buffer._queue.put(('p1', 'u1', 1, {'artist': 'Noisia'}))
+        buffer._queue.put(('p1', 'u1', 4, {'book': 'Dune'}))
+        buffer.flush()
+        assert fake_redis.hget(prompt_app.feedback_totals_key('promptId', 'p1'), 'sum') == b'4'
+        assert not fake_redis.exists(prompt_app.feedback_totals_key('artist', 'Noisia'))
+
+    def test_metrics(self, fake_redis, make_buffer):
+        buffer = make_buffer()
+        flushes = sample('prompt_service_feedback_flush_duration_seconds_count')
+        depth = sample('prompt_service_feedback_buffer_depth')
+        buffer.put('p1', 'u1', 2, {})
+        assert sample('prompt_service_feedback_buffer_depth') == depth + 1
+        buffer.flush()
+        assert sample('prompt_service_feedback_buffer_depth') == depth
+        assert sample('prompt_service_feedback_flush_duration_seconds_count') == flushes + 1
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import app as prompt_app
+
+
+def rate(client, rating, prompt_id='p1', user_id='u1', **dimensions):
+    response = client.post('/feedback', json={'promptId': prompt_id, 'rating': rating, 'userId': user_id, **dimensions})
+    prompt_app.feedback_buffer.flush()
+    return response
+
+
+def summary(client, query):
+    response = client.get(f'/feedback/summary?{query}')
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+class TestFeedbackStorage:
+    """Test per-prompt rating hashes and the totals folded in on write."""
+
+    def test_rating_is_stored_in_the_prompt_hash(self, client, fake_redis):
+        assert rate(client, 4).status_code == 202
+        record = fake_redis.hget(prompt_app.feedback_ratings_key('p1'), 'u1').decode()
+        assert record.split(':')[0] == '4'
+        assert 0 < fake_redis.ttl(prompt_app.feedback_ratings_key('p1')) <= prompt_app.FEEDBACK_TTL
+
+    def test_totals_per_dimension(self, client, fake_redis):
+        rate(client, 5, user_id='a', artist='Noisia', exerciseType='technical')
+        rate(client, 2, user_id='b', artist='Noisia', exerciseType='technical')
+        rate(client, 4, prompt_id='p2', user_id='a', book='Dune', exerciseType='creative')
+
+        data = summary(client, 'promptId=p1&artist=Noisia&exerciseType=technical&exerciseType=creative')
+
+        assert data['promptId']['p1'] == {'count': 2, 'average': 3.5,
+                                          'distribution': {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1}}
+        assert data['artist']['Noisia']['count'] == 2
+        assert data['exerciseType']['technical']['average'] == 3.5
+        assert data['exerciseType']['creative']['average'] == 4.0
+        assert 'book' not in data
+
+    def test_rerating_replaces_the_previous_rating(self, client, fake_redis):
+        rate(client, 1, artist='Noisia')
+        rate(client, 5, artist='Noisia')
+
+        data = summary(client, 'promptId=p1&artist=Noisia')
+
+        for totals in (data['promptId']['p1'], data['artist']['Noisia']):
+            assert totals['count'] == 1
+            assert totals['average'] == 5.0
+            assert totals['distribution']['1'] == 0
+
+    def test_rerating_with_changed_dimensions(self, client, fake_redis):
+        rate(client, 5)
+        rate(client, 2, artist='Noisia')
+        rate(client, 3, book='Dune')
+
+        data = summary(client, 'promptId=p1&artist=Noisia&book=Dune')
+
+        assert data['promptId']['p1'] == {'count': 1, 'average': 3.0,
+                                          'distribution': {'1': 0, '2': 0, '3': 1, '4': 0, '5': 0}}
+        assert data['artist']['Noisia'] == {'count': 0, 'average': None, 'distribution': dict.fromkeys('12345', 0)}
+        assert data['book']['Dune']['count'] == 1
+
+    def test_totals_expire(self, client, fake_redis):
+        rate(client, 4, artist='Noisia')
+        ttl = fake_redis.ttl(prompt_app.feedback_totals_key('artist', 'Noisia'))
+        assert 0 < ttl <= prompt_app.FEEDBACK_TOTALS_TTL
+
+    def test_unrated_values(self, client, fake_redis):
+        data = summary(client, 'artist=Nobody')
+        assert data['artist']['Nobody'] == {'count': 0, 'average': None,
+                                            'distribution': dict.fromkeys('12345', 0)}
+
+    def test_summary_is_one_round_trip(self, client, fake_redis):
+        rate(client, 3, artist='Noisia')
+        pipelines = []
+        original = fake_redis.pipeline
+
+        def counting_pipeline(*args, **kwargs):
+            pipelines.append(1)
+            return original(*args, **kwargs)
+
+        fake_redis.pipeline = counting_pipeline
+        summary(client, 'promptId=p1&artist=Noisia&book=x&exerciseType=y')
+        assert len(pipelines) == 1
+
+
+class TestFeedbackValidation:
+    """Test rejected feedback submissions."""
+
+    @pytest.mark.parametrize('rating', [0, 6, 3.5, '4', True, None])
+    def test_invalid_rating(self, client, fake_redis, rating):
+        assert rate(client, rating).status_code == 400
+
+    def test_missing_prompt_id(self, client, fake_redis):
+        response = client.post('/feedback', json={'rating': 3})
+        assert response.status_code == 400
+
+    def test_invalid_dimension(self, client, fake_redis):
+        assert rate(client, 3, artist=['Noisia']).status_code == 400
+        assert rate(client, 3, exerciseType='x' * 201).status_code == 400
+        assert rate(client, 3, exerciseType='technical\nartist:Noisia').status_code == 400
+        assert rate(client, 3, prompt_id=42).status_code == 400
+
+    def test_unknown_catalog_values(self, client, fake_redis):
+        assert rate(client, 3, artist='Not An Artist').status_code == 400
+        assert rate(client, 3, book='Unwritten').status_code == 400
+        assert fake_redis.keys('feedback:totals:*') == []
+
+    def test_summary_needs_a_query(self, client):
+        assert client.get('/feedback/summary').status_code == 400
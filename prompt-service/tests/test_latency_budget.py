@@ -0,0 +1,149 @@
+import concurrent.futures
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+import app as prompt_app
+
+
+CHORD_CONTENT = "Progression: Dm7 - G7 - Cmaj7\nA gentle ii-V-I."
+WRITING_CONTENT = "**Layered Omens**\n**Exercise**: Write ten one-line premises."
+
+
+def completion(content, delay=0.0):
+    def create(**kwargs):
+        time.sleep(delay)
+        return {'choices': [{'message': {'content': content}}]}
+    return create
+
+
+def budgets(**overrides):
+    values = {'writing': 0, 'sound-design': 0, 'drawing': 0, 'chord': 0}
+    values.update({key.replace('_', '-'): value for key, value in overrides.items()})
+    return patch.object(prompt_app, 'LATENCY_BUDGETS', values)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'late AI result never arrived'
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def one_worker():
+    """A budget pool with one worker and no queue"""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    with patch.object(prompt_app, '_budget_executor', executor), \
+         patch.object(prompt_app, '_budget_slots', threading.BoundedSemaphore(1)):
+        yield executor
+    executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def ai_enabled(fake_redis):
+    with patch.object(prompt_app, 'USE_AI', True), \
+         patch.object(prompt_app, 'PREGEN_ENABLED', False):
+        yield fake_redis
+
+
+class TestLatencyBudget:
+    """Test racing AI generation against templates under a latency budget."""
+
+    def post_chord(self, client):
+        response = client.post('/generate-chord-progression', json={'emotions': ['Serenity']})
+        assert response.status_code == 200
+        return json.loads(response.data)
+
+    def test_ai_within_budget_is_returned(self, client, ai_enabled):
+        with budgets(chord=1.0), patch('openai.ChatCompletion.create', side_effect=completion(CHORD_CONTENT)):
+            assert self.post_chord(client)['progression'] == 'Dm7 - G7 - Cmaj7'
+
+    def test_late_ai_result_refills_the_pool(self, client, ai_enabled):
+        pool = prompt_app.pregen_key('chord', ('Serenity',))
+        with budgets(chord=0.1), \
+             patch('openai.ChatCompletion.create', side_effect=completion(CHORD_CONTENT, 0.4)) as create:
+            started = time.monotonic()
+            first = self.post_chord(client)
+            assert time.monotonic() - started < 0.35
+            assert first['progression'] != 'Dm7 - G7 - Cmaj7'
+
+            wait_for(lambda: ai_enabled.llen(pool) == 1)
+            second = self.post_chord(client)
+
+        assert second['progression'] == 'Dm7 - G7 - Cmaj7'
+        assert create.call_count == 1
+        assert ai_enabled.llen(pool) == 0
+
+    def test_ai_failure_within_budget_falls_back(self, client, ai_enabled):
+        with budgets(drawing=1.0), patch('openai.ChatCompletion.create', side_effect=RuntimeError('down')):
+            response = client.post('/generate-drawing-exercise', json={'skills': ['Gesture']})
+        assert response.status_code == 200
+        assert json.loads(response.data)['ai_generated'] is False
+        assert ai_enabled.llen(prompt_app.pregen_key('drawing', ('Gesture',))) == 0
+
+    def test_late_writing_prompt_replaces_the_cached_template(self, client, ai_enabled):
+        with budgets(writing=0.1), \
+             patch('openai.ChatCompletion.create', side_effect=completion(WRITING_CONTENT, 0.3)):
+            first = json.loads(client.post('/generate', json={'genres': ['Poetry']}).data)
+            assert 'ai_generated' not in first
+
+            cache_key = prompt_app.prompt_cache_key(['Poetry'])
+            wait_for(lambda: b'Layered Omens' in (ai_enabled.hget(cache_key, 'prompt') or b''))
+            second = json.loads(client.post('/generate', json={'genres': ['Poetry']}).data)
+
+        assert second['title'] == 'Layered Omens'
+
+    def test_sound_design_budget(self, client, ai_enabled):
+        with budgets(sound_design=0.05), \
+             patch('openai.ChatCompletion.create', side_effect=completion('# Late Patch\nBuild it slowly.', 0.2)):
+            response = client.post('/generate-sound-design', json={'synthesizer': 'Vital', 'genre': 'house'})
+            assert response.status_code == 200
+            pool = prompt_app.pregen_key('sound-design', ('Vital', 'technical', 'house'))
+            wait_for(lambda: ai_enabled.llen(pool) == 1)
+        assert json.loads(ai_enabled.lpop(pool))['title'] == 'Late Patch'
+        assert json.loads(response.data)['title'] == 'Vital - Technical Exercise'
+
+    def test_request_deadline_reaches_the_ai_call(self, client, ai_enabled):
+        deadline = {'X-Request-Deadline': str(int((time.time() + 0.5) * 1000))}
+        with budgets(chord=1.0), \
+             patch('openai.ChatCompletion.create', side_effect=completion(CHORD_CONTENT)) as create:
+            response = client.post('/generate-chord-progression', json={'emotions': ['Serenity']}, headers=deadline)
+        assert response.status_code == 200
+        assert create.call_args.kwargs['request_timeout'] <= 0.5
+
+    def test_full_pool_falls_back_without_queueing(self, client, ai_enabled, one_worker):
+        release = threading.Event()
+        busy = one_worker.submit(release.wait)
+        prompt_app._budget_slots.acquire()
+        try:
+            with budgets(chord=1.0), patch('openai.ChatCompletion.create') as create:
+                started = time.monotonic()
+                progression = self.post_chord(client)['progression']
+            assert time.monotonic() - started < 0.5
+            assert progression != 'Dm7 - G7 - Cmaj7'
+            assert create.call_count == 0
+        finally:
+            prompt_app._budget_slots.release()
+            release.set()
+            busy.result()
+
+    def test_queued_generation_that_misses_the_budget_is_cancelled(self, client, ai_enabled, one_worker):
+        release = threading.Event()
+        busy = one_worker.submit(release.wait)
+        with budgets(chord=0.05), patch.object(prompt_app, '_budget_slots', threading.BoundedSemaphore(2)), \
+             patch('openai.ChatCompletion.create', side_effect=completion(CHORD_CONTENT)) as create:
+            self.post_chord(client)
+            release.set()
+            busy.result()
+            one_worker.submit(lambda: None).result()
+            assert create.call_count == 0
+            assert prompt_app._budget_slots.acquire(blocking=False)
+            assert prompt_app._budget_slots.acquire(blocking=False)
+
+    def test_no_budget_keeps_pools_off(self, client, ai_enabled):
+        ai_enabled.rpush(prompt_app.pregen_key('chord', ('Serenity',)), json.dumps({'progression': 'stale'}))
+        with budgets(), patch('openai.ChatCompletion.create', side_effect=completion(CHORD_CONTENT)):
+            assert self.post_chord(client)['progression'] == 'Dm7 - G7 - Cmaj7'
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import openai
+from prometheus_client import REGISTRY
+import app as prompt_app
+
+
+CHORD_CONTENT = "Progression: Dm7 - G7 - Cmaj7\nA gentle ii-V-I."
+FEEDBACK_REQUEST = {'exercise': 'Write a scene', 'userWriting': 'Once upon a time', 'genres': ['Fantasy'],
+                    'exerciseType': 'Scene', 'difficulty': 'Easy', 'wordCount': 250}
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def stage_count(stage, endpoint, model=''):
+    return sample('prompt_service_stage_duration_seconds_count', stage=stage, endpoint=endpoint, model=model)
+
+
+class TestMetrics:
+    """Test the Prometheus metrics exposed at /metrics."""
+
+    def test_scrape_endpoint(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert b'prompt_service_stage_duration_seconds' in response.data
+
+    def test_ai_chord_progression_stages(self, client, fake_redis):
+        endpoint = '/generate-chord-progression'
+        stages = ['openai', 'extract', 'chord_parse', 'midi_render']
+        before = {stage: stage_count(stage, endpoint, 'gpt-3.5-turbo' if stage == 'openai' else '')
+                  for stage in stages}
+        requests_before = sample('prompt_service_request_duration_seconds_count',
+                                 endpoint=endpoint, fallback_reason='none')
+        prompt_app.midi_cache.clear()
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create',
+                   return_value={'choices': [{'message': {'content': CHORD_CONTENT}}]}):
+            response = client.post(endpoint, json={'emotions': ['Awe']})
+
+        assert response.status_code == 200
+        for stage in stages:
+            model = 'gpt-3.5-turbo' if stage == 'openai' else ''
+            assert stage_count(stage, endpoint, model) > before[stage], stage
+        assert sample('prompt_service_request_duration_seconds_count',
+                      endpoint=endpoint, fallback_reason='none') == requests_before + 1
+
+    def test_fallbacks_are_counted_by_reason(self, client):
+        endpoint = '/generate-writing-feedback'
+        fallbacks_before = sample('prompt_service_template_fallbacks_total', endpoint=endpoint, reason='timeout')
+        requests_before = sample('prompt_service_request_duration_seconds_count',
+                                 endpoint=endpoint, fallback_reason='timeout')
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=openai.error.Timeout('timed out')):
+            response = client.post(endpoint, json=FEEDBACK_REQUEST)
+
+        assert response.status_code == 200
+        assert sample('prompt_service_template_fallbacks_total',
+                      endpoint=endpoint, reason='timeout') == fallbacks_before + 1
+        assert sample('prompt_service_request_duration_seconds_count',
+                      endpoint=endpoint, fallback_reason='timeout') == requests_before + 1
+
+    def test_fallback_reasons(self):
+        assert prompt_app.fallback_reason(prompt_app.CircuitOpenError()) == 'circuit_open'
+        assert prompt_app.fallback_reason(prompt_app.ConcurrencyLimitExceeded()) == 'concurrency_limit'
+        assert prompt_app.fallback_reason(prompt_app.DeadlineExceeded()) == 'deadline'
+        assert prompt_app.fallback_reason(openai.error.RateLimitError('slow down')) == 'rate_limited'
+        assert prompt_app.fallback_reason(openai.error.APIError('down')) == 'openai_error'
+        assert prompt_app.fallback_reason(ValueError('Sanitized content is invalid')) == 'invalid_output'
+        assert prompt_app.fallback_reason(RuntimeError()) == 'error'
+
+    def test_sanitizer_rejections(self):
+        before = sample('prompt_service_sanitizer_rejections_total', reason='word_salad')
+        salad = ' '.join(['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo', 'Foxtrot', 'Golf', 'Hotel',
+                          'India', 'Juliet', 'Kilo', 'Lima', 'Mike', 'November', 'Oscar', 'Papa', 'Quebec'])
+        assert prompt_app.sanitize_ai_content(f"a line of {salad}") is None
+        assert sample('prompt_service_sanitizer_rejections_total', reason='word_salad') == before + 1
+
+    def test_cache_lookups(self, fake_redis):
+        before = sample('prompt_service_cache_lookups_total', cache='prompt', result='miss')
+        assert prompt_app.get_cached_prompt(prompt_app.prompt_cache_key(['Mystery'])) is None
+        assert sample('prompt_service_cache_lookups_total', cache='prompt', result='miss') == before + 1
+
+        prompt_app.cache_prompt(prompt_app.prompt_cache_key(['Mystery']), {'title': 'Cached'})
+        hits = sample('prompt_service_cache_lookups_total', cache='prompt', result='hit')
+        assert prompt_app.get_cached_prompt(prompt_app.prompt_cache_key(['Mystery'])) == {'title': 'Cached'}
+        assert sample('prompt_service_cache_lookups_total', cache='prompt', result='hit') == hits + 1
@@ -0,0 +1,141 @@
+import base64
+import json
+import pytest
+from unittest.mock import patch
+
+import app as prompt_app
+
+
+@pytest.fixture
+def midi_cache(fake_redis):
+    """A fresh render cache backed by fakeredis."""
+    cache = prompt_app.MidiRenderCache(4)
+    with patch.object(prompt_app, 'midi_cache', cache):
+        yield cache
+
+
+class TestMidiRenderCache:
+    """Test the content-addressed cache of rendered chord progression MIDI."""
+
+    def test_repeat_render_is_a_local_hit(self, midi_cache):
+        """The same progression is rendered once and returns identical bytes."""
+        with patch.object(prompt_app, 'create_midi_file', wraps=prompt_app.create_midi_file) as render:
+            first = midi_cache.render('Am - F - C - G')
+            second = midi_cache.render('Am - F - C - G')
+
+        assert first == second
+        assert render.call_count == 1
+        assert first[1] == prompt_app.create_midi_file(prompt_app.parse_chord_progression('Am - F - C - G'))
+        assert base64.b64decode(first[2]) == first[1]
+        assert midi_cache.stats()['hits'] == 1
+        assert midi_cache.stats()['misses'] == 1
+
+    def test_key_includes_tempo_and_duration(self):
+        """Tempo and chord length are part of the content address."""
+        base = prompt_app.midi_id('Am - F - C - G')
+        assert prompt_app.midi_id('Am - F - C - G', 80, 4) == base
+        assert prompt_app.midi_id('Am - F - C - G', 90) != base
+        assert prompt_app.midi_id('Am - F - C - G', 80, 2.0) != base
+        assert prompt_app.midi_id('Am - F - C - Em') != base
+
+    def test_least_recently_used_entry_is_evicted(self, midi_cache):
+        """The cache never holds more than max_entries renders."""
+        with patch.object(prompt_app, 'MIDI_CACHE_REDIS_TTL', 0):
+            for root in ['A', 'B', 'C', 'D']:
+                midi_cache.render(f'{root} - {root}m')
+            midi_cache.render('A - Am')  # refresh A so B is the oldest
+            midi_cache.render('E - Em')
+            midi_cache.render('B - Bm')
+
+        stats = midi_cache.stats()
+        assert stats['entries'] == 4
+        assert stats['hits'] == 1
+        assert stats['misses'] == 6
+
+    def test_other_workers_reuse_redis_copy(self, midi_cache, fake_redis):
+        """A second process-local cache picks the bytes up from Redis instead of rendering."""
+        key, midi_bytes, _ = midi_cache.render('Dm7 - G7 - Cmaj7')
+        assert fake_redis.get(prompt_app.midi_redis_key(key)) == midi_bytes
+
+        other_worker = prompt_app.MidiRenderCache(4)
+        with patch.object(prompt_app, 'create_midi_file') as render:
+            assert other_worker.render('Dm7 - G7 - Cmaj7')[1] == midi_bytes
+        render.assert_not_called()
+        assert other_worker.stats()['redisHits'] == 1
+
+    def test_redis_failure_falls_back_to_rendering(self, midi_cache, fake_redis):
+        """A Redis outage only costs the shared tier."""
+        with patch.object(fake_redis, 'get', side_effect=ConnectionError('down')), \
+             patch.object(fake_redis, 'set', side_effect=ConnectionError('down')):
+            _, midi_bytes, _ = midi_cache.render('Am - F - C - G')
+        assert midi_bytes.startswith(b'MThd')
+
+    def test_chord_progression_endpoint_reuses_render(self, client, midi_cache):
+        """Template progressions for the same emotion hit the cache."""
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'pregen_pop', return_value=None):
+            for _ in range(3):
+                response = client.post('/generate-chord-progression', json={'emotions': ['Melancholy']})
+                assert response.status_code == 200
+
+        stats = json.loads(client.get('/cache/midi/stats').data)
+        assert stats['misses'] == 1
+        assert stats['hits'] == 2
+
+
+class TestMidiDownload:
+    """Test the /midi/<id> download endpoint and the embedMidi switch."""
+
+    def generate(self, client, **body):
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'pregen_pop', return_value=None):
+            response = client.post('/generate-chord-progression', json={'emotions': ['Melancholy'], **body})
+        assert response.status_code == 200
+        return json.loads(response.data)
+
+    def test_embedded_mode_is_the_default(self, client, midi_cache):
+        """Existing clients still get the base64 file, now alongside its id."""
+        result = self.generate(client)
+        assert base64.b64decode(result['midiFile']) == midi_cache.lookup(result['midiId'])
+
+    def test_id_mode_drops_the_base64_payload(self, client, midi_cache):
+        result = self.generate(client, embedMidi=False)
+        assert 'midiFile' not in result
+
+        response = client.get(f"/midi/{result['midiId']}")
+        assert response.status_code == 200
+        assert response.mimetype == 'audio/midi'
+        assert response.data.startswith(b'MThd')
+        assert response.headers['ETag'] == f'"{result["midiId"]}"'
+        assert 'immutable' in response.headers['Cache-Control']
+
+    def test_repeat_download_is_not_modified(self, client, midi_cache):
+        midi_key = self.generate(client, embedMidi=False)['midiId']
+        response = client.get(f'/midi/{midi_key}', headers={'If-None-Match': f'"{midi_key}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_download_falls_back_to_redis_copy(self, client, midi_cache, fake_redis):
+        """A worker that never rendered the file serves it from the shared tier."""
+        midi_key, midi_bytes, _ = prompt_app.MidiRenderCache(4).render('Dm7 - G7 - Cmaj7')
+        response = client.get(f'/midi/{midi_key}')
+        assert response.status_code == 200
+        assert response.data == midi_bytes
+
+    def test_expired_id_is_rendered_again_from_its_progression(self, client, midi_cache, fake_redis):
+        result = self.generate(client, embedMidi=False)
+        midi_cache.clear()
+        fake_redis.flushall()
+        assert client.get(f"/midi/{result['midiId']}").status_code == 404
+
+        response = client.get(f"/midi/{result['midiId']}", query_string={'progression': result['progression']})
+        assert response.status_code == 200
+        assert response.data.startswith(b'MThd')
+
+    def test_progression_must_match_the_id(self, client, midi_cache):
+        response = client.get('/midi/' + '0' * 32, query_string={'progression': 'Am - F - C - G'})
+        assert response.status_code == 404
+
+    def test_unknown_and_malformed_ids(self, client, midi_cache):
+        assert client.get('/midi/' + '0' * 32).status_code == 404
+        assert client.get('/midi/not-an-id').status_code == 400
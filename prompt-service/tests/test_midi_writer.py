@@ -0,0 +1,70 @@
+import io
+import random
+import pytest
+from midiutil import MIDIFile
+
+from app import create_midi_file, parse_chord_progression, _midi_varlen
+
+# A - F - C - G triads at 80 BPM, four beats per chord, as written by midiutil 1.2.1
+GOLDEN_CHORDS = [{'notes': [69, 73, 76]}, {'notes': [65, 69, 72]}, {'notes': [60, 64, 67]}, {'notes': [67, 71, 74]}]
+GOLDEN_A_F_C_G = bytes.fromhex(
+    '4d546864000000060001000203c0'
+    '4d54726b0000000b00ff51030b71b000ff2f00'
+    '4d54726b0000007d00ff031143686f72642050726f6772657373696f6e'
+    '009045640090496400904c649e008045640080496400804c64'
+    '0090416400904564009048649e008041640080456400804864'
+    '00903c6400904064009043649e00803c640080406400804364'
+    '009043640090476400904a649e008043640080476400804a64'
+    '00ff2f00'
+)
+
+
+def midiutil_file(chord_progression, tempo=80, duration_per_chord=4.0):
+    """The original midiutil-based implementation of create_midi_file"""
+    midi = MIDIFile(1)
+    time = 0
+    midi.addTrackName(0, time, "Chord Progression")
+    midi.addTempo(0, time, tempo)
+    for chord in chord_progression:
+        for note in chord['notes']:
+            midi.addNote(0, 0, note, time, duration_per_chord, 100)
+        time += duration_per_chord
+    buffer = io.BytesIO()
+    midi.writeFile(buffer)
+    return buffer.getvalue()
+
+
+class TestMidiWriter:
+    """Test the native Standard MIDI File writer against midiutil's output."""
+
+    def test_golden_bytes(self):
+        assert create_midi_file(GOLDEN_CHORDS) == GOLDEN_A_F_C_G
+
+    def test_matches_midiutil_for_random_progressions(self):
+        rng = random.Random(0)
+        qualities = ['', 'm', '7', 'maj7', 'm7', 'add9', 'sus4', 'dim', '9', 'power', 'unknown']
+        for _ in range(300):
+            text = ' - '.join(rng.choice('ABCDEFG') + rng.choice(['', '#', 'b']) + rng.choice(qualities)
+                              for _ in range(rng.randint(0, 10)))
+            chords = parse_chord_progression(text)
+            tempo = rng.choice([60, 80, 93, 140, 33.3])
+            duration = rng.choice([4.0, 2, 1.5, 1 / 3, 0.25])
+            assert create_midi_file(chords, tempo, duration) == midiutil_file(chords, tempo, duration), text
+
+    def test_duplicate_and_overlapping_notes_match_midiutil(self):
+        """Repeated pitches are de-duplicated, and one-tick overlaps from float
+        truncation are de-interleaved, exactly as midiutil does."""
+        chords = [{'notes': [60, 64, 60, 67]}] * 8
+        for duration in (4.3, 17.333333333333332, 0.4166666666666667):
+            assert create_midi_file(chords, 80, duration) == midiutil_file(chords, 80, duration)
+
+    def test_zero_length_chords_are_rejected(self):
+        with pytest.raises(ValueError):
+            create_midi_file(parse_chord_progression('C - G'), duration_per_chord=0)
+
+    def test_variable_length_quantities(self):
+        assert _midi_varlen(0) == b'\x00'
+        assert _midi_varlen(127) == b'\x7f'
+        assert _midi_varlen(128) == b'\x81\x00'
+        assert _midi_varlen(8192) == b'\xc0\x00'
+        assert _midi_varlen(16384) == b'\x81\x80\x00'
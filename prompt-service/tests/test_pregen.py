@@ -0,0 +1,113 @@
+import asyncio
+import json
+import pytest
+import fakeredis
+from unittest.mock import patch, AsyncMock
+
+import app as prompt_app
+
+
+def completion(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+CHORD_COMPLETION = completion("Progression: Am - F - C - G\nA falling minor line.")
+
+
+@pytest.fixture
+def shared_redis():
+    """Sync and per-event-loop async fakeredis clients backed by the same server."""
+    server = fakeredis.FakeServer()
+    sync_client = fakeredis.FakeRedis(server=server)
+    with patch.object(prompt_app, 'redis_client', sync_client), \
+         patch.object(prompt_app, 'get_async_redis', side_effect=lambda: fakeredis.aioredis.FakeRedis(server=server)), \
+         patch.object(prompt_app, 'PREGEN_ENABLED', True), \
+         patch.object(prompt_app, 'USE_AI', True):
+        yield sync_client
+
+
+class TestPregenPools:
+    """Test the background pre-generation pools."""
+
+    def test_combos_cover_every_parameter_choice(self):
+        """27 sound design, 28 drawing and 210 chord pools."""
+        combos = list(prompt_app.pregen_combos())
+        endpoints = [endpoint for endpoint, _ in combos]
+        assert endpoints.count('sound-design') == 27
+        assert endpoints.count('drawing') == 28
+        assert endpoints.count('chord') == 210
+        assert len(set(combos)) == len(combos)
+
+    def test_refill_tops_up_pools_below_low_water(self, shared_redis):
+        """A refill pass fills empty pools to the target and leaves full ones alone."""
+        combos = [('chord', ('Melancholy',)), ('chord', ('Awe', 'Elation'))]
+        with patch.object(prompt_app, 'pregen_combos', return_value=combos), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, return_value=CHORD_COMPLETION) as mock_acreate:
+            added = asyncio.run(prompt_app.refill_pregen_pools())
+            assert added == 2 * prompt_app.PREGEN_TARGET
+            assert asyncio.run(prompt_app.refill_pregen_pools()) == 0
+
+        assert mock_acreate.await_count == 2 * prompt_app.PREGEN_TARGET
+        for endpoint, params in combos:
+            key = prompt_app.pregen_key(endpoint, params)
+            assert shared_redis.llen(key) == prompt_app.PREGEN_TARGET
+            assert shared_redis.ttl(key) > 0
+            assert not shared_redis.exists(f'{key}:lock')
+
+    def test_refill_skips_pools_locked_by_another_worker(self, shared_redis):
+        """The SET NX lock keeps two workers from filling the same pool."""
+        combos = [('chord', ('Melancholy',))]
+        key = prompt_app.pregen_key('chord', ('Melancholy',))
+        shared_redis.set(f'{key}:lock', 'other-worker')
+        with patch.object(prompt_app, 'pregen_combos', return_value=combos), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, return_value=CHORD_COMPLETION) as mock_acreate:
+            assert asyncio.run(prompt_app.refill_pregen_pools()) == 0
+        mock_acreate.assert_not_awaited()
+
+    def test_refill_that_outlived_its_lock_leaves_the_next_holder_alone(self, shared_redis):
+        """A refill whose lock expired mid-generation doesn't release another worker's lock."""
+        combos = [('chord', ('Melancholy',))]
+        lock_key = f"{prompt_app.pregen_key('chord', ('Melancholy',))}:lock"
+
+        async def slow_completion(**kwargs):
+            # Our lock expired and another worker took it
+            shared_redis.set(lock_key, 'other-worker')
+            return CHORD_COMPLETION
+
+        with patch.object(prompt_app, 'pregen_combos', return_value=combos), \
+             patch('openai.ChatCompletion.acreate', side_effect=slow_completion):
+            asyncio.run(prompt_app.refill_pregen_pools())
+        assert shared_redis.get(lock_key) == b'other-worker'
+
+    def test_failed_generation_is_not_pooled(self, shared_redis):
+        """Template fallbacks never end up in a pool."""
+        combos = [('drawing', ('Gesture',))]
+        with patch.object(prompt_app, 'pregen_combos', return_value=combos), \
+             patch('openai.ChatCompletion.acreate', new_callable=AsyncMock, side_effect=Exception('rate limited')):
+            assert asyncio.run(prompt_app.refill_pregen_pools()) == 0
+        assert shared_redis.llen(prompt_app.pregen_key('drawing', ('Gesture',))) == 0
+
+    def test_handler_serves_from_pool_without_openai(self, client, shared_redis):
+        """A pooled exercise is returned without a live OpenAI call."""
+        pooled = {'title': 'Pooled', 'content': 'c', 'skills': ['Composition', 'Gesture'],
+                  'difficulty': 'Beginner', 'estimatedTime': '15 minutes', 'tips': [],
+                  'timestamp': '2000-01-01T00:00:00', 'ai_generated': True}
+        shared_redis.rpush(prompt_app.pregen_key('drawing', ('Composition', 'Gesture')), json.dumps(pooled))
+
+        with patch('openai.ChatCompletion.create') as mock_create:
+            response = client.post('/generate-drawing-exercise', json={'skills': ['Gesture', 'Composition']})
+
+        mock_create.assert_not_called()
+        data = json.loads(response.data)
+        assert data['title'] == 'Pooled'
+        assert data['skills'] == ['Gesture', 'Composition']
+        assert data['timestamp'] != pooled['timestamp']
+
+    def test_handler_falls_back_to_live_call_when_pool_empty(self, client, shared_redis):
+        """An empty pool means a normal OpenAI call."""
+        with patch('openai.ChatCompletion.create', return_value=CHORD_COMPLETION) as mock_create:
+            response = client.post('/generate-chord-progression', json={'emotions': ['Melancholy']})
+
+        assert response.status_code == 200
+        assert mock_create.call_count == 1
+        assert json.loads(response.data)['progression'] == 'Am - F - C - G'
@@ -0,0 +1,88 @@
+import pytest
+import json
+from unittest.mock import patch
+
+import app as prompt_app
+
+
+@pytest.fixture(autouse=True)
+def template_mode():
+    """Run against template generation so no OpenAI calls are made."""
+    with patch.object(prompt_app, 'USE_AI', False):
+        yield
+
+
+class TestPromptCache:
+    """Test the /generate response cache."""
+
+    def test_cache_key_ignores_genre_order_and_duplicates(self):
+        """The same genre set maps to one key regardless of order."""
+        assert prompt_app.prompt_cache_key(['Mystery', 'Fantasy']) == \
+            prompt_app.prompt_cache_key(['Fantasy', 'Mystery', 'Fantasy'])
+        assert prompt_app.prompt_cache_key(['Fantasy']) != prompt_app.prompt_cache_key(['Mystery'])
+
+    def test_second_request_is_served_from_cache(self, client, fake_redis):
+        """A repeated genre combo returns the cached prompt without generating."""
+        with patch.object(prompt_app, 'generate_prompt_from_template',
+                          wraps=prompt_app.generate_prompt_from_template) as generator:
+            first = client.post('/generate', json={'genres': ['Fantasy', 'Mystery']})
+            second = client.post('/generate', json={'genres': ['Mystery', 'Fantasy']})
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert json.loads(first.data) == json.loads(second.data)
+        assert generator.call_count == 1
+
+        stats = json.loads(client.get('/cache/stats').data)
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_entry_is_regenerated_after_max_serves(self, client, fake_redis):
+        """Each cached exercise is served to at most PROMPT_CACHE_MAX_SERVES users."""
+        with patch.object(prompt_app, 'PROMPT_CACHE_MAX_SERVES', 2), \
+             patch.object(prompt_app, 'generate_prompt_from_template',
+                          wraps=prompt_app.generate_prompt_from_template) as generator:
+            for _ in range(5):
+                assert client.post('/generate', json={'genres': ['Horror']}).status_code == 200
+
+        # Generated on requests 1, 3 and 5; served from cache on 2 and 4
+        assert generator.call_count == 3
+
+    def test_cache_disabled_with_zero_ttl(self, client, fake_redis):
+        """PROMPT_CACHE_TTL=0 turns the cache off."""
+        with patch.object(prompt_app, 'PROMPT_CACHE_TTL', 0), \
+             patch.object(prompt_app, 'generate_prompt_from_template',
+                          wraps=prompt_app.generate_prompt_from_template) as generator:
+            client.post('/generate', json={'genres': ['Horror']})
+            client.post('/generate', json={'genres': ['Horror']})
+
+        assert generator.call_count == 2
+        assert fake_redis.keys('prompt_cache:*') == []
+
+    def test_entries_expire_after_ttl(self, client, fake_redis):
+        """Cached entries carry the configured TTL."""
+        client.post('/generate', json={'genres': ['Romance']})
+        key = prompt_app.prompt_cache_key(['Romance'])
+        assert 0 < fake_redis.ttl(key) <= prompt_app.PROMPT_CACHE_TTL
+
+    def test_redis_outage_falls_through_to_generation(self, client):
+        """A Redis failure never blocks prompt generation."""
+        with patch.object(prompt_app.redis_client, 'evalsha', side_effect=ConnectionError('down')), \
+             patch.object(prompt_app.redis_client, 'pipeline', side_effect=ConnectionError('down')):
+            response = client.post('/generate', json={'genres': ['Fantasy']})
+        assert response.status_code == 200
+
+    def test_template_fallback_is_not_cached_as_ai_output(self, client, fake_redis):
+        """A fallback served during an OpenAI failure doesn't stick once OpenAI recovers."""
+        completion = {'choices': [{'message': {'content': "**Layered Omens**\n**Exercise**: Write ten premises."}}]}
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', side_effect=Exception('API Error')):
+            failed = client.post('/generate', json={'genres': ['Western']})
+            assert not fake_redis.exists(prompt_app.prompt_cache_key(['Western']))
+        assert json.loads(failed.data).get('ai_generated') is not True
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=completion) as create:
+            recovered = client.post('/generate', json={'genres': ['Western']})
+        assert create.call_count == 1
+        assert json.loads(recovered.data)['ai_generated'] is True
@@ -0,0 +1,53 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import app as prompt_app
+
+POOL = [f'Artist {i}' for i in range(40)]
+KEY = 'sound_design:artist_rotation_index:test'
+
+
+class TestRotation:
+    """Test the atomic Redis-side artist/book rotation."""
+
+    def test_cycle_visits_every_item_once(self, fake_redis):
+        """One full cycle is a permutation of the pool."""
+        picks = [prompt_app.next_rotation_pick(KEY, POOL) for _ in range(len(POOL))]
+        assert sorted(picks) == sorted(POOL)
+
+    def test_reshuffles_after_cycle(self, fake_redis):
+        """The next cycle starts over with a new order stored server-side."""
+        for _ in range(len(POOL)):
+            prompt_app.next_rotation_pick(KEY, POOL)
+        prompt_app.next_rotation_pick(KEY, POOL)
+        assert fake_redis.get(f'{KEY}:position') == b'1'
+        assert fake_redis.llen(f'{KEY}:order') == len(POOL)
+
+    def test_pool_size_change_restarts_rotation(self, fake_redis):
+        """Editing the pool starts a fresh cycle instead of indexing out of range."""
+        for _ in range(5):
+            prompt_app.next_rotation_pick(KEY, POOL)
+        smaller = POOL[:10]
+        picks = [prompt_app.next_rotation_pick(KEY, smaller) for _ in range(len(smaller))]
+        assert sorted(picks) == sorted(smaller)
+
+    def test_legacy_rotation_state_is_replaced(self, fake_redis):
+        """The pre-list JSON order is deleted and its position counter restarted."""
+        fake_redis.set(f'{KEY}:shuffled', '[3, 1, 2]')
+        fake_redis.set(f'{KEY}:position', 2)
+        assert prompt_app.next_rotation_pick(KEY, POOL) in POOL
+        assert not fake_redis.exists(f'{KEY}:shuffled')
+        assert fake_redis.get(f'{KEY}:position') == b'1'
+
+    def test_concurrent_picks_never_duplicate_within_a_cycle(self, fake_redis):
+        """Picks racing from many threads still see every item exactly once per cycle."""
+        cycles = 3
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            picks = list(pool.map(lambda _: prompt_app.next_rotation_pick(KEY, POOL), range(cycles * len(POOL))))
+
+        assert Counter(picks) == Counter({item: cycles for item in POOL})
+
+    def test_redis_failure_falls_back_to_random_choice(self, fake_redis):
+        """A broken Redis never blocks generation."""
+        fake_redis.connected = False
+        assert prompt_app.next_rotation_pick(KEY, POOL) in POOL
@@ -0,0 +1,87 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+
+import app as prompt_app
+from app import sanitize_ai_content
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'sanitizer_corpus.json')
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestSanitizeAIContent:
+    """Test corruption detection and cleanup in sanitize_ai_content."""
+
+    def test_clean_content_is_unchanged(self):
+        content = "**Exercise Name**: Layered Omens\n\n**Goal**: Practice generating ideas.\n- Tip one"
+        assert sanitize_ai_content(content) == content
+
+    def test_empty_content_is_rejected(self):
+        assert sanitize_ai_content('') is None
+        assert sanitize_ai_content(None) is None
+
+    def test_control_characters_are_removed(self):
+        assert sanitize_ai_content("Bass\x00 design\x1b\u200b\tnotes\r\n") == "Bass design\tnotes"
+
+    def test_corrupted_line_is_dropped(self):
+        content = "Design a growl bass.\n<div><span>innerHTML file://x</span></div>\nAutomate the filter."
+        assert sanitize_ai_content(content) == "Design a growl bass.\nAutomate the filter."
+
+    def test_suspicious_line_start_is_dropped(self):
+        content = "Keep this line.\n{@payload: stuff that looks like code}\nAnd this one."
+        assert sanitize_ai_content(content) == "Keep this line.\nAnd this one."
+
+    def test_escaped_bytes_and_blocks_are_stripped(self):
+        assert sanitize_ai_content("A warm pad \\\\x41with ░ texture \\\\u00e9here") == "A warm pad with  texture here"
+
+    def test_blank_line_runs_are_collapsed(self):
+        assert sanitize_ai_content("One\n\n\n\n\nTwo") == "One\n\nTwo"
+
+    def test_word_salad_is_rejected(self):
+        salad = ("This line has Quantum Velvet Harbor Signal Copper Lantern Echo Meridian Vector Prism "
+                 "words in a row and keeps going")
+        assert sanitize_ai_content(salad) is None
+
+    def test_synth_names_break_capitalized_runs(self):
+        line = ("Open Serum Then Route Phase Plant Into Vital With FM And LFO Shapes Before "
+                "you render the final sound")
+        assert sanitize_ai_content(line) == line
+
+    def test_headers_skip_the_word_salad_check(self):
+        header = "## The Quantum Velvet Harbor Signal Copper Lantern Echo Meridian Vector Prism Study Of Many Words"
+        assert sanitize_ai_content(header) == header
+
+    def test_mostly_unprintable_content_is_rejected(self):
+        assert sanitize_ai_content("ab" + "\u2028" * 60) is None
+
+
+class TestSanitizerCorpus:
+    """Golden outputs for the checked-in sanitizer corpus."""
+
+    def test_corpus_covers_every_category(self):
+        categories = {sample['category'] for sample in load_corpus()}
+        assert categories == {'clean', 'garbled', 'html', 'block', 'word_salad'}
+
+    def test_corpus_matches_expected_outputs(self):
+        mismatches = [sample['id'] for sample in load_corpus()
+                      if sanitize_ai_content(sample['input']) != sample['expected']]
+        assert mismatches == []
+
+    def test_clean_samples_pass_through(self):
+        for sample in load_corpus():
+            if sample['category'] == 'clean':
+                assert sample['expected'] == sample['input']
+
+    def test_sound_design_response_is_sanitized_once(self):
+        content = "Title: Neuro Growl\n\nLayer two oscillators.\n\n**Tips**:\n- Tip one\n- Tip two"
+        ai_request = {'synthesizer': 'Vital', 'exercise_type': 'technical'}
+        with patch.object(prompt_app, 'sanitize_ai_content', wraps=sanitize_ai_content) as mock_sanitize:
+            title, _, _ = prompt_app.parse_sound_design_response(content, ai_request)
+
+        assert mock_sanitize.call_count == 1
+        assert title == 'Title: Neuro Growl'
@@ -0,0 +1,117 @@
+import json
+from unittest.mock import patch
+
+import app as prompt_app
+
+
+def chunks(*texts):
+    """A streamed OpenAI completion delivering texts one delta at a time"""
+    return iter([{'choices': [{'delta': {'content': text}}]} for text in texts] +
+                [{'choices': [{'delta': {}}]}])
+
+
+def events(response):
+    """Parse an SSE body into (event, data) pairs"""
+    parsed = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            parsed.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return parsed
+
+
+FEEDBACK_REQUEST = {'exercise': 'Write a scene', 'userWriting': 'Once upon a time', 'genres': ['Fantasy'],
+                    'exerciseType': 'Scene', 'difficulty': 'Easy', 'wordCount': 250, 'stream': True}
+
+
+class TestSanitizeStream:
+    """Test line-by-line sanitization of streamed completions."""
+
+    def test_lines_are_reassembled_across_chunks(self):
+        lines = list(prompt_app.sanitize_ai_stream(['**What Wo', 'rks**\nYour open', 'ing line', '\n- Keep it']))
+        assert lines == ['**What Works**', 'Your opening line', '- Keep it']
+
+    def test_corrupted_lines_are_dropped(self):
+        garbled = '<div>{{@@}}</div><span>$(x)</span>'
+        lines = list(prompt_app.sanitize_ai_stream([f'Good start\n{garbled}\nStrong ending\n']))
+        assert lines == ['Good start', 'Strong ending']
+
+    def test_blank_runs_collapse_and_indentation_is_kept(self):
+        lines = list(prompt_app.sanitize_ai_stream(['\n\nIntro\n\n\n\n- Point\n  - Detail\n']))
+        assert lines == ['Intro', '', '- Point', '  - Detail']
+
+    def test_matches_document_sanitizer_on_clean_text(self):
+        text = '### Strengths\n\nGood work!\n\n### Areas for Improvement\n\nConsider adding more detail.'
+        streamed = '\n'.join(prompt_app.sanitize_ai_stream([text[i:i + 7] for i in range(0, len(text), 7)]))
+        assert streamed == prompt_app.sanitize_ai_content(text)
+
+
+class TestStreamingEndpoints:
+    """Test the opt-in SSE mode of the generator and feedback endpoints."""
+
+    def test_writing_feedback_streams_deltas_then_result(self, client):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=chunks('### Str', 'engths\nVivid ', 'opening.\n', 'Keep going.')) as create:
+            response = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST)
+
+        assert response.mimetype == 'text/event-stream'
+        assert create.call_args.kwargs['stream'] is True
+        assert events(response) == [
+            ('delta', {'text': '### Strengths\n'}),
+            ('delta', {'text': 'Vivid opening.\n'}),
+            ('delta', {'text': 'Keep going.\n'}),
+            ('result', {'feedback': '### Strengths\nVivid opening.\nKeep going.'}),
+        ]
+
+    def test_failed_stream_ends_with_template_result(self, client):
+        def broken_stream():
+            yield {'choices': [{'delta': {'content': 'Partial line\n'}}]}
+            raise ConnectionError('stream dropped')
+
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=broken_stream()):
+            parsed = events(client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST))
+
+        assert parsed[0] == ('delta', {'text': 'Partial line\n'})
+        event, data = parsed[-1]
+        assert event == 'result'
+        assert data['feedback'] == prompt_app.writing_feedback_template('Scene', 'Once upon a time', ['Fantasy'], 250)
+
+    def test_accept_header_opts_in(self, client):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=chunks('Clean lines and confident shading.')):
+            response = client.post('/generate-drawing-feedback',
+                                   json={'image': 'abc', 'skills': ['Shading'], 'exercise': 'Sphere'},
+                                   headers={'Accept': 'text/event-stream'})
+        assert events(response)[-1] == ('result', {'feedback': 'Clean lines and confident shading.'})
+
+    def test_json_is_still_the_default(self, client):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value={'choices': [{'message': {'content': 'Nice work.'}}]}):
+            response = client.post('/generate-writing-feedback', json={**FEEDBACK_REQUEST, 'stream': False})
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.data) == {'feedback': 'Nice work.'}
+
+    def test_sound_design_result_is_structured(self, client, fake_redis):
+        content = ('# Glassy Pluck\nStart from an init patch.\nOpen the filter slowly.\n\n'
+                   '**Tips**:\n- Automate the cutoff over eight bars\n- Layer a sine sub underneath it')
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch.object(prompt_app, 'pregen_pop', return_value=None), \
+             patch('openai.ChatCompletion.create', return_value=chunks(*[word + ' ' for word in content.split(' ')])):
+            parsed = events(client.post('/generate-sound-design', json={'synthesizer': 'Vital', 'stream': True}))
+
+        assert [event for event, _ in parsed].count('delta') == 7
+        event, result = parsed[-1]
+        assert event == 'result'
+        assert result['title'] == 'Glassy Pluck'
+        assert result['synthesizer'] == 'Vital'
+        assert result['tips'] == ['Automate the cutoff over eight bars', 'Layer a sine sub underneath it']
+
+    def test_ready_results_are_a_single_event(self, client, fake_redis):
+        """Template and pregen results need no completion, so only the result event is sent."""
+        with patch.object(prompt_app, 'USE_AI', False), \
+             patch.object(prompt_app, 'pregen_pop', return_value=None):
+            parsed = events(client.post('/generate-chord-progression', json={'emotions': ['Awe'], 'stream': True}))
+        assert len(parsed) == 1
+        assert parsed[0][0] == 'result'
+        assert parsed[0][1]['emotions'] == ['Awe']
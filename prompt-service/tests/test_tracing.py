@@ -0,0 +1,122 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import app as prompt_app
+
+
+def provider(sampler='parentbased_traceidratio', ratio=0.0, keep_errors=True, slow_seconds=0,
+             count_limit=32, length_limit=256):
+    exporter = InMemorySpanExporter()
+    with patch.object(prompt_app, 'TRACE_SAMPLER', sampler), \
+         patch.object(prompt_app, 'TRACE_SAMPLE_RATIO', ratio), \
+         patch.object(prompt_app, 'TRACE_KEEP_ERRORS', keep_errors), \
+         patch.object(prompt_app, 'TRACE_SLOW_SECONDS', slow_seconds), \
+         patch.object(prompt_app, 'TRACE_ATTRIBUTE_COUNT_LIMIT', count_limit), \
+         patch.object(prompt_app, 'TRACE_ATTRIBUTE_LENGTH_LIMIT', length_limit):
+        tracer_provider = prompt_app.build_tracer_provider(exporter, span_processor=SimpleSpanProcessor)
+    return tracer_provider.get_tracer(__name__), exporter
+
+
+def exported(exporter):
+    return [span.name for span in exporter.get_finished_spans()]
+
+
+class TestTracing:
+    """Test trace sampling and span attribute limits."""
+
+    def test_tracing_is_off_without_a_collector(self):
+        assert not prompt_app.TRACING_ENABLED
+        with prompt_app.tracer.start_as_current_span('request') as span:
+            assert not span.is_recording()
+
+    def test_ratio_sampling(self):
+        tracer, exporter = provider(ratio=1.0, keep_errors=False)
+        with tracer.start_as_current_span('kept'):
+            pass
+        tracer, exporter_none = provider(ratio=0.0, keep_errors=False)
+        with tracer.start_as_current_span('dropped') as span:
+            assert not span.is_recording()
+        assert exported(exporter) == ['kept']
+        assert exported(exporter_none) == []
+
+    def test_children_follow_their_parent(self):
+        tracer, exporter = provider(ratio=0.0, keep_errors=False)
+        parent = trace.SpanContext(trace_id=1, span_id=2, is_remote=True,
+                                   trace_flags=trace.TraceFlags(trace.TraceFlags.SAMPLED))
+        with tracer.start_as_current_span('child', context=trace.set_span_in_context(trace.NonRecordingSpan(parent))):
+            pass
+        assert exported(exporter) == ['child']
+
+    def test_unsampled_spans_are_not_recorded_by_default(self):
+        assert not prompt_app.TRACE_KEEP_ERRORS
+        assert prompt_app.TRACE_SLOW_SECONDS == 0
+        tracer, exporter = provider(ratio=0.0, keep_errors=prompt_app.TRACE_KEEP_ERRORS,
+                                    slow_seconds=prompt_app.TRACE_SLOW_SECONDS)
+        with tracer.start_as_current_span('request') as span:
+            assert not span.is_recording()
+
+    def test_unsampled_errors_are_kept(self):
+        tracer, exporter = provider(ratio=0.0, keep_errors=True)
+        with tracer.start_as_current_span('fine'):
+            pass
+        with pytest.raises(RuntimeError):
+            with tracer.start_as_current_span('failed'):
+                raise RuntimeError('upstream down')
+        spans = exporter.get_finished_spans()
+        assert [span.name for span in spans] == ['failed']
+        assert spans[0].context.trace_flags.sampled
+
+    def test_a_failed_child_keeps_its_whole_local_trace(self):
+        tracer, exporter = provider(ratio=0.0, keep_errors=True)
+        with tracer.start_as_current_span('request') as request_span:
+            with tracer.start_as_current_span('redis'):
+                pass
+            with pytest.raises(RuntimeError):
+                with tracer.start_as_current_span('openai'):
+                    raise RuntimeError('upstream down')
+            assert exported(exporter) == []
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        assert sorted(spans) == ['openai', 'redis', 'request']
+        root_id = request_span.get_span_context().span_id
+        assert spans['openai'].parent.span_id == root_id
+        assert spans['redis'].parent.span_id == root_id
+
+    def test_error_free_local_traces_are_dropped(self):
+        tracer, exporter = provider(ratio=0.0, keep_errors=True)
+        with tracer.start_as_current_span('request'):
+            with tracer.start_as_current_span('redis'):
+                pass
+        assert exported(exporter) == []
+
+    def test_unsampled_slow_spans_are_kept(self):
+        tracer, exporter = provider(ratio=0.0, keep_errors=False, slow_seconds=0.05)
+        with tracer.start_as_current_span('fast'):
+            pass
+        with tracer.start_as_current_span('slow'):
+            with tracer.start_as_current_span('openai'):
+                time.sleep(0.06)
+        assert exported(exporter) == ['openai', 'slow']
+
+    def test_attribute_limits(self):
+        tracer, exporter = provider(sampler='always_on', count_limit=2, length_limit=8)
+        with tracer.start_as_current_span('request') as span:
+            span.set_attribute('genres.list', 'Fantasy, Mystery')
+            span.set_attribute('prompt.length', 1200)
+            span.set_attribute('prompt.ai_generated', True)
+        attributes = exporter.get_finished_spans()[0].attributes
+        assert len(attributes) == 2
+        assert 'prompt.ai_generated' in attributes
+
+        tracer, exporter = provider(sampler='always_on', count_limit=2, length_limit=8)
+        with tracer.start_as_current_span('request') as span:
+            span.set_attribute('prompt.title', 'A very long exercise title')
+        assert exporter.get_finished_spans()[0].attributes['prompt.title'] == 'A very l'
+
+    def test_unknown_sampler(self):
+        with pytest.raises(ValueError):
+            prompt_app.head_sampler('sometimes', 0.5)
@@ -0,0 +1,146 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+import app as prompt_app
+
+
+FEEDBACK_REQUEST = {'exercise': 'Write a scene', 'userWriting': 'Once upon a time', 'genres': ['Fantasy'],
+                    'exerciseType': 'Scene', 'difficulty': 'Easy', 'wordCount': 250}
+
+
+def completion(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+@pytest.fixture
+def cache(fake_redis):
+    """A small two-tier cache backed by fakeredis."""
+    return prompt_app.TwoTierCache('test', 2, 60)
+
+
+class TestTwoTierCache:
+    """Test the per-worker LRU in front of the shared Redis cache."""
+
+    def test_compute_once_then_local_hits(self, cache):
+        calls = []
+        for _ in range(3):
+            assert cache.get_or_compute('k', lambda: calls.append(1) or 'value') == 'value'
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert stats['l1']['hits'] == 2
+        assert stats['l1']['misses'] == 1
+        assert stats['l2']['misses'] == 1
+
+    def test_other_workers_hit_redis(self, cache, fake_redis):
+        cache.set('k', {'feedback': 'Nice'})
+        assert json.loads(fake_redis.get(cache.redis_key('k'))) == {'feedback': 'Nice'}
+
+        other_worker = prompt_app.TwoTierCache('test', 2, 60)
+        assert other_worker.get_or_compute('k', lambda: pytest.fail('should not compute')) == {'feedback': 'Nice'}
+        assert other_worker.stats()['l2']['hits'] == 1
+        assert other_worker.get('k') == {'feedback': 'Nice'}
+        assert other_worker.stats()['l1']['hits'] == 1
+
+    def test_lru_eviction(self, cache):
+        for key in ['a', 'b']:
+            cache.set(key, key)
+        cache.get('a')  # b is now the oldest
+        cache.set('c', 'c')
+        assert cache.stats()['l1']['evictions'] == 1
+        assert cache.stats()['l1']['entries'] == 2
+        cache.clear_shared()
+        assert cache.get('b') is None
+        assert cache.get('a') == 'a'
+
+    def test_local_entries_expire(self, cache):
+        with patch.object(prompt_app, 'CACHE_L1_TTL', 0.05):
+            cache.set('k', 'value')
+            time.sleep(0.06)
+            cache.clear_shared()
+            assert cache.get('k') is None
+
+    def test_failures_are_not_cached(self, cache):
+        def fail():
+            raise RuntimeError('upstream down')
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute('k', fail)
+        assert cache.get_or_compute('k', lambda: 'value') == 'value'
+
+    def test_redis_outage_only_costs_the_shared_tier(self, cache, fake_redis):
+        with patch.object(fake_redis, 'get', side_effect=ConnectionError('down')), \
+             patch.object(fake_redis, 'set', side_effect=ConnectionError('down')):
+            assert cache.get_or_compute('k', lambda: 'value') == 'value'
+            assert cache.get('k') == 'value'
+        assert cache.stats()['l2']['errors'] == 2
+
+    def test_disabled_with_zero_ttl(self, fake_redis):
+        cache = prompt_app.TwoTierCache('test', 2, 0)
+        calls = []
+        for _ in range(2):
+            cache.get_or_compute('k', lambda: calls.append(1) or 'value')
+        assert len(calls) == 2
+
+
+class TestInvalidation:
+    """Test dropping the generator caches on demand."""
+
+    def test_invalidate_clears_both_tiers(self, client, fake_redis):
+        cache = prompt_app.writing_feedback_cache
+        cache.set('k', 'stale')
+        prompt_app.drawing_feedback_cache.set('k', 'kept')
+
+        response = client.post('/cache/invalidate', json={'caches': ['writing-feedback']})
+
+        assert response.status_code == 200
+        assert cache.get('k') is None
+        assert fake_redis.get(cache.redis_key('k')) is None
+        assert prompt_app.drawing_feedback_cache.get('k') == 'kept'
+
+    def test_invalidation_reaches_other_workers_l1(self, fake_redis):
+        """Another worker stops serving its in-memory copy once it rechecks the generation."""
+        cache = prompt_app.TwoTierCache('test', 2, 60)
+        other_worker = prompt_app.TwoTierCache('test', 2, 60)
+        cache.set('k', 'stale')
+        assert other_worker.get('k') == 'stale'
+
+        with patch.object(prompt_app, 'CACHE_GENERATION_CHECK', 0.05):
+            cache.invalidate()
+            time.sleep(0.06)
+            assert other_worker.get('k') is None
+            other_worker.set('k', 'fresh')
+            assert other_worker.get('k') == 'fresh'
+            assert other_worker.stats()['l1']['hits'] == 1
+
+    def test_unknown_cache_name(self, client):
+        response = client.post('/cache/invalidate', json={'caches': ['nope']})
+        assert response.status_code == 400
+
+    def test_changed_request_is_a_new_key(self):
+        ai_request = prompt_app.build_writing_feedback_request('Write a scene', 'Scene', 'Once', ['Fantasy'],
+                                                               'Easy', 250)
+        key = prompt_app.request_cache_key(ai_request)
+        assert prompt_app.request_cache_key({**ai_request, 'model': 'gpt-4o'}) != key
+        assert prompt_app.request_cache_key({**ai_request, 'params': {'temperature': 0.2}}) != key
+
+
+class TestFeedbackCaching:
+    """Test that repeated feedback requests reuse the AI result."""
+
+    def test_repeat_submission_skips_openai(self, client, fake_redis):
+        with patch.object(prompt_app, 'USE_AI', True), \
+             patch('openai.ChatCompletion.create', return_value=completion('Great pacing.')) as create:
+            first = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST)
+            second = client.post('/generate-writing-feedback', json=FEEDBACK_REQUEST)
+            changed = client.post('/generate-writing-feedback', json={**FEEDBACK_REQUEST, 'userWriting': 'The end'})
+
+        assert json.loads(first.data) == json.loads(second.data) == {'feedback': 'Great pacing.'}
+        assert changed.status_code == 200
+        assert create.call_count == 2
+
+    def test_stats_endpoint(self, client):
+        data = json.loads(client.get('/cache/tiers/stats').data)
+        assert set(data['caches']) == {'writing-feedback', 'drawing-feedback'}